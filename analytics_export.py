@@ -0,0 +1,168 @@
+"""
+Columnar export of everything the populator creates
+
+Banks, accounts, counterparties (with their bespoke category and location)
+and historical transactions (with their server transaction IDs) are
+buffered per table and written in batches to Parquet or Arrow IPC files as
+the run goes, so the data can be analysed locally without paging through
+the OBP API.
+
+Each table gets its own directory with one file per run, e.g.
+export/transactions/20240115-103000.parquet, so a table directory can be
+read as one dataset across runs (pyarrow.dataset, pandas.read_parquet,
+DuckDB or Spark).
+
+Needs pyarrow, which is optional: pip install pyarrow. It is imported when
+an export is created, so importing this module stays cheap.
+"""
+import os
+import threading
+from datetime import datetime, timezone
+import config
+
+# Columns of each table as (name, type)
+TABLES = {
+    "banks": [
+        ("bank_id", "string"), ("full_name", "string"), ("short_name", "string"),
+        ("website", "string"), ("bic", "string"), ("created_at", "timestamp")
+    ],
+    "accounts": [
+        ("bank_id", "string"), ("account_id", "string"), ("label", "string"),
+        ("currency", "string"), ("product_code", "string"), ("number", "string"),
+        ("created_at", "timestamp")
+    ],
+    "counterparties": [
+        ("bank_id", "string"), ("account_id", "string"), ("counterparty_id", "string"),
+        ("name", "string"), ("description", "string"), ("currency", "string"),
+        ("category", "string"), ("location", "string"),
+        ("other_account_routing_address", "string"), ("other_bank_routing_address", "string"),
+        ("created_at", "timestamp")
+    ],
+    "transactions": [
+        ("bank_id", "string"), ("transaction_id", "string"), ("from_account_id", "string"),
+        ("to_account_id", "string"), ("amount", "float"), ("currency", "string"),
+        ("description", "string"), ("posted", "timestamp"), ("completed", "timestamp")
+    ],
+}
+
+FORMATS = {"parquet": ".parquet", "arrow": ".arrow"}
+
+
+def parse_timestamp(value):
+    """Parse an OBP timestamp ("2024-01-15T10:30:00Z"), passing datetimes and None through"""
+    if value is None or isinstance(value, datetime):
+        return value
+    return datetime.strptime(value, "%Y-%m-%dT%H:%M:%SZ").replace(tzinfo=timezone.utc)
+
+
+class AnalyticsExport:
+    """Buffered writer of created entities to one columnar file per table"""
+
+    def __init__(self, directory: str = None, file_format: str = None, batch_size: int = None):
+        """
+        Args:
+            directory: Directory for the table directories (defaults to config.EXPORT_DIR)
+            file_format: "parquet" or "arrow" (defaults to config.EXPORT_FORMAT)
+            batch_size: Rows buffered per table before they are written
+                (defaults to config.EXPORT_BATCH_SIZE)
+        """
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise RuntimeError("Exporting to Parquet/Arrow needs pyarrow: pip install pyarrow")
+        self._pa = pa
+        self._pq = pq
+        self.directory = directory or config.EXPORT_DIR
+        self.file_format = file_format or config.EXPORT_FORMAT
+        if self.file_format not in FORMATS:
+            raise ValueError(f"Unknown export format: {self.file_format}")
+        self.batch_size = batch_size or config.EXPORT_BATCH_SIZE
+        self.run_name = datetime.now().strftime("%Y%m%d-%H%M%S")
+
+        types = {"string": pa.string(), "float": pa.float64(), "timestamp": pa.timestamp("s", tz="UTC")}
+        self._schemas = {table: pa.schema([(name, types[kind]) for name, kind in columns])
+                         for table, columns in TABLES.items()}
+        self._rows = {table: [] for table in TABLES}
+        self._writers = {}
+        self.written = {table: 0 for table in TABLES}
+        self._lock = threading.Lock()
+
+    def _now(self) -> datetime:
+        return datetime.now(timezone.utc).replace(microsecond=0)
+
+    def add(self, table: str, row: dict):
+        """
+        Buffer one row, writing the table's buffer once it holds a full batch
+
+        Args:
+            table: Table name (a key of TABLES)
+            row: Column values, missing columns are written as nulls
+        """
+        values = {name: parse_timestamp(row.get(name)) if kind == "timestamp" else row.get(name)
+                  for name, kind in TABLES[table]}
+        with self._lock:
+            self._rows[table].append(values)
+            if len(self._rows[table]) >= self.batch_size:
+                self._flush(table)
+
+    def add_bank(self, bank: dict):
+        """Add a bank from its create_bank arguments"""
+        routings = bank.get("bank_routings") or []
+        self.add("banks", dict(
+            bank,
+            bic=next((r["address"] for r in routings if r.get("scheme") == "BIC"), None),
+            created_at=self._now()
+        ))
+
+    def add_account(self, account: dict):
+        """Add an account (bank_id, account_id, label, currency, product_code and optionally number)"""
+        self.add("accounts", dict(account, created_at=self._now()))
+
+    def add_counterparty(self, bank_id: str, account_id: str, counterparty_id: str, cp_data: dict):
+        """Add a counterparty from its get_business_for_counterparty data"""
+        bespoke = {item["key"]: item["value"] for item in cp_data.get("bespoke", [])}
+        self.add("counterparties", dict(
+            cp_data, bank_id=bank_id, account_id=account_id, counterparty_id=counterparty_id,
+            category=bespoke.get("category"), location=bespoke.get("location"),
+            created_at=self._now()
+        ))
+
+    def add_transaction(self, tx_data: dict, transaction_id: str = None):
+        """Add a historical transaction from its create_historical_transaction arguments"""
+        self.add("transactions", dict(tx_data, amount=float(tx_data["amount"]),
+                                      transaction_id=transaction_id))
+
+    def _flush(self, table: str):
+        """Write a table's buffered rows as one batch (called holding the lock)"""
+        rows = self._rows[table]
+        if not rows:
+            return
+        pa = self._pa
+        batch = pa.RecordBatch.from_pylist(rows, schema=self._schemas[table])
+        writer = self._writers.get(table)
+        if writer is None:
+            table_dir = os.path.join(self.directory, table)
+            os.makedirs(table_dir, exist_ok=True)
+            path = os.path.join(table_dir, self.run_name + FORMATS[self.file_format])
+            if self.file_format == "parquet":
+                writer = self._pq.ParquetWriter(path, self._schemas[table], compression="zstd")
+            else:
+                writer = pa.ipc.new_file(path, self._schemas[table],
+                                         options=pa.ipc.IpcWriteOptions(compression="zstd"))
+            self._writers[table] = writer
+        writer.write_batch(batch)
+        self.written[table] += len(rows)
+        self._rows[table] = []
+
+    def close(self):
+        """Write the remaining rows and close every file"""
+        with self._lock:
+            for table in TABLES:
+                self._flush(table)
+            for writer in self._writers.values():
+                writer.close()
+            self._writers = {}
+        if any(self.written.values()):
+            print(f"Exported to {self.directory}/ ({self.file_format}): " +
+                  ", ".join(f"{count} {table}" for table, count in self.written.items() if count))
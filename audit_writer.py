@@ -0,0 +1,127 @@
+"""
+Background writer for sandbox_actions dynamic entity records
+
+Records are buffered in memory and written to the personal 'sandbox_actions'
+dynamic entity (see create_sandbox_actions_entity.py) by a background thread,
+so logging an action never waits on the API. When the buffer is full, new
+records are coalesced into a pending record with the same action, or dropped
+if there is none.
+"""
+import threading
+from collections import deque
+from datetime import datetime, timezone
+from obp_client import OBPClient, APIError
+
+
+class AuditWriter:
+    """Buffered, non-blocking writer for sandbox_actions records"""
+
+    def __init__(self, client: OBPClient, batch_size: int = 20,
+                 flush_interval: float = 2.0, max_pending: int = 500):
+        """
+        Args:
+            client: OBP API client, its base URL and token are reused on a
+                separate session for the background thread
+            batch_size: Flush as soon as this many records are pending
+            flush_interval: Flush pending records at least this often (seconds)
+            max_pending: Records buffered before new ones are coalesced or dropped
+        """
+        self.client = OBPClient(base_url=client.base_url, api_version=client.api_version,
+                                token=client.token, validator=client.validator)
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+
+        self.written = 0
+        self.coalesced = 0
+        self.dropped = 0
+        self.failed = 0
+        self.disabled = False
+
+        self._pending = deque()
+        self._lock = threading.Lock()
+        self._wakeup = threading.Condition(self._lock)
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name="audit-writer", daemon=True)
+        self._thread.start()
+
+    def log(self, action: str, details: str = ""):
+        """
+        Queue an action record without blocking
+
+        Args:
+            action: Action name (e.g. "created_bank")
+            details: Free text details
+        """
+        if self.disabled or self._closed:
+            return
+        record = {
+            "action": action,
+            "timestamp": datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ"),
+            "details": details,
+            "count": 1
+        }
+        with self._lock:
+            if len(self._pending) >= self.max_pending:
+                self._coalesce(record)
+                return
+            self._pending.append(record)
+            if len(self._pending) >= self.batch_size:
+                self._wakeup.notify()
+
+    def _coalesce(self, record: dict):
+        """Fold a record into a pending one with the same action, or drop it"""
+        for pending in reversed(self._pending):
+            if pending["action"] == record["action"]:
+                pending["count"] += 1
+                pending["timestamp"] = record["timestamp"]
+                self.coalesced += 1
+                return
+        self.dropped += 1
+
+    def _run(self):
+        """Background loop: wait for a full batch or the flush interval, then write"""
+        while True:
+            with self._lock:
+                if not self._closed and len(self._pending) < self.batch_size:
+                    self._wakeup.wait(self.flush_interval)
+                batch = list(self._pending)
+                self._pending.clear()
+                closed = self._closed
+            for record in batch:
+                self._write(record)
+            if closed and not batch:
+                return
+
+    def _write(self, record: dict):
+        """Write one record, disabling the writer if the entity does not exist"""
+        if self.disabled:
+            self.dropped += 1
+            return
+        details = record["details"]
+        if record["count"] > 1:
+            details = f"{details} (+{record['count'] - 1} more)"
+        try:
+            self.client.create_sandbox_action(record["action"], record["timestamp"], details)
+            self.written += 1
+        except Exception as e:
+            self.failed += 1
+            if isinstance(e, APIError) and e.status_code == 404:
+                self.disabled = True
+                print("  Audit log disabled: sandbox_actions entity not found. "
+                      "Run create_sandbox_actions_entity.py to create it.")
+
+    def close(self, timeout: float = 30.0):
+        """
+        Flush pending records and stop the background thread
+
+        Args:
+            timeout: Maximum seconds to wait for the flush
+        """
+        with self._lock:
+            self._closed = True
+            self._wakeup.notify()
+        self._thread.join(timeout)
+        if self.coalesced or self.dropped or self.failed:
+            print(f"Audit log: {self.written} written, {self.coalesced} coalesced, "
+                  f"{self.dropped} dropped, {self.failed} failed")
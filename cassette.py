@@ -0,0 +1,241 @@
+"""
+Record/replay HTTP cassettes for OBPClient
+
+A recording transport captures every request and response (method, URL,
+status, headers, body and timing) to a gzip-compressed JSON lines file. A
+replay transport serves those responses locally, in recorded order per
+request, sleeping for the original latency or a scaled version of it, so a
+run can be reproduced and profiled offline, including any 429 bursts.
+
+Secrets are redacted before anything is written: query parameters such as
+the data-import secret_token, and token and password fields of JSON
+response bodies (DirectLogin tokens). Request headers, which carry the
+Authorization header, are not recorded at all.
+"""
+import atexit
+import gzip
+import json
+import re
+import threading
+import time
+from collections import defaultdict, deque
+from datetime import timedelta
+from urllib.parse import urlsplit, parse_qsl, urlencode
+import requests
+from requests.adapters import BaseAdapter, HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+
+# Response headers kept in the cassette
+RECORDED_HEADERS = ("Content-Type", "ETag", "Retry-After", "Location")
+
+# Query parameters and JSON fields whose values are replaced before recording
+SECRET_FIELDS = {"secret_token", "token", "password", "consumer_key", "secret"}
+REDACTED = "REDACTED"
+
+# Path segments that look like generated IDs, used as a fallback when
+# matching replayed requests
+ID_SEGMENT = re.compile(r"^[0-9a-fA-F]{8}-[0-9a-fA-F-]{27}$|^\d{6,}$")
+
+_recorders = {}
+_replayers = {}
+_lock = threading.Lock()
+
+
+def redact_url(url: str) -> str:
+    """Replace the values of secret query parameters in a URL"""
+    parts = urlsplit(url)
+    if not parts.query:
+        return url
+    query = urlencode([(name, REDACTED if name in SECRET_FIELDS else value)
+                       for name, value in parse_qsl(parts.query, keep_blank_values=True)])
+    return parts._replace(query=query).geturl()
+
+
+def redact_body(content: bytes) -> str:
+    """Decode a response body, replacing secret fields if it is JSON"""
+    text = content.decode("utf-8", errors="replace")
+    try:
+        data = json.loads(text)
+    except ValueError:
+        return text
+
+    def redact(value):
+        if isinstance(value, dict):
+            return {k: REDACTED if k in SECRET_FIELDS and isinstance(v, str) else redact(v)
+                    for k, v in value.items()}
+        if isinstance(value, list):
+            return [redact(item) for item in value]
+        return value
+
+    redacted = redact(data)
+    return text if redacted == data else json.dumps(redacted, separators=(",", ":"))
+
+
+def _request_key(method: str, url: str) -> tuple:
+    """Key used to match a request to recorded responses (secrets redacted as recorded)"""
+    parts = urlsplit(redact_url(url))
+    return (method, parts.path + ("?" + parts.query if parts.query else ""))
+
+
+def _pattern_key(method: str, url: str) -> tuple:
+    """Key with generated IDs replaced, so requests match across runs"""
+    path = urlsplit(url).path
+    return (method, "/".join("{id}" if ID_SEGMENT.match(s) else s for s in path.split("/")))
+
+
+class CassetteRecorder:
+    """Appends interactions to a cassette file, shared by every client in the process"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.start = time.monotonic()
+        self.count = 0
+        self._file = gzip.open(path, "wt", encoding="utf-8")
+        self._lock = threading.Lock()
+        atexit.register(self.close)
+
+    def record(self, request: requests.PreparedRequest, response: requests.Response,
+               sent_at: float, elapsed: float):
+        body = request.body
+        interaction = {
+            "t": round(sent_at - self.start, 6),
+            "elapsed": round(elapsed, 6),
+            "method": request.method,
+            "url": redact_url(request.url),
+            "request_bytes": len(body) if isinstance(body, (bytes, str)) else None,
+            "status": response.status_code,
+            "reason": response.reason,
+            "headers": {h: response.headers[h] for h in RECORDED_HEADERS if h in response.headers},
+            "body": redact_body(response.content),
+        }
+        line = json.dumps(interaction, separators=(",", ":"))
+        with self._lock:
+            if not self._file.closed:
+                self._file.write(line + "\n")
+                self.count += 1
+
+    def close(self):
+        with self._lock:
+            if not self._file.closed:
+                self._file.close()
+
+
+class RecordingAdapter(HTTPAdapter):
+    """Transport that sends requests normally and records them to a cassette"""
+
+    def __init__(self, recorder: CassetteRecorder, **kwargs):
+        super().__init__(**kwargs)
+        self.recorder = recorder
+
+    def send(self, request, **kwargs):
+        sent_at = time.monotonic()
+        response = super().send(request, **kwargs)
+        response.content  # Read the body so it can be recorded
+        self.recorder.record(request, response, sent_at, time.monotonic() - sent_at)
+        return response
+
+
+class Cassette:
+    """Recorded interactions, served in order per request"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._interactions = []
+        # Both indexes hold positions in _interactions, so an interaction
+        # served through one is not served again through the other
+        self._by_request = defaultdict(deque)
+        self._by_pattern = defaultdict(deque)
+        self._served = set()
+        self._lock = threading.Lock()
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            for index, line in enumerate(f):
+                interaction = json.loads(line)
+                self._interactions.append(interaction)
+                self._by_request[_request_key(interaction["method"], interaction["url"])].append(index)
+                self._by_pattern[_pattern_key(interaction["method"], interaction["url"])].append(index)
+
+    def _take(self, queue: deque) -> dict:
+        """Take the next unserved interaction of a queue, keeping its last one (called holding the lock)"""
+        while len(queue) > 1 and queue[0] in self._served:
+            queue.popleft()
+        index = queue.popleft() if len(queue) > 1 else queue[0]
+        self._served.add(index)
+        return self._interactions[index]
+
+    def next_interaction(self, method: str, url: str):
+        """
+        Take the next recorded interaction for a request
+
+        Exact URL matches are served first, in recorded order. When those run
+        out, interactions for the same endpoint with different IDs are used.
+        The last interaction of a key is kept so it can be served again.
+        """
+        with self._lock:
+            for queues, key in ((self._by_request, _request_key(method, url)),
+                                (self._by_pattern, _pattern_key(method, url))):
+                queue = queues.get(key)
+                if queue:
+                    return self._take(queue)
+        return None
+
+
+class ReplayAdapter(BaseAdapter):
+    """Transport that answers requests from a cassette without the network"""
+
+    def __init__(self, cassette: Cassette, latency_scale: float = 1.0):
+        super().__init__()
+        self.cassette = cassette
+        self.latency_scale = latency_scale
+
+    def send(self, request, **kwargs):
+        interaction = self.cassette.next_interaction(request.method, request.url)
+        if interaction is None:
+            raise requests.ConnectionError(
+                f"Cassette {self.cassette.path} has no response for {request.method} {request.url}",
+                request=request
+            )
+        if self.latency_scale:
+            time.sleep(interaction["elapsed"] * self.latency_scale)
+
+        response = requests.Response()
+        response.status_code = interaction["status"]
+        response.reason = interaction["reason"]
+        response.headers = CaseInsensitiveDict(interaction["headers"])
+        response._content = interaction["body"].encode("utf-8")
+        response.encoding = "utf-8"
+        response.url = request.url
+        response.request = request
+        response.elapsed = timedelta(seconds=interaction["elapsed"])
+        return response
+
+    def close(self):
+        pass
+
+
+def install_cassette(session: requests.Session, record_path: str = None,
+                     replay_path: str = None, latency_scale: float = 1.0,
+                     pool_size: int = 10):
+    """
+    Mount a recording or replay transport on a session
+
+    Args:
+        session: Session to mount the transport on
+        record_path: Cassette file to record to
+        replay_path: Cassette file to replay from
+        latency_scale: Multiplier for recorded latencies on replay (0 for none)
+        pool_size: Connection pool size of the recording transport
+    """
+    with _lock:
+        if replay_path:
+            if replay_path not in _replayers:
+                _replayers[replay_path] = Cassette(replay_path)
+            adapter = ReplayAdapter(_replayers[replay_path], latency_scale)
+        elif record_path:
+            if record_path not in _recorders:
+                _recorders[record_path] = CassetteRecorder(record_path)
+            adapter = RecordingAdapter(_recorders[record_path],
+                                       pool_connections=pool_size, pool_maxsize=pool_size)
+        else:
+            return
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
@@ -0,0 +1,174 @@
+"""
+Circuit breakers and error budget for OBP API calls
+
+Each endpoint gets its own breaker. A breaker opens when the failure rate
+over its recent calls crosses a threshold, fails calls fast while open,
+lets a few trial calls through once the reset timeout has passed
+(half-open), and closes again when they succeed. The error budget caps the
+number of failed requests for a whole run.
+"""
+import threading
+import time
+from collections import deque
+import config
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of sending a request to an endpoint whose circuit is open"""
+
+    def __init__(self, endpoint: str, retry_in: float):
+        self.endpoint = endpoint
+        self.retry_in = retry_in
+        super().__init__(f"Circuit open for {endpoint}, retry in {retry_in:.0f}s")
+
+
+class ErrorBudgetExceeded(CircuitOpenError):
+    """Raised for every request once the run has used up its error budget"""
+
+    def __init__(self, failures: int, budget: int):
+        self.endpoint = "*"
+        self.retry_in = float("inf")
+        Exception.__init__(self, f"Error budget exhausted: {failures} failed requests (budget {budget})")
+
+
+class CircuitBreaker:
+    """Circuit breaker for one endpoint, driven by a rolling failure rate"""
+
+    def __init__(self, endpoint: str, failure_rate: float = None, window: int = None,
+                 min_calls: int = None, reset_timeout: float = None,
+                 half_open_calls: int = None):
+        """
+        Args:
+            endpoint: Endpoint name, used in messages
+            failure_rate: Fraction of failed calls in the window that opens the circuit
+            window: Number of recent calls the failure rate is computed over
+            min_calls: Calls needed in the window before the circuit can open
+            reset_timeout: Seconds the circuit stays open before trial calls
+            half_open_calls: Successful trial calls needed to close the circuit
+        """
+        self.endpoint = endpoint
+        self.failure_rate = failure_rate or config.CIRCUIT_FAILURE_RATE
+        self.min_calls = min_calls or config.CIRCUIT_MIN_CALLS
+        self.reset_timeout = reset_timeout or config.CIRCUIT_RESET_TIMEOUT
+        self.half_open_calls = half_open_calls or config.CIRCUIT_HALF_OPEN_CALLS
+
+        self.state = CLOSED
+        self.opened_at = 0.0
+        self.times_opened = 0
+        self._outcomes = deque(maxlen=window or config.CIRCUIT_WINDOW)
+        self._trials = 0
+        self._trial_successes = 0
+        self._lock = threading.Lock()
+
+    def before_call(self):
+        """Check the circuit before sending a request, raising if it is open"""
+        with self._lock:
+            if self.state == OPEN:
+                elapsed = time.monotonic() - self.opened_at
+                if elapsed < self.reset_timeout:
+                    raise CircuitOpenError(self.endpoint, self.reset_timeout - elapsed)
+                self.state = HALF_OPEN
+                self._trials = 0
+                self._trial_successes = 0
+                print(f"  Circuit half-open for {self.endpoint}, sending trial requests")
+            if self.state == HALF_OPEN:
+                if self._trials >= self.half_open_calls:
+                    raise CircuitOpenError(self.endpoint, 0)
+                self._trials += 1
+
+    def record(self, success: bool):
+        """Record the outcome of a request"""
+        with self._lock:
+            if self.state == HALF_OPEN:
+                if not success:
+                    self._open()
+                    return
+                self._trial_successes += 1
+                if self._trial_successes >= self.half_open_calls:
+                    self.state = CLOSED
+                    self._outcomes.clear()
+                    print(f"  Circuit closed for {self.endpoint}, endpoint recovered")
+                return
+
+            self._outcomes.append(success)
+            if len(self._outcomes) >= self.min_calls:
+                failures = self._outcomes.count(False)
+                if failures / len(self._outcomes) >= self.failure_rate:
+                    self._open()
+
+    def _open(self):
+        self.state = OPEN
+        self.opened_at = time.monotonic()
+        self.times_opened += 1
+        print(f"  Circuit opened for {self.endpoint}, pausing requests for {self.reset_timeout:.0f}s")
+
+
+class ErrorBudget:
+    """Run-level limit on the number of failed requests"""
+
+    def __init__(self, max_failures: int = None):
+        """
+        Args:
+            max_failures: Failed requests allowed in the run (0 for no limit)
+        """
+        self.max_failures = config.ERROR_BUDGET if max_failures is None else max_failures
+        self.failures = 0
+        self._lock = threading.Lock()
+
+    @property
+    def exhausted(self) -> bool:
+        return bool(self.max_failures) and self.failures >= self.max_failures
+
+    def check(self):
+        """Raise if the budget is used up"""
+        if self.exhausted:
+            raise ErrorBudgetExceeded(self.failures, self.max_failures)
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+
+
+class CircuitBreakers:
+    """Per-endpoint circuit breakers sharing one error budget"""
+
+    def __init__(self, error_budget: ErrorBudget = None, **breaker_options):
+        """
+        Args:
+            error_budget: Run-level error budget (created from config if not provided)
+            breaker_options: Options passed to each CircuitBreaker
+        """
+        self.error_budget = error_budget or ErrorBudget()
+        self.breaker_options = breaker_options
+        self._breakers = {}
+        self._lock = threading.Lock()
+
+    def get(self, endpoint: str) -> CircuitBreaker:
+        """Get the breaker for an endpoint, creating it on first use"""
+        with self._lock:
+            if endpoint not in self._breakers:
+                self._breakers[endpoint] = CircuitBreaker(endpoint, **self.breaker_options)
+            return self._breakers[endpoint]
+
+    def before_call(self, endpoint: str):
+        """Check the error budget and the endpoint's circuit before a request"""
+        self.error_budget.check()
+        self.get(endpoint).before_call()
+
+    def record(self, endpoint: str, success: bool):
+        """Record the outcome of a request to an endpoint"""
+        if not success:
+            self.error_budget.record_failure()
+        self.get(endpoint).record(success)
+
+    def summary(self) -> dict:
+        """Get the state of every breaker that has seen requests"""
+        with self._lock:
+            return {
+                endpoint: {"state": breaker.state, "times_opened": breaker.times_opened}
+                for endpoint, breaker in self._breakers.items()
+            }
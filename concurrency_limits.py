@@ -0,0 +1,152 @@
+"""
+Adaptive concurrency limits for OBP API calls
+
+Each endpoint gets its own limit on requests in flight, tuned while the run
+goes instead of guessed up front, in the style of TCP Vegas and AIMD:
+
+- Latency above the endpoint's no-load latency means requests are queueing
+  on the server. The queue is estimated as in_flight * (1 - no_load / latency).
+  Below the low queue mark the limit grows by one per round of requests,
+  above the high mark it shrinks by one per round, and in between it holds.
+- A 429, 503 or 504, or a request that fails to complete, cuts the limit by
+  the backoff factor, at most once per round trip so a burst of rejections
+  of requests sent at the old limit only counts once.
+
+The limits are capped by the number of worker threads calling the client.
+"""
+import threading
+import time
+from collections import deque
+import config
+
+# Status codes meaning the server is overloaded
+OVERLOAD_STATUSES = (429, 503, 504)
+
+
+class AdaptiveLimit:
+    """Concurrency limit for one endpoint, driven by latency and overload responses"""
+
+    def __init__(self, endpoint: str, initial_limit: int = None, min_limit: int = None,
+                 max_limit: int = None, queue_low: float = None, queue_high: float = None,
+                 backoff: float = None, window: int = 100):
+        """
+        Args:
+            endpoint: Endpoint name, used in the summary
+            initial_limit: Requests in flight to start with
+            min_limit: Lowest the limit is cut to
+            max_limit: Highest the limit grows to
+            queue_low: Estimated server queue below which the limit grows
+            queue_high: Estimated server queue above which the limit shrinks
+            backoff: Factor the limit is multiplied by on overload
+            window: Recent requests the no-load latency and the settled
+                limit are taken over
+        """
+        self.endpoint = endpoint
+        self.min_limit = min_limit or config.ADAPTIVE_MIN_LIMIT
+        self.max_limit = max_limit or config.ADAPTIVE_MAX_LIMIT
+        self.queue_low = queue_low or config.ADAPTIVE_QUEUE_LOW
+        self.queue_high = queue_high or config.ADAPTIVE_QUEUE_HIGH
+        self.backoff = backoff or config.ADAPTIVE_BACKOFF
+        initial_limit = initial_limit or config.ADAPTIVE_INITIAL_LIMIT
+        self.limit = float(min(max(initial_limit, self.min_limit), self.max_limit))
+
+        self.in_flight = 0
+        self.samples = 0
+        self.decreases = 0
+        self.baseline = None
+        self._recent = deque(maxlen=window)
+        self._recent_limits = deque(maxlen=window)
+        self._last_decrease = 0.0
+        self._cond = threading.Condition()
+
+    def acquire(self):
+        """Block until a request may be sent"""
+        with self._cond:
+            while self.in_flight >= int(self.limit):
+                self._cond.wait()
+            self.in_flight += 1
+
+    def release(self, seconds: float, overloaded: bool = False):
+        """
+        Record a finished request and adjust the limit
+
+        Args:
+            seconds: Latency of the request
+            overloaded: Whether the server pushed back (see OVERLOAD_STATUSES)
+                or the request did not complete
+        """
+        with self._cond:
+            in_flight = self.in_flight
+            self.in_flight -= 1
+            self.samples += 1
+            # Requests sent before the last cut say nothing about the new limit
+            sent_at = time.monotonic() - seconds
+            if overloaded:
+                self._decrease(sent_at, self.backoff)
+            else:
+                self._recent.append(seconds)
+                if self.baseline is None or seconds < self.baseline:
+                    self.baseline = seconds
+                elif self.samples % (self._recent.maxlen * 4) == 0:
+                    # Follow a server that has become slower for good
+                    self.baseline = min(self._recent)
+
+                queue = in_flight * (1 - self.baseline / seconds) if seconds else 0.0
+                if queue > self.queue_high:
+                    self.limit = max(self.min_limit, self.limit - 1 / self.limit)
+                elif queue < self.queue_low and in_flight >= self.limit / 2:
+                    # Only grow a limit that is actually being used
+                    self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+            self._recent_limits.append(self.limit)
+            self._cond.notify_all()
+
+    def _decrease(self, sent_at: float, factor: float):
+        """Cut the limit on overload, once per round trip (called holding the lock)"""
+        if sent_at < self._last_decrease:
+            return
+        self.limit = max(self.min_limit, self.limit * factor)
+        self.decreases += 1
+        self._last_decrease = time.monotonic()
+
+    @property
+    def settled(self) -> float:
+        """Average limit over the recent requests"""
+        with self._cond:
+            if not self._recent_limits:
+                return self.limit
+            return sum(self._recent_limits) / len(self._recent_limits)
+
+
+class ConcurrencyLimits:
+    """Per-endpoint adaptive concurrency limits"""
+
+    def __init__(self, **limit_options):
+        """
+        Args:
+            limit_options: Options passed to each AdaptiveLimit
+        """
+        self.limit_options = limit_options
+        self.max_limit = limit_options.get("max_limit") or config.ADAPTIVE_MAX_LIMIT
+        self._limits = {}
+        self._lock = threading.Lock()
+
+    def get(self, endpoint: str) -> AdaptiveLimit:
+        """Get the limit for an endpoint, creating it on first use"""
+        with self._lock:
+            if endpoint not in self._limits:
+                self._limits[endpoint] = AdaptiveLimit(endpoint, **self.limit_options)
+            return self._limits[endpoint]
+
+    def summary(self) -> dict:
+        """Get the limit of every endpoint that has seen requests"""
+        with self._lock:
+            return {
+                endpoint: {
+                    "limit": int(limit.limit),
+                    "settled": limit.settled,
+                    "baseline_ms": (limit.baseline or 0) * 1000,
+                    "samples": limit.samples,
+                    "decreases": limit.decreases,
+                }
+                for endpoint, limit in self._limits.items() if limit.samples
+            }
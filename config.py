@@ -21,3 +21,112 @@ NUM_BANKS = 2
 NUM_ACCOUNTS_PER_BANK = 5
 COUNTRY = "Botswana"
 CURRENCY = "BWP"  # Botswana Pula
+
+# Sandbox data import backend
+OBP_SANDBOX_IMPORT_SECRET = os.getenv("OBP_SANDBOX_IMPORT_SECRET")
+IMPORT_CHUNK_SIZE = int(os.getenv("IMPORT_CHUNK_SIZE", "20000"))
+
+# Log populator actions to the sandbox_actions dynamic entity (off unless asked for)
+AUDIT_SANDBOX_ACTIONS = os.getenv("AUDIT_SANDBOX_ACTIONS", "false").lower() == "true"
+
+# Circuit breakers (per endpoint) and run-level error budget
+CIRCUIT_FAILURE_RATE = float(os.getenv("CIRCUIT_FAILURE_RATE", "0.5"))
+CIRCUIT_WINDOW = int(os.getenv("CIRCUIT_WINDOW", "20"))
+CIRCUIT_MIN_CALLS = int(os.getenv("CIRCUIT_MIN_CALLS", "5"))
+CIRCUIT_RESET_TIMEOUT = float(os.getenv("CIRCUIT_RESET_TIMEOUT", "30"))
+CIRCUIT_HALF_OPEN_CALLS = int(os.getenv("CIRCUIT_HALF_OPEN_CALLS", "2"))
+ERROR_BUDGET = int(os.getenv("ERROR_BUDGET", "200"))
+
+# Server rate limit used to estimate run duration (0 for no limit)
+OBP_RATE_LIMIT_PER_MINUTE = int(os.getenv("OBP_RATE_LIMIT_PER_MINUTE", "0"))
+
+# Records per page when walking list endpoints (banks, accounts, counterparties, transactions)
+LIST_PAGE_SIZE = int(os.getenv("LIST_PAGE_SIZE", "200"))
+
+# Concurrency
+HTTP_POOL_SIZE = int(os.getenv("HTTP_POOL_SIZE", "16"))
+TEARDOWN_WORKERS = int(os.getenv("TEARDOWN_WORKERS", "8"))
+# Concurrent historical transaction requests (each account stays in order)
+HISTORY_WORKERS = int(os.getenv("HISTORY_WORKERS", "4"))
+
+# Adaptive concurrency: tune requests in flight per endpoint from latency and
+# overload responses (429/503/504), between the min and max limits, keeping
+# the estimated number of requests queued on the server between the marks
+ADAPTIVE_CONCURRENCY = os.getenv("ADAPTIVE_CONCURRENCY", "false").lower() == "true"
+ADAPTIVE_INITIAL_LIMIT = int(os.getenv("ADAPTIVE_INITIAL_LIMIT", "4"))
+ADAPTIVE_MIN_LIMIT = int(os.getenv("ADAPTIVE_MIN_LIMIT", "1"))
+ADAPTIVE_MAX_LIMIT = int(os.getenv("ADAPTIVE_MAX_LIMIT", "32"))
+ADAPTIVE_QUEUE_LOW = float(os.getenv("ADAPTIVE_QUEUE_LOW", "2"))
+ADAPTIVE_QUEUE_HIGH = float(os.getenv("ADAPTIVE_QUEUE_HIGH", "4"))
+ADAPTIVE_BACKOFF = float(os.getenv("ADAPTIVE_BACKOFF", "0.9"))
+
+# Distributed work queue: queue file, lease length, retries and history chunk size
+WORK_QUEUE_FILE = os.getenv("WORK_QUEUE_FILE", "work_queue.db")
+WORK_QUEUE_LEASE_SECONDS = float(os.getenv("WORK_QUEUE_LEASE_SECONDS", "120"))
+WORK_QUEUE_MAX_ATTEMPTS = int(os.getenv("WORK_QUEUE_MAX_ATTEMPTS", "3"))
+WORK_QUEUE_CHUNK_SIZE = int(os.getenv("WORK_QUEUE_CHUNK_SIZE", "500"))
+
+# Streaming file ingestion: rows per chunk and concurrent requests
+INGEST_CHUNK_SIZE = int(os.getenv("INGEST_CHUNK_SIZE", "1000"))
+INGEST_WORKERS = int(os.getenv("INGEST_WORKERS", "8"))
+
+# JSON codec for request and response bodies: auto (orjson if installed), orjson or json
+JSON_CODEC = os.getenv("JSON_CODEC", "auto").lower()
+
+# Local validation of request bodies against the target's resource docs (off by
+# default: it rebuilds every templated body and fetches the resource docs)
+VALIDATE_PAYLOADS = os.getenv("VALIDATE_PAYLOADS", "false").lower() == "true"
+RESOURCE_DOCS_CACHE_FILE = os.getenv("RESOURCE_DOCS_CACHE_FILE", "resource_docs_cache.json")
+RESOURCE_DOCS_TTL_HOURS = float(os.getenv("RESOURCE_DOCS_TTL_HOURS", "24"))
+VALIDATION_REPORT_FILE = os.getenv("VALIDATION_REPORT_FILE", "validation_errors.jsonl")
+
+# Columnar export of created entities (needs pyarrow; empty directory for none)
+EXPORT_DIR = os.getenv("EXPORT_DIR", "")
+EXPORT_FORMAT = os.getenv("EXPORT_FORMAT", "parquet")
+EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", "5000"))
+
+# Request timeouts in seconds: connect, then read per endpoint class
+OBP_CONNECT_TIMEOUT = float(os.getenv("OBP_CONNECT_TIMEOUT", "5"))
+OBP_READ_TIMEOUT = float(os.getenv("OBP_READ_TIMEOUT", "30"))
+OBP_WRITE_TIMEOUT = float(os.getenv("OBP_WRITE_TIMEOUT", "60"))
+OBP_BULK_TIMEOUT = float(os.getenv("OBP_BULK_TIMEOUT", "600"))
+
+# Run deadline in seconds (0 for none); no new requests are sent in the last margin seconds
+RUN_DEADLINE_SECONDS = float(os.getenv("RUN_DEADLINE_SECONDS", "0"))
+RUN_DEADLINE_MARGIN = float(os.getenv("RUN_DEADLINE_MARGIN", "10"))
+
+# Hedged GETs: send a backup request once a GET is slower than this latency percentile
+HEDGED_GETS = os.getenv("HEDGED_GETS", "false").lower() == "true"
+HEDGE_PERCENTILE = float(os.getenv("HEDGE_PERCENTILE", "95"))
+HEDGE_MIN_SAMPLES = int(os.getenv("HEDGE_MIN_SAMPLES", "20"))
+
+# Response cache for idempotent GETs
+RESPONSE_CACHE = os.getenv("RESPONSE_CACHE", "false").lower() == "true"
+RESPONSE_CACHE_SIZE = int(os.getenv("RESPONSE_CACHE_SIZE", "1024"))
+
+# HTTP cassettes: record every request to a file, or replay a recorded run offline
+OBP_RECORD_CASSETTE = os.getenv("OBP_RECORD_CASSETTE")
+OBP_REPLAY_CASSETTE = os.getenv("OBP_REPLAY_CASSETTE")
+OBP_REPLAY_LATENCY_SCALE = float(os.getenv("OBP_REPLAY_LATENCY_SCALE", "1.0"))
+
+# Per-account high-water marks for incremental history top-ups
+HISTORY_STATE_FILE = os.getenv("HISTORY_STATE_FILE", "history_watermarks.json")
+
+# Bank and account IDs created per prefix, so single stages skip the lookups
+SANDBOX_STATE_FILE = os.getenv("SANDBOX_STATE_FILE", "sandbox_state.json")
+
+# Sandbox users: how many to provision, their password and accounts, the
+# concurrent provisioning workers, cached DirectLogin tokens and live clients
+SANDBOX_USERS = int(os.getenv("SANDBOX_USERS", "10"))
+# (without SANDBOX_USER_PASSWORD one is generated per instance and kept in USER_TOKEN_FILE)
+SANDBOX_USER_PASSWORD = os.getenv("SANDBOX_USER_PASSWORD")
+ACCOUNTS_PER_USER = int(os.getenv("ACCOUNTS_PER_USER", "2"))
+USER_WORKERS = int(os.getenv("USER_WORKERS", "8"))
+USER_TOKEN_FILE = os.getenv("USER_TOKEN_FILE", "user_tokens.json")
+USER_TOKEN_TTL_HOURS = float(os.getenv("USER_TOKEN_TTL_HOURS", "24"))
+USER_CLIENT_POOL_SIZE = int(os.getenv("USER_CLIENT_POOL_SIZE", "64"))
+
+# Failed write requests kept for re-driving, and the re-drive pace
+DEAD_LETTER_FILE = os.getenv("DEAD_LETTER_FILE", "dead_letters.db")
+REDRIVE_WORKERS = int(os.getenv("REDRIVE_WORKERS", "8"))
+REDRIVE_RATE_PER_SECOND = float(os.getenv("REDRIVE_RATE_PER_SECOND", "10"))
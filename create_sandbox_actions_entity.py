@@ -42,7 +42,8 @@ def create_sandbox_actions_entity(client: OBPClient) -> dict:
 
     response = client.session.post(
         f"{client.base_url}/obp/{client.api_version}/management/system-dynamic-entities",
-        json=payload
+        json=payload,
+        timeout=(config.OBP_CONNECT_TIMEOUT, config.OBP_WRITE_TIMEOUT)
     )
 
     if response.status_code >= 400:
@@ -0,0 +1,165 @@
+"""
+Definitions of the sandbox entities created by the populator
+
+Banks, account types, FX rates, the transaction templates used to
+generate a realistic account history and names for sandbox users.
+"""
+
+# Banks created for each user, bank_id is "<username>.<suffix>"
+BANK_DEFINITIONS = [
+    {
+        "suffix": "cbb",
+        "full_name": "Commercial Bank of Botswana",
+        "short_name": "CBB",
+        "website": "https://www.cbb.co.bw"
+    },
+    {
+        "suffix": "bsb",
+        "full_name": "Botswana Savings Bank",
+        "short_name": "BSB",
+        "website": "https://www.bsb.co.bw"
+    }
+]
+
+# Account types created at each bank
+ACCOUNT_DEFINITIONS = [
+    {"label": "Current Account", "product_code": "CURRENT"},
+    {"label": "Savings Account", "product_code": "SAVINGS"},
+    {"label": "Business Account", "product_code": "BUSINESS"},
+    {"label": "Investment Account", "product_code": "INVESTMENT"},
+    {"label": "Emergency Fund", "product_code": "SAVINGS"},
+]
+
+# FX rates - Approximate rates as of 2024
+# BWP = Botswana Pula, ZAR = South African Rand, KES = Kenyan Shilling
+# NGN = Nigerian Naira, EGP = Egyptian Pound, GHS = Ghanaian Cedi
+# TZS = Tanzanian Shilling, UGX = Ugandan Shilling, ZMW = Zambian Kwacha
+# NAD = Namibian Dollar, CNY = Chinese Yuan
+FX_RATE_DEFINITIONS = [
+    # BWP (Botswana Pula) pairs
+    {"from": "EUR", "to": "BWP", "rate": 14.85},
+    {"from": "BWP", "to": "EUR", "rate": 0.0673},
+    {"from": "USD", "to": "BWP", "rate": 13.65},
+    {"from": "BWP", "to": "USD", "rate": 0.0733},
+    {"from": "GBP", "to": "BWP", "rate": 17.25},
+    {"from": "BWP", "to": "GBP", "rate": 0.0580},
+
+    # ZAR (South African Rand) pairs
+    {"from": "EUR", "to": "ZAR", "rate": 20.15},
+    {"from": "ZAR", "to": "EUR", "rate": 0.0496},
+    {"from": "USD", "to": "ZAR", "rate": 18.50},
+    {"from": "ZAR", "to": "USD", "rate": 0.0541},
+    {"from": "BWP", "to": "ZAR", "rate": 1.36},
+    {"from": "ZAR", "to": "BWP", "rate": 0.735},
+
+    # KES (Kenyan Shilling) pairs
+    {"from": "EUR", "to": "KES", "rate": 166.50},
+    {"from": "KES", "to": "EUR", "rate": 0.0060},
+    {"from": "USD", "to": "KES", "rate": 153.00},
+    {"from": "KES", "to": "USD", "rate": 0.0065},
+
+    # NGN (Nigerian Naira) pairs
+    {"from": "EUR", "to": "NGN", "rate": 1750.00},
+    {"from": "NGN", "to": "EUR", "rate": 0.000571},
+    {"from": "USD", "to": "NGN", "rate": 1600.00},
+    {"from": "NGN", "to": "USD", "rate": 0.000625},
+
+    # EGP (Egyptian Pound) pairs
+    {"from": "EUR", "to": "EGP", "rate": 53.50},
+    {"from": "EGP", "to": "EUR", "rate": 0.0187},
+    {"from": "USD", "to": "EGP", "rate": 49.00},
+    {"from": "EGP", "to": "USD", "rate": 0.0204},
+
+    # GHS (Ghanaian Cedi) pairs
+    {"from": "EUR", "to": "GHS", "rate": 17.20},
+    {"from": "GHS", "to": "EUR", "rate": 0.0581},
+    {"from": "USD", "to": "GHS", "rate": 15.80},
+    {"from": "GHS", "to": "USD", "rate": 0.0633},
+
+    # TZS (Tanzanian Shilling) pairs
+    {"from": "EUR", "to": "TZS", "rate": 2750.00},
+    {"from": "TZS", "to": "EUR", "rate": 0.000364},
+    {"from": "USD", "to": "TZS", "rate": 2525.00},
+    {"from": "TZS", "to": "USD", "rate": 0.000396},
+
+    # UGX (Ugandan Shilling) pairs
+    {"from": "EUR", "to": "UGX", "rate": 4100.00},
+    {"from": "UGX", "to": "EUR", "rate": 0.000244},
+    {"from": "USD", "to": "UGX", "rate": 3760.00},
+    {"from": "UGX", "to": "USD", "rate": 0.000266},
+
+    # ZMW (Zambian Kwacha) pairs
+    {"from": "EUR", "to": "ZMW", "rate": 29.50},
+    {"from": "ZMW", "to": "EUR", "rate": 0.0339},
+    {"from": "USD", "to": "ZMW", "rate": 27.00},
+    {"from": "ZMW", "to": "USD", "rate": 0.0370},
+
+    # NAD (Namibian Dollar) pairs
+    {"from": "EUR", "to": "NAD", "rate": 20.15},
+    {"from": "NAD", "to": "EUR", "rate": 0.0496},
+    {"from": "USD", "to": "NAD", "rate": 18.50},
+    {"from": "NAD", "to": "USD", "rate": 0.0541},
+
+    # CNY (Chinese Yuan) pairs
+    {"from": "EUR", "to": "CNY", "rate": 7.85},
+    {"from": "CNY", "to": "EUR", "rate": 0.1274},
+    {"from": "USD", "to": "CNY", "rate": 7.20},
+    {"from": "CNY", "to": "USD", "rate": 0.1389},
+    {"from": "BWP", "to": "CNY", "rate": 0.528},
+    {"from": "CNY", "to": "BWP", "rate": 1.894},
+
+    # Major currency pairs
+    {"from": "EUR", "to": "USD", "rate": 1.09},
+    {"from": "USD", "to": "EUR", "rate": 0.92},
+    {"from": "GBP", "to": "USD", "rate": 1.27},
+    {"from": "USD", "to": "GBP", "rate": 0.79},
+    {"from": "GBP", "to": "EUR", "rate": 1.16},
+    {"from": "EUR", "to": "GBP", "rate": 0.86},
+]
+
+# Transaction templates for realistic patterns
+TRANSACTION_TEMPLATES = [
+    # Regular monthly transactions
+    {"desc": "Salary deposit", "amount_range": (5000, 15000), "frequency": "monthly"},
+    {"desc": "Rent payment", "amount_range": (800, 2500), "frequency": "monthly"},
+    {"desc": "Utility bill", "amount_range": (100, 400), "frequency": "monthly"},
+    {"desc": "Mobile phone", "amount_range": (50, 150), "frequency": "monthly"},
+    {"desc": "Internet service", "amount_range": (80, 200), "frequency": "monthly"},
+    {"desc": "Insurance premium", "amount_range": (200, 600), "frequency": "monthly"},
+
+    # Weekly transactions
+    {"desc": "Grocery shopping", "amount_range": (150, 500), "frequency": "weekly"},
+    {"desc": "Fuel purchase", "amount_range": (100, 300), "frequency": "weekly"},
+
+    # Occasional transactions
+    {"desc": "Restaurant dining", "amount_range": (50, 300), "frequency": "biweekly"},
+    {"desc": "Online shopping", "amount_range": (100, 800), "frequency": "biweekly"},
+    {"desc": "Medical expense", "amount_range": (100, 1000), "frequency": "quarterly"},
+    {"desc": "Vehicle maintenance", "amount_range": (200, 1500), "frequency": "quarterly"},
+    {"desc": "Clothing purchase", "amount_range": (150, 600), "frequency": "quarterly"},
+    {"desc": "Entertainment", "amount_range": (50, 200), "frequency": "biweekly"},
+    {"desc": "Savings transfer", "amount_range": (500, 2000), "frequency": "monthly"},
+    {"desc": "Investment deposit", "amount_range": (1000, 5000), "frequency": "monthly"},
+]
+
+# Sample transaction requests between accounts, by index into all accounts
+TRANSACTION_REQUEST_DEFINITIONS = [
+    {"from_idx": 0, "to_idx": 1, "amount": "100.00", "description": "Monthly savings transfer"},
+    {"from_idx": 0, "to_idx": 2, "amount": "250.50", "description": "Business expenses"},
+    {"from_idx": 1, "to_idx": 3, "amount": "500.00", "description": "Investment deposit"},
+    {"from_idx": 2, "to_idx": 0, "amount": "75.25", "description": "Refund payment"},
+    {"from_idx": 3, "to_idx": 4, "amount": "1000.00", "description": "Emergency fund top-up"},
+    {"from_idx": 5, "to_idx": 0, "amount": "200.00", "description": "Cross-bank transfer"},
+    {"from_idx": 6, "to_idx": 1, "amount": "350.00", "description": "Savings deposit"},
+    {"from_idx": 0, "to_idx": 7, "amount": "150.00", "description": "Business payment"},
+]
+
+# Names given to provisioned sandbox users, combined by user number
+USER_FIRST_NAMES = [
+    "Kagiso", "Neo", "Lesego", "Tebogo", "Boitumelo", "Thabo", "Onalenna", "Kabelo",
+    "Naledi", "Mpho", "Goitseone", "Tshepo", "Refilwe", "Oratile", "Keabetswe", "Masego",
+]
+USER_LAST_NAMES = [
+    "Molefe", "Kgosi", "Seretse", "Masire", "Mogae", "Khama", "Modise", "Sebele",
+    "Ramotswe", "Motsumi", "Pilane", "Tau", "Dikgang", "Moatlhodi", "Setlhare",
+]
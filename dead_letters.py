@@ -0,0 +1,146 @@
+"""
+Dead-letter store for failed OBP write requests
+
+Every write request that fails (error response, network error, or skipped
+because its circuit was open) is saved to a local SQLite file with its
+method, URL, endpoint, JSON payload, error class and attempt count. A later
+success of the same request removes it again, so the store only holds what
+still needs to be re-driven (see redrive.py).
+"""
+import hashlib
+import json
+import sqlite3
+import threading
+from collections import Counter
+from datetime import datetime, timezone
+import config
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS dead_letters (
+    fingerprint TEXT PRIMARY KEY,
+    method TEXT NOT NULL,
+    url TEXT NOT NULL,
+    endpoint TEXT NOT NULL,
+    payload TEXT,
+    error_class TEXT NOT NULL,
+    status_code INTEGER,
+    error TEXT,
+    attempts INTEGER NOT NULL DEFAULT 1,
+    first_failed_at TEXT NOT NULL,
+    last_failed_at TEXT NOT NULL
+)
+"""
+
+
+def fingerprint(method: str, url: str, payload) -> str:
+    """Identify a request by its method, URL and payload"""
+    body = json.dumps(payload, sort_keys=True) if payload is not None else ""
+    return hashlib.sha1(f"{method} {url} {body}".encode()).hexdigest()
+
+
+class DeadLetterStore:
+    """Failed write requests, persisted to SQLite"""
+
+    def __init__(self, path: str = None):
+        """
+        Args:
+            path: SQLite file (defaults to config.DEAD_LETTER_FILE)
+        """
+        self.path = path or config.DEAD_LETTER_FILE
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(self.path, check_same_thread=False)
+        self._db.row_factory = sqlite3.Row
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(SCHEMA)
+        self._db.commit()
+        self._keys = set()
+        # Dead letters per method and URL, so successes elsewhere skip the fingerprint
+        self._urls = Counter()
+        for row in self._db.execute("SELECT fingerprint, method, url FROM dead_letters"):
+            self._keys.add(row["fingerprint"])
+            self._urls[(row["method"], row["url"])] += 1
+        self.added = 0
+
+    def add(self, method: str, url: str, endpoint: str, payload, error: Exception):
+        """
+        Record a failed request, counting repeated failures as attempts
+
+        Args:
+            method: HTTP method
+            url: Full URL
+            endpoint: Endpoint name
+            payload: JSON payload (None if the body could not be kept)
+            error: Exception describing the failure
+        """
+        key = fingerprint(method, url, payload)
+        now = datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+        with self._lock:
+            self._db.execute(
+                """
+                INSERT INTO dead_letters (fingerprint, method, url, endpoint, payload, error_class,
+                                          status_code, error, first_failed_at, last_failed_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT(fingerprint) DO UPDATE SET
+                    error_class = excluded.error_class,
+                    status_code = excluded.status_code,
+                    error = excluded.error,
+                    attempts = attempts + 1,
+                    last_failed_at = excluded.last_failed_at
+                """,
+                (key, method, url, endpoint,
+                 json.dumps(payload) if payload is not None else None,
+                 type(error).__name__, getattr(error, "status_code", None), str(error)[:1000],
+                 now, now)
+            )
+            self._db.commit()
+            if key not in self._keys:
+                self._keys.add(key)
+                self._urls[(method, url)] += 1
+                self.added += 1
+
+    def holds(self, method: str, url: str) -> bool:
+        """Whether any dead letter was sent with this method to this URL"""
+        return self._urls[(method, url)] > 0
+
+    def resolve(self, method: str, url: str, payload):
+        """Remove a request that has now succeeded"""
+        key = fingerprint(method, url, payload)
+        if key not in self._keys:
+            return
+        with self._lock:
+            self._db.execute("DELETE FROM dead_letters WHERE fingerprint = ?", (key,))
+            self._db.commit()
+            if key in self._keys:
+                self._keys.discard(key)
+                self._urls[(method, url)] -= 1
+
+    def entries(self, endpoint: str = None, max_attempts: int = None) -> list:
+        """
+        List dead letters, oldest first
+
+        Args:
+            endpoint: Only entries for this endpoint
+            max_attempts: Only entries with at most this many attempts
+        """
+        query = "SELECT * FROM dead_letters WHERE 1 = 1"
+        params = []
+        if endpoint:
+            query += " AND endpoint = ?"
+            params.append(endpoint)
+        if max_attempts:
+            query += " AND attempts <= ?"
+            params.append(max_attempts)
+        query += " ORDER BY first_failed_at"
+        with self._lock:
+            rows = self._db.execute(query, params).fetchall()
+        return [
+            dict(row, payload=json.loads(row["payload"]) if row["payload"] else None)
+            for row in rows
+        ]
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def close(self):
+        with self._lock:
+            self._db.close()
@@ -0,0 +1,83 @@
+"""
+Run deadline and request latency tracking for OBPClient
+
+A run deadline stops new requests once the run is close to its time limit,
+and caps the timeouts of requests sent before then so none of them runs
+past it. Requests refused by the deadline raise DeadlineExceeded, a
+CircuitOpenError, so every stage skips its remaining work the same way it
+does for an open circuit.
+
+The latency tracker keeps recent request latencies per endpoint, used to
+decide when to hedge a slow GET with a backup request.
+"""
+import math
+import threading
+import time
+from collections import defaultdict, deque
+from circuit_breaker import CircuitOpenError
+import config
+
+
+class DeadlineExceeded(CircuitOpenError):
+    """Raised instead of sending a request once the run deadline is near"""
+
+    def __init__(self, endpoint: str, remaining: float):
+        self.endpoint = endpoint
+        self.retry_in = float("inf")
+        Exception.__init__(self, f"Run deadline reached ({max(remaining, 0):.0f}s left), "
+                                 f"not sending {endpoint}")
+
+
+class RunDeadline:
+    """Time limit for a whole run"""
+
+    def __init__(self, seconds: float = None, margin: float = None):
+        """
+        Args:
+            seconds: Seconds the run may take from now (defaults to config.RUN_DEADLINE_SECONDS)
+            margin: Seconds before the deadline at which no new requests are sent
+                (defaults to config.RUN_DEADLINE_MARGIN)
+        """
+        self.seconds = config.RUN_DEADLINE_SECONDS if seconds is None else seconds
+        self.margin = config.RUN_DEADLINE_MARGIN if margin is None else margin
+        self.expires_at = time.monotonic() + self.seconds
+
+    def remaining(self) -> float:
+        """Seconds left until the deadline"""
+        return self.expires_at - time.monotonic()
+
+    def check(self, endpoint: str):
+        """Raise if the deadline is too close to start another request"""
+        remaining = self.remaining()
+        if remaining <= self.margin:
+            raise DeadlineExceeded(endpoint, remaining)
+
+
+class LatencyTracker:
+    """Rolling request latencies per endpoint"""
+
+    def __init__(self, window: int = 200, min_samples: int = None, percentile: float = None):
+        """
+        Args:
+            window: Latencies kept per endpoint
+            min_samples: Latencies needed before a hedge delay is given
+                (defaults to config.HEDGE_MIN_SAMPLES)
+            percentile: Percentile of latency after which GETs are hedged
+                (defaults to config.HEDGE_PERCENTILE)
+        """
+        self.min_samples = min_samples or config.HEDGE_MIN_SAMPLES
+        self.percentile = percentile or config.HEDGE_PERCENTILE
+        self._latencies = defaultdict(lambda: deque(maxlen=window))
+        self._lock = threading.Lock()
+
+    def record(self, endpoint: str, seconds: float):
+        with self._lock:
+            self._latencies[endpoint].append(seconds)
+
+    def hedge_delay(self, endpoint: str):
+        """Get the latency percentile of an endpoint, or None without enough samples"""
+        with self._lock:
+            values = sorted(self._latencies.get(endpoint, ()))
+        if len(values) < self.min_samples:
+            return None
+        return values[max(1, math.ceil(self.percentile / 100 * len(values))) - 1]
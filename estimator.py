@@ -0,0 +1,224 @@
+#!/usr/bin/env python3
+"""
+Estimate the cost of a population run before starting it
+
+Counts the requests populate_sandbox would send for a configuration, broken
+down by endpoint, and predicts how long the run takes from per-endpoint
+latency, concurrency, deliberate delays and the server's rate limit. An
+optional calibration probe measures latency against the target server.
+"""
+import argparse
+import math
+import time
+from datetime import timedelta
+from data.sandbox_definitions import (
+    FX_RATE_DEFINITIONS, TRANSACTION_TEMPLATES, TRANSACTION_REQUEST_DEFINITIONS
+)
+from sandbox_plan import plan_sandbox, template_occurs
+import config
+
+# Deliberate sleeps between requests, in seconds
+ENDPOINT_DELAYS = {
+    "create_historical_transaction": 0.1,
+}
+
+
+def run_concurrency(endpoint: str) -> int:
+    """Requests a population run keeps in flight for an endpoint (history runs on worker threads)"""
+    if endpoint == "create_historical_transaction":
+        return config.HISTORY_WORKERS
+    return 1
+
+
+# Latency assumed for endpoints that were not measured, in seconds
+DEFAULT_READ_LATENCY = 0.15
+DEFAULT_WRITE_LATENCY = 0.3
+
+
+def count_history_per_bank(plan: dict) -> int:
+    """Count historical transactions generated per bank with two or more accounts"""
+    count = 0
+    current_date = plan["start_date"]
+    while current_date < plan["end_date"]:
+        count += sum(1 for template in TRANSACTION_TEMPLATES if template_occurs(template, current_date))
+        current_date += timedelta(days=1)
+    return count
+
+
+def count_requests(num_banks: int = None, num_accounts: int = None, months: int = 12,
+                   backend: str = "api", chunk_size: int = None) -> dict:
+    """
+    Count the requests a population run would send, by endpoint
+
+    Args:
+        num_banks: Number of banks (defaults to config.NUM_BANKS)
+        num_accounts: Accounts per bank (defaults to config.NUM_ACCOUNTS_PER_BANK)
+        months: Months of historical transactions
+        backend: "api" or "import"
+        chunk_size: Import transactions per request (import backend only)
+
+    Returns:
+        Dict mapping endpoint name to request count
+    """
+    plan = plan_sandbox("estimate", num_banks=num_banks, num_accounts=num_accounts,
+                        months=months, seed=0)
+    banks = len(plan["banks"])
+    accounts = sum(len(a) for a in plan["accounts"].values())
+    history_banks = sum(1 for a in plan["accounts"].values() if len(a) >= 2)
+    historical = count_history_per_bank(plan) * history_banks
+    counterparties = sum(len(c["businesses"]) for c in plan["counterparties"].values())
+    transaction_requests = sum(
+        1 for txn in TRANSACTION_REQUEST_DEFINITIONS
+        if txn["from_idx"] < accounts and txn["to_idx"] < accounts
+    ) if accounts >= 2 else 0
+
+    counts = {"get_current_user": 1}
+    if backend == "import":
+        chunk_size = chunk_size or config.IMPORT_CHUNK_SIZE
+        # Each historical transaction is imported as a debit and a credit
+        counts["import_sandbox_data"] = max(1, math.ceil(historical * 2 / chunk_size))
+    else:
+        counts["get_bank"] = banks
+        counts["create_bank"] = banks
+        counts["create_account"] = accounts
+        counts["create_historical_transaction"] = historical
+    counts["create_fx_rate"] = banks * len(FX_RATE_DEFINITIONS)
+    counts["create_counterparty"] = counterparties
+    counts["create_transaction_request_account"] = transaction_requests
+    return counts
+
+
+def estimate_duration(counts: dict, latencies: dict = None, concurrency: int = None,
+                      rate_limit_per_minute: int = None) -> dict:
+    """
+    Predict how long each endpoint's requests take
+
+    Stages run one after another, so the total is the sum over endpoints.
+    Within an endpoint, time is bounded by latency and delays spread over the
+    workers, and by the server's rate limit.
+
+    Args:
+        counts: Requests per endpoint from count_requests
+        latencies: Measured seconds per request by endpoint
+        concurrency: Requests in flight at once for every endpoint (defaults
+            to what a population run uses, see run_concurrency)
+        rate_limit_per_minute: Server rate limit (defaults to config.OBP_RATE_LIMIT_PER_MINUTE)
+
+    Returns:
+        Dict mapping endpoint name to predicted seconds
+    """
+    latencies = latencies or {}
+    if rate_limit_per_minute is None:
+        rate_limit_per_minute = config.OBP_RATE_LIMIT_PER_MINUTE
+
+    durations = {}
+    for endpoint, count in counts.items():
+        kind = "read" if endpoint.startswith("get_") else "write"
+        default = DEFAULT_READ_LATENCY if kind == "read" else DEFAULT_WRITE_LATENCY
+        latency = latencies.get(endpoint, latencies.get(kind, default))
+        workers = max(1, concurrency or run_concurrency(endpoint))
+        seconds = count * (latency + ENDPOINT_DELAYS.get(endpoint, 0)) / workers
+        if rate_limit_per_minute:
+            seconds = max(seconds, count / rate_limit_per_minute * 60)
+        durations[endpoint] = seconds
+    return durations
+
+
+def calibrate(client, requests_per_endpoint: int = 5) -> dict:
+    """
+    Measure request latency against the target server
+
+    Reads are measured with get_current_user and get_banks. Writes are
+    measured by re-putting an FX rate on one of the user's banks, which is
+    idempotent, if such a bank exists.
+
+    Args:
+        client: OBP API client
+        requests_per_endpoint: Requests sent to each probed endpoint
+
+    Returns:
+        Dict mapping endpoint name (plus "read" and "write") to median seconds
+    """
+    def median_latency(call) -> float:
+        samples = []
+        for _ in range(requests_per_endpoint):
+            start = time.perf_counter()
+            call()
+            samples.append(time.perf_counter() - start)
+        samples.sort()
+        return samples[len(samples) // 2]
+
+    latencies = {
+        "get_current_user": median_latency(client.get_current_user),
+        "get_banks": median_latency(client.get_banks),
+    }
+    latencies["read"] = max(latencies["get_current_user"], latencies["get_banks"])
+
+    # Imported here to avoid a circular import with sandbox_populator
+    from sandbox_populator import get_username_prefix
+    username, _ = get_username_prefix(client)
+    user_banks = [b.get("id") for b in client.iter_banks() if str(b.get("id", "")).startswith(f"{username}.")]
+    if user_banks:
+        rate = FX_RATE_DEFINITIONS[0]
+        latencies["create_fx_rate"] = median_latency(lambda: client.create_fx_rate(
+            user_banks[0], rate["from"], rate["to"], rate["rate"]
+        ))
+        latencies["write"] = latencies["create_fx_rate"]
+    return latencies
+
+
+def format_duration(seconds: float) -> str:
+    """Format seconds as h/m/s"""
+    seconds = int(round(seconds))
+    hours, rest = divmod(seconds, 3600)
+    minutes, seconds = divmod(rest, 60)
+    if hours:
+        return f"{hours}h {minutes:02d}m {seconds:02d}s"
+    if minutes:
+        return f"{minutes}m {seconds:02d}s"
+    return f"{seconds}s"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Estimate the requests and duration of a population run")
+    parser.add_argument("--banks", type=int, default=config.NUM_BANKS, help="Number of banks")
+    parser.add_argument("--accounts", type=int, default=config.NUM_ACCOUNTS_PER_BANK, help="Accounts per bank")
+    parser.add_argument("--months", type=int, default=12, help="Months of historical transactions")
+    parser.add_argument("--backend", choices=["api", "import"], default="api")
+    parser.add_argument("--concurrency", type=int, default=None,
+                        help="Requests in flight at once for every endpoint (default: as a run does, "
+                             "HISTORY_WORKERS for history and 1 otherwise)")
+    parser.add_argument("--rate-limit", type=int, default=None, help="Server rate limit per minute")
+    parser.add_argument("--probe", action="store_true", help="Measure latency against the target server")
+    parser.add_argument("--probe-requests", type=int, default=5, help="Requests per probed endpoint")
+    args = parser.parse_args()
+
+    print("=" * 60)
+    print("OBP Sandbox Population Estimate")
+    print("=" * 60)
+    print(f"Target: {config.OBP_BASE_URL}")
+    print()
+
+    latencies = {}
+    if args.probe:
+        from obp_client import OBPClient
+
+        print("Calibrating against target server...")
+        latencies = calibrate(OBPClient(), args.probe_requests)
+        for endpoint, latency in latencies.items():
+            print(f"  {endpoint}: {latency * 1000:.0f} ms")
+        print()
+
+    counts = count_requests(args.banks, args.accounts, args.months, args.backend)
+    durations = estimate_duration(counts, latencies, args.concurrency, args.rate_limit)
+
+    print(f"{'Endpoint':<40} {'Requests':>10} {'Duration':>12}")
+    print("-" * 64)
+    for endpoint, count in counts.items():
+        print(f"{endpoint:<40} {count:>10} {format_duration(durations[endpoint]):>12}")
+    print("-" * 64)
+    print(f"{'Total':<40} {sum(counts.values()):>10} {format_duration(sum(durations.values())):>12}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,221 @@
+#!/usr/bin/env python3
+"""
+Populate several OBP instances with the same sandbox
+
+Generates one plan (banks, accounts with their IDs, counterparties and
+historical transactions) and submits it to every target concurrently, each
+target in its own process with its own client, token and log file. A slow
+or failing target does not hold back the others: progress is reported per
+target from its log, and each target's result or error is reported on its
+own. Each target also gets its own dead-letter store, resource docs cache
+and validation report next to its log, so targets neither mix their
+entries nor contend for the same files.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, wait
+from contextlib import redirect_stdout, redirect_stderr
+from urllib.parse import urlparse
+from obp_client import OBPClient
+from response_cache import ResponseCache
+from dead_letters import DeadLetterStore
+from history_watermarks import HistoryWatermarks
+from sandbox_plan import plan_sandbox, iter_plan_transactions, last_history_day
+import config
+
+
+def load_targets(path: str) -> list:
+    """
+    Read targets from a JSON file
+
+    The file holds a list of objects with base_url and optionally name and
+    token (the configured token or credentials are used without one).
+    """
+    with open(path) as f:
+        targets = json.load(f)
+    for target in targets:
+        target["base_url"] = target["base_url"].rstrip("/")
+        target.setdefault("name", urlparse(target["base_url"]).netloc or target["base_url"])
+    return targets
+
+
+def last_line(path: str) -> str:
+    """Get the last non-empty line of a log file"""
+    try:
+        with open(path, "rb") as f:
+            f.seek(max(0, os.path.getsize(path) - 4096))
+            lines = [line.strip() for line in f.read().decode("utf-8", errors="replace").splitlines()]
+    except OSError:
+        return ""
+    return next((line for line in reversed(lines) if line), "")
+
+
+def populate_target(target: dict, plan: dict, planned: list, backend: str, log_path: str) -> dict:
+    """
+    Submit a plan to one target, writing its output to a log file
+
+    Runs in a worker process, so the target's base URL and its own
+    dead-letter store, resource docs cache and validation report (named
+    after the log file) can be set in config for everything that reads
+    them there.
+
+    Returns:
+        Dict with counts of what was created, requests sent and failures
+    """
+    # Imported here to avoid a circular import with sandbox_populator
+    from sandbox_populator import (
+        get_username_prefix, populate_sandbox_from_plan, print_circuit_summary, print_concurrency_limits,
+        print_dead_letters, print_rejected_payloads
+    )
+
+    config.OBP_BASE_URL = target["base_url"]
+    stem = os.path.splitext(log_path)[0]
+    config.DEAD_LETTER_FILE = f"{stem}.dead_letters.db"
+    config.RESOURCE_DOCS_CACHE_FILE = f"{stem}.resource_docs.json"
+    config.VALIDATION_REPORT_FILE = f"{stem}.validation_errors.jsonl"
+    with open(log_path, "w", buffering=1) as log, redirect_stdout(log), redirect_stderr(log):
+        print(f"Target: {target['base_url']}")
+        start = time.perf_counter()
+        client = OBPClient(base_url=target["base_url"], token=target.get("token"),
+                           cache=ResponseCache(), dead_letters=DeadLetterStore())
+        username, user_id = get_username_prefix(client)
+        print(f"Authenticated as: {username} (ID: {user_id})")
+        print()
+
+        if backend == "import":
+            from sandbox_import import populate_sandbox_import
+            owners = [client.get_current_user().get("username")]
+            summary = populate_sandbox_import(client, plan, owners)
+            summary["history_complete"] = summary["transactions"] > 0
+        else:
+            summary = populate_sandbox_from_plan(client, plan, user_id, planned)
+            summary["history_complete"] = summary["transactions"] == summary["planned_transactions"]
+
+        print_circuit_summary(client)
+        print_concurrency_limits(client)
+        print_dead_letters(client)
+        print_rejected_payloads(client)
+        summary["requests"] = client.requests_sent
+        summary["failed_requests"] = client.breakers.error_budget.failures
+        summary["seconds"] = time.perf_counter() - start
+        print("Sandbox population complete!")
+    return summary
+
+
+def fan_out(targets: list, plan: dict, backend: str = "api", log_dir: str = "fanout_logs",
+            poll_seconds: float = 10) -> dict:
+    """
+    Submit one plan to several targets concurrently
+
+    Args:
+        targets: Targets from load_targets
+        plan: Plan from sandbox_plan.plan_sandbox
+        backend: "api" or "import"
+        log_dir: Directory for one log file per target
+        poll_seconds: Seconds between progress reports
+
+    Returns:
+        Dict mapping target name to its summary, or to {"error": message}
+    """
+    os.makedirs(log_dir, exist_ok=True)
+    # Generate the history once, every target gets the same transactions
+    planned = list(iter_plan_transactions(plan)) if backend == "api" else None
+    log_paths = {t["name"]: os.path.join(log_dir, f"{t['name'].replace(':', '_')}.log") for t in targets}
+
+    results = {}
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=len(targets)) as pool:
+        futures = {
+            pool.submit(populate_target, target, plan, planned, backend, log_paths[target["name"]]): target
+            for target in targets
+        }
+        pending = set(futures)
+        while pending:
+            done, pending = wait(pending, timeout=poll_seconds)
+            elapsed = time.perf_counter() - start
+            for future in done:
+                name = futures[future]["name"]
+                try:
+                    results[name] = future.result()
+                    print(f"  [{name}] done in {results[name]['seconds']:.0f}s: "
+                          f"{results[name]['requests']} requests, "
+                          f"{results[name]['failed_requests']} failed")
+                except BaseException as e:
+                    results[name] = {"error": str(e) or type(e).__name__}
+                    print(f"  [{name}] failed after {elapsed:.0f}s: {results[name]['error']}")
+            for future in pending:
+                name = futures[future]["name"]
+                print(f"  [{name}] {elapsed:.0f}s: {last_line(log_paths[name])}")
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Populate several OBP instances with the same sandbox")
+    parser.add_argument("targets", help="JSON file listing targets (name, base_url, token)")
+    parser.add_argument("--backend", choices=["api", "import"], default="api",
+                        help="Create entities one request at a time, or use the sandbox data-import endpoint")
+    parser.add_argument("--username", help="Bank ID prefix (defaults to the first target's user)")
+    parser.add_argument("--months", type=int, default=12, help="Months of historical transactions")
+    parser.add_argument("--seed", type=int, default=None, help="Seed for the generated plan")
+    parser.add_argument("--log-dir", default="fanout_logs", help="Directory for per-target logs")
+    parser.add_argument("--poll", type=float, default=10, help="Seconds between progress reports")
+    args = parser.parse_args()
+
+    targets = load_targets(args.targets)
+    if not targets:
+        parser.error(f"no targets in {args.targets}")
+
+    print("=" * 60)
+    print("OBP Sandbox Fan-out")
+    print("=" * 60)
+    for target in targets:
+        print(f"Target: {target['name']} ({target['base_url']})")
+    print()
+
+    username = args.username
+    if not username:
+        from sandbox_populator import get_username_prefix
+        try:
+            first = targets[0]
+            username, _ = get_username_prefix(OBPClient(base_url=first["base_url"], token=first.get("token")))
+        except Exception as e:
+            print("Error: Could not get current user of the first target. Is authentication configured?")
+            print(f"Details: {e}")
+            sys.exit(1)
+
+    plan = plan_sandbox(username, months=args.months, seed=args.seed)
+    print(f"Plan: {len(plan['banks'])} banks with prefix {username}., seed {plan['seed']}")
+    print(f"Submitting to {len(targets)} targets, logs and dead letters in {args.log_dir}/")
+    print("-" * 40)
+    results = fan_out(targets, plan, args.backend, args.log_dir, args.poll)
+
+    # Record history marks here, so the targets do not race on the file
+    for target in targets:
+        result = results[target["name"]]
+        if result.get("history_complete"):
+            watermarks = HistoryWatermarks(target["base_url"])
+            for accounts in plan["accounts"].values():
+                watermarks.advance(accounts, last_history_day(plan["start_date"], plan["end_date"]))
+            watermarks.save()
+
+    print()
+    print("=" * 60)
+    print("Fan-out complete!")
+    print("=" * 60)
+    print(f"{'Target':<24} {'Banks':>6} {'Accounts':>9} {'History':>8} {'Failed':>7}  Status")
+    for target in targets:
+        result = results[target["name"]]
+        if "error" in result:
+            print(f"{target['name']:<24} {'':>6} {'':>9} {'':>8} {'':>7}  error: {result['error']}")
+            continue
+        print(f"{target['name']:<24} {result['banks']:>6} {result['accounts']:>9} "
+              f"{result['transactions']:>8} {result['failed_requests']:>7}  ok")
+    if any("error" in result for result in results.values()):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
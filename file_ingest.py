@@ -0,0 +1,377 @@
+#!/usr/bin/env python3
+"""
+Streaming ingestion of accounts, counterparties and transactions from files
+
+Reads CSV or JSON lines files (optionally gzip-compressed) lazily, a chunk
+of rows at a time, validates each row and maps it to an OBPClient payload,
+and submits the chunk concurrently before reading the next one. Memory use
+depends on the chunk size, not the file size. Column names match the web
+front end's CSV import (src/lib/csv/parser.ts), with bank_code used as the
+bank ID.
+
+Transactions are submitted with run_partitioned, so each account's
+transactions are posted in file order.
+"""
+import argparse
+import csv
+import gzip
+import itertools
+import json
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+from obp_client import OBPClient
+from account_partitions import run_partitioned
+from dead_letters import DeadLetterStore
+from sandbox_populator import get_username_prefix
+import config
+
+# Invalid rows and failed requests printed before only counting them
+MAX_PRINTED_ERRORS = 20
+
+
+def open_text(path: str):
+    """Open a text file for reading, decompressing .gz files on the fly"""
+    if path.endswith(".gz"):
+        return gzip.open(path, "rt", encoding="utf-8", newline="")
+    return open(path, encoding="utf-8", newline="")
+
+
+def read_rows(path: str):
+    """
+    Lazily read rows from a CSV or JSON lines file
+
+    CSV headers are normalised like the web front end's parser: lower case,
+    with spaces replaced by underscores.
+
+    Yields:
+        Tuples of (line number, row dict)
+    """
+    name = path[:-3] if path.endswith(".gz") else path
+    with open_text(path) as f:
+        if name.endswith((".jsonl", ".ndjson")):
+            for line_number, line in enumerate(f, start=1):
+                if line.strip():
+                    try:
+                        yield line_number, json.loads(line)
+                    except json.JSONDecodeError as e:
+                        yield line_number, {"_error": f"invalid JSON: {e}"}
+        else:
+            reader = csv.reader(f)
+            headers = [h.strip().lower().replace(" ", "_") for h in next(reader, [])]
+            for line_number, values in enumerate(reader, start=2):
+                if any(v.strip() for v in values):
+                    yield line_number, {h: v.strip() for h, v in zip(headers, values)}
+
+
+def chunks(iterable, size: int):
+    """Split an iterable into lists of at most size items, lazily"""
+    iterator = iter(iterable)
+    while True:
+        chunk = list(itertools.islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+class AccountIndex:
+    """Maps (bank_id, account number) to account IDs, loading each bank once"""
+
+    def __init__(self, client: OBPClient):
+        self.client = client
+        self._accounts = {}
+        self._loaded = set()
+        # Banks whose accounts could not be listed, with the error, so they are not retried per row
+        self._failed = {}
+        self._lock = threading.Lock()
+
+    def _load(self, bank_id: str):
+        accounts = list(self.client.iter_accounts_at_bank(bank_id))
+        with self._lock:
+            for account in accounts:
+                account_id = account.get("id") or account.get("account_id")
+                numbers = [r.get("address") for r in account.get("account_routings", [])
+                           if r.get("scheme") == "NUMBER"]
+                for number in numbers + [account.get("label")]:
+                    if number:
+                        self._accounts.setdefault((bank_id, number), account_id)
+            self._loaded.add(bank_id)
+
+    def get(self, bank_id: str, number: str):
+        """
+        Get the account ID for an account number, or None
+
+        Raises:
+            ValueError: The bank's accounts could not be listed (e.g. unknown bank)
+        """
+        if bank_id in self._failed:
+            raise ValueError(f"could not list accounts at bank '{bank_id}': {self._failed[bank_id]}")
+        if bank_id not in self._loaded:
+            try:
+                self._load(bank_id)
+            except Exception as e:
+                self._failed[bank_id] = e
+                raise ValueError(f"could not list accounts at bank '{bank_id}': {e}")
+        return self._accounts.get((bank_id, number))
+
+    def add(self, bank_id: str, number: str, account_id: str):
+        """Record an account created during ingestion"""
+        with self._lock:
+            self._accounts[(bank_id, number)] = account_id
+
+
+def required(row: dict, *fields):
+    """Raise ValueError naming the first missing field"""
+    for field in fields:
+        if not row.get(field):
+            raise ValueError(f"missing '{field}'")
+
+
+def bank_id_of(row: dict, field: str = "bank_code") -> str:
+    """Get a bank ID from a bank_code column, checking OBP's length rule"""
+    bank_id = str(row.get(field) or row.get(field.replace("code", "id")) or "").lower()
+    if not bank_id:
+        raise ValueError(f"missing '{field}'")
+    if len(bank_id) <= 3:
+        raise ValueError(f"'{field}' must be more than 3 characters (OBP requirement)")
+    return bank_id
+
+
+def map_account(row: dict, index: AccountIndex, user_id: str = None):
+    """
+    Map an account row (bank_code, number, currency, label, product_code)
+    to create_account keyword arguments
+
+    Returns:
+        Keyword arguments, or None if the account already exists
+    """
+    bank_id = bank_id_of(row)
+    required(row, "number", "currency")
+    number = str(row["number"])
+    if index.get(bank_id, number):
+        return None
+    return {
+        "bank_id": bank_id,
+        "label": row.get("label") or number,
+        "currency": row["currency"],
+        "user_id": user_id,
+        "product_code": row.get("product_code", ""),
+        "account_routings": [{"scheme": "NUMBER", "address": number}]
+    }
+
+
+def map_counterparty(row: dict, index: AccountIndex, user_id: str = None) -> dict:
+    """
+    Map a counterparty row (bank_code, account_number, name, description,
+    currency and the other_* routing columns) to create_counterparty
+    keyword arguments
+    """
+    bank_id = bank_id_of(row)
+    required(row, "account_number", "name", "currency")
+    account_id = index.get(bank_id, str(row["account_number"]))
+    if not account_id:
+        raise ValueError(f"account '{row['account_number']}' not found at bank '{bank_id}'")
+    return {
+        "bank_id": bank_id,
+        "account_id": account_id,
+        "name": row["name"],
+        "description": (row.get("description") or row["name"])[:36],
+        "currency": row["currency"],
+        "other_account_routing_scheme": row.get("other_account_routing_scheme") or "AccountNumber",
+        "other_account_routing_address": row.get("other_account_routing_address", ""),
+        "other_bank_routing_scheme": row.get("other_bank_routing_scheme") or "BIC",
+        "other_bank_routing_address": row.get("other_bank_routing_address", "")
+    }
+
+
+def map_transaction(row: dict, index: AccountIndex, user_id: str = None) -> dict:
+    """
+    Map a transaction row (date, from_bank_code, from_account_number,
+    to_bank_code, to_account_number, amount, currency, description) to
+    create_historical_transaction keyword arguments
+    """
+    from_bank_id = bank_id_of(row, "from_bank_code")
+    to_bank_id = bank_id_of(row, "to_bank_code")
+    required(row, "date", "from_account_number", "to_account_number", "amount", "currency")
+    if from_bank_id != to_bank_id:
+        raise ValueError("historical transactions must be between accounts at the same bank")
+    try:
+        amount = float(row["amount"])
+    except (TypeError, ValueError):
+        raise ValueError("'amount' must be a number")
+    try:
+        posted = datetime.fromisoformat(str(row["date"]).replace("Z", ""))
+    except ValueError:
+        raise ValueError("'date' is not a valid date (expected YYYY-MM-DD)")
+
+    from_account_id = index.get(from_bank_id, str(row["from_account_number"]))
+    to_account_id = index.get(to_bank_id, str(row["to_account_number"]))
+    if not from_account_id or not to_account_id:
+        missing = row["from_account_number"] if not from_account_id else row["to_account_number"]
+        raise ValueError(f"account '{missing}' not found at bank '{from_bank_id}'")
+
+    timestamp = posted.strftime("%Y-%m-%dT%H:%M:%SZ")
+    return {
+        "bank_id": from_bank_id,
+        "from_account_id": from_account_id,
+        "to_account_id": to_account_id,
+        "amount": f"{amount:.2f}",
+        "currency": row["currency"],
+        "description": (row.get("description") or "Transfer")[:36],
+        "posted": timestamp,
+        "completed": timestamp
+    }
+
+
+# Row mapper, client method and partition keys for each kind of file
+KINDS = {
+    "accounts": (map_account, "create_account",
+                 lambda item: [item["line"]]),
+    "counterparties": (map_counterparty, "create_counterparty",
+                       lambda item: [item["line"]]),
+    "transactions": (map_transaction, "create_historical_transaction",
+                     lambda item: [item["kwargs"]["from_account_id"], item["kwargs"]["to_account_id"]]),
+}
+
+
+def ingest_file(client: OBPClient, path: str, kind: str, index: AccountIndex,
+                user_id: str = None, chunk_size: int = None, workers: int = None) -> Counter:
+    """
+    Stream a file into OBP, one chunk of rows at a time
+
+    Args:
+        client: OBP API client
+        path: CSV or JSON lines file (.gz for compressed)
+        kind: "accounts", "counterparties" or "transactions"
+        index: Account number index shared by the files of a run
+        user_id: Owner of created accounts
+        chunk_size: Rows read, validated and submitted together
+        workers: Number of concurrent requests
+
+    Returns:
+        Counter of rows: created, existing, invalid and failed
+    """
+    chunk_size = chunk_size or config.INGEST_CHUNK_SIZE
+    workers = workers or config.INGEST_WORKERS
+    mapper, method_name, keys = KINDS[kind]
+    method = getattr(client, method_name)
+    totals = Counter()
+    lock = threading.Lock()
+    errors_printed = [0]
+
+    def report(line: int, error) -> None:
+        with lock:
+            errors_printed[0] += 1
+            if errors_printed[0] > MAX_PRINTED_ERRORS:
+                return
+        print(f"    Line {line}: {error}")
+
+    def submit(item: dict):
+        try:
+            result = method(**item["kwargs"])
+        except Exception as e:
+            report(item["line"], e)
+            with lock:
+                chunk_counts["failed"] += 1
+            return
+        if kind == "accounts":
+            index.add(item["kwargs"]["bank_id"], item["number"], result.get("account_id"))
+        with lock:
+            chunk_counts["created"] += 1
+
+    print(f"Ingesting {kind} from {path}")
+    print("-" * 40)
+    start = time.perf_counter()
+    rows_read = 0
+    for chunk_number, chunk in enumerate(chunks(read_rows(path), chunk_size), start=1):
+        chunk_counts = Counter()
+        items = []
+        # Accounts of this chunk, which the index only learns about once they are created
+        chunk_accounts = set()
+        for line, row in chunk:
+            try:
+                if row.get("_error"):
+                    raise ValueError(row["_error"])
+                kwargs = mapper(row, index, user_id)
+            except ValueError as e:
+                report(line, e)
+                chunk_counts["invalid"] += 1
+                continue
+            if kind == "accounts" and kwargs is not None:
+                account_key = (kwargs["bank_id"], str(row["number"]))
+                if account_key in chunk_accounts:
+                    kwargs = None
+                chunk_accounts.add(account_key)
+            if kwargs is None:
+                chunk_counts["existing"] += 1
+                continue
+            items.append({"line": line, "kwargs": kwargs, "number": str(row.get("number", ""))})
+
+        run_partitioned(items, keys, submit, workers)
+
+        rows_read += len(chunk)
+        totals.update(chunk_counts)
+        elapsed = time.perf_counter() - start
+        print(f"  Chunk {chunk_number}: lines {chunk[0][0]}-{chunk[-1][0]}, "
+              f"{chunk_counts['created']} created, {chunk_counts['existing']} existing, "
+              f"{chunk_counts['invalid']} invalid, {chunk_counts['failed']} failed "
+              f"({rows_read / elapsed:.0f} rows/s)")
+
+    print(f"Done: {rows_read} rows, {totals['created']} created, {totals['existing']} existing, "
+          f"{totals['invalid']} invalid, {totals['failed']} failed")
+    print()
+    return totals
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Stream accounts, counterparties and transactions from CSV/JSONL files into OBP"
+    )
+    parser.add_argument("token", nargs="?", default=None,
+                        help="DirectLogin token (uses config if not provided)")
+    parser.add_argument("--accounts", help="Accounts file (bank_code, number, currency, label, product_code)")
+    parser.add_argument("--counterparties", help="Counterparties file (bank_code, account_number, name, ...)")
+    parser.add_argument("--transactions", help="Transactions file (date, from_bank_code, "
+                        "from_account_number, to_bank_code, to_account_number, amount, currency, description)")
+    parser.add_argument("--chunk-size", type=int, default=config.INGEST_CHUNK_SIZE,
+                        help="Rows read and submitted together")
+    parser.add_argument("--workers", type=int, default=config.INGEST_WORKERS,
+                        help="Number of concurrent requests")
+    args = parser.parse_args()
+
+    files = [(kind, getattr(args, kind)) for kind in KINDS if getattr(args, kind)]
+    if not files:
+        parser.error("give at least one of --accounts, --counterparties or --transactions")
+
+    print("=" * 60)
+    print("OBP File Ingestion")
+    print("=" * 60)
+    print(f"Target: {config.OBP_BASE_URL}")
+    print()
+
+    client = OBPClient(token=args.token, dead_letters=DeadLetterStore())
+    try:
+        _, user_id = get_username_prefix(client)
+    except Exception as e:
+        print("Error: Could not get current user. Is authentication configured?")
+        print(f"Details: {e}")
+        sys.exit(1)
+
+    index = AccountIndex(client)
+    totals = Counter()
+    for kind, path in files:
+        totals.update(ingest_file(client, path, kind, index, user_id, args.chunk_size, args.workers))
+
+    print("=" * 60)
+    print("Ingestion complete!")
+    print("=" * 60)
+    print(f"Created: {totals['created']}, existing: {totals['existing']}, "
+          f"invalid: {totals['invalid']}, failed: {totals['failed']}")
+    if totals["failed"]:
+        print("Failed requests were saved to the dead-letter store, resubmit them with: python redrive.py")
+
+
+if __name__ == "__main__":
+    main()
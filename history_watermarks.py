@@ -0,0 +1,89 @@
+"""
+Per-account high-water marks for historical transactions
+
+Records, for every account, the last day whose historical transactions were
+fully submitted, in a local JSON file keyed by OBP base URL. Incremental
+top-up runs start the day after the mark, so keeping a sandbox current only
+costs the days since the previous run.
+
+When a run stops partway, days after the mark that already got history
+are recorded per bank, so the next run does not create them again.
+"""
+import json
+import os
+import threading
+from datetime import datetime, timedelta
+import config
+
+
+class HistoryWatermarks:
+    """High-water marks for account history, persisted to a JSON file"""
+
+    def __init__(self, base_url: str = None, path: str = None):
+        """
+        Args:
+            base_url: OBP instance the marks belong to (defaults to config.OBP_BASE_URL)
+            path: JSON file holding the marks (defaults to config.HISTORY_STATE_FILE)
+        """
+        self.base_url = base_url or config.OBP_BASE_URL
+        self.path = path or config.HISTORY_STATE_FILE
+        self._lock = threading.Lock()
+        self._all = {}
+        if os.path.exists(self.path):
+            with open(self.path) as f:
+                self._all = json.load(f)
+        self.marks = self._all.setdefault(self.base_url, {})
+        self.created_days = self._all.setdefault("created_days", {}).setdefault(self.base_url, {})
+
+    def start_for(self, accounts: list, default_start: datetime) -> datetime:
+        """
+        Get the first day to generate for a group of accounts
+
+        Starts the day after the earliest mark among the accounts. Accounts
+        without a mark do not hold the group back.
+
+        Args:
+            accounts: Account dicts (each with account_id)
+            default_start: Start used when no account has a mark
+        """
+        marks = [self.marks[a["account_id"]] for a in accounts if a["account_id"] in self.marks]
+        if not marks:
+            return default_start
+        return datetime.strptime(min(marks), "%Y-%m-%d") + timedelta(days=1)
+
+    def advance(self, accounts: list, day: datetime):
+        """Record that history up to and including a day was submitted"""
+        value = day.strftime("%Y-%m-%d")
+        with self._lock:
+            for account in accounts:
+                if self.marks.get(account["account_id"], "") < value:
+                    self.marks[account["account_id"]] = value
+
+    def days_created(self, bank_id: str) -> set:
+        """Get the days after the marks on which a bank's history was already created"""
+        return set(self.created_days.get(bank_id, []))
+
+    def record_created_days(self, bank_id: str, days: set, last_day: datetime):
+        """
+        Record the days on which a bank's history was created, after its new mark
+
+        Args:
+            bank_id: Bank ID
+            days: Days ("YYYY-MM-DD") with created history
+            last_day: The bank's new mark; days up to it are dropped
+        """
+        value = last_day.strftime("%Y-%m-%d")
+        with self._lock:
+            later = sorted(day for day in days if day > value)
+            if later:
+                self.created_days[bank_id] = later
+            else:
+                self.created_days.pop(bank_id, None)
+
+    def save(self):
+        """Write the marks back to the file"""
+        with self._lock:
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, "w") as f:
+                json.dump(self._all, f, indent=2, sort_keys=True)
+            os.replace(tmp_path, self.path)
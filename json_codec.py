@@ -0,0 +1,192 @@
+"""
+JSON encoding and decoding for OBPClient
+
+Request bodies are encoded and response bodies decoded with orjson when it
+is installed (it is optional) and with the standard library otherwise, set
+by config.JSON_CODEC.
+
+Payload templates pre-encode the constant part of a request body (keys,
+nesting and fixed values) once, so building a request only encodes the
+variable fields. Write responses are wrapped in LazyJSON, which reads
+top-level string fields such as account_id straight from the response
+bytes and only decodes the whole body when something else is needed.
+"""
+import json
+import re
+from collections.abc import Mapping
+from json.encoder import encode_basestring_ascii
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+import config
+
+# Reused, json.dumps builds a new encoder whenever it gets options
+COMPACT_ENCODER = json.JSONEncoder(separators=(",", ":"))
+
+
+def backend() -> str:
+    """Get the codec in use: "orjson" or "json" """
+    if config.JSON_CODEC == "json" or orjson is None:
+        if config.JSON_CODEC == "orjson":
+            raise RuntimeError("JSON_CODEC=orjson needs orjson: pip install orjson")
+        return "json"
+    return "orjson"
+
+
+def dumps(obj) -> bytes:
+    """Encode an object as compact JSON bytes"""
+    if backend() == "orjson":
+        return orjson.dumps(obj)
+    return COMPACT_ENCODER.encode(obj).encode()
+
+
+def loads(data):
+    """Decode JSON from bytes or str"""
+    if backend() == "orjson":
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+class Field:
+    """Placeholder for a variable field in a PayloadTemplate"""
+
+    def __init__(self, name: str):
+        self.name = name
+
+
+class EncodedPayload:
+    """A rendered template: the encoded body plus the values it was made from"""
+
+    __slots__ = ("template", "values", "data", "_dict")
+
+    def __init__(self, template: "PayloadTemplate", values: dict, data: bytes):
+        self.template = template
+        self.values = values
+        self.data = data
+        self._dict = None
+
+    def to_dict(self) -> dict:
+        """Build the payload as a dict, for validation or the dead-letter store"""
+        if self._dict is None:
+            self._dict = self.template.build(self.values)
+        return self._dict
+
+
+class PayloadTemplate:
+    """Request body with pre-encoded constant parts and Field placeholders"""
+
+    def __init__(self, template: dict):
+        """
+        Args:
+            template: Payload dict; values that change per request are Field
+                placeholders, everything else is encoded once here
+        """
+        self.template = template
+
+        def mark(value):
+            if isinstance(value, Field):
+                return f"\x00{value.name}\x00"
+            if isinstance(value, dict):
+                return {k: mark(v) for k, v in value.items()}
+            if isinstance(value, list):
+                return [mark(v) for v in value]
+            return value
+
+        encoded = COMPACT_ENCODER.encode(mark(template))
+        # Alternating constant text and field names, joined into a format string
+        parts = re.split(r'"\\u0000(\w+)\\u0000"', encoded)
+        self._fields = tuple(parts[1::2])
+        self._format = "%s".join(part.replace("%", "%%") for part in parts[0::2])
+
+    def render(self, **values) -> EncodedPayload:
+        """Fill in the variable fields, encoding only their values"""
+        try:
+            # Fast path for the usual all-string fields
+            encoded = tuple(map(encode_basestring_ascii, map(values.__getitem__, self._fields)))
+        except TypeError:
+            encoded = tuple(encode_basestring_ascii(value) if isinstance(value, str)
+                            else COMPACT_ENCODER.encode(value)
+                            for value in map(values.__getitem__, self._fields))
+        return EncodedPayload(self, values, (self._format % encoded).encode())
+
+    def build(self, values: dict) -> dict:
+        """Build the payload as a plain dict"""
+        def fill(value):
+            if isinstance(value, Field):
+                return values[value.name]
+            if isinstance(value, dict):
+                return {k: fill(v) for k, v in value.items()}
+            if isinstance(value, list):
+                return [fill(v) for v in value]
+            return value
+        return fill(self.template)
+
+
+def encode_body(body) -> bytes:
+    """Encode a request body given as a dict or an EncodedPayload"""
+    if isinstance(body, EncodedPayload):
+        return body.data
+    return dumps(body)
+
+
+def as_dict(body):
+    """Get a request body as a plain dict (or whatever JSON value it is)"""
+    if isinstance(body, EncodedPayload):
+        return body.to_dict()
+    return body
+
+
+class LazyJSON(Mapping):
+    """
+    Read-only JSON object decoded only as far as needed
+
+    A field that is a plain string and comes before the first nested object
+    or array (where OBP puts IDs) is read with a regex. Anything else
+    decodes the whole body once.
+    """
+
+    _patterns = {}
+
+    def __init__(self, content: bytes):
+        self._content = content
+        self._data = None
+
+    def _decoded(self) -> dict:
+        if self._data is None:
+            self._data = loads(self._content)
+        return self._data
+
+    def _scan(self, key: str):
+        """Get a leading top-level string field without decoding, or None"""
+        pattern = self._patterns.get(key)
+        if pattern is None:
+            pattern = self._patterns[key] = re.compile(
+                b'"' + re.escape(key.encode()) + rb'"\s*:\s*"([^"\\]*)"'
+            )
+        match = pattern.search(self._content)
+        if match is None:
+            return None
+        # Only trust a match before anything nested, so it is at the top level
+        content = self._content
+        nested = [i for i in (content.find(b"{", 1), content.find(b"[", 1)) if i != -1]
+        if nested and min(nested) < match.start():
+            return None
+        return match.group(1).decode("utf-8")
+
+    def __getitem__(self, key):
+        if self._data is None and self._content[:1] == b"{":
+            value = self._scan(key)
+            if value is not None:
+                return value
+        return self._decoded()[key]
+
+    def __iter__(self):
+        return iter(self._decoded())
+
+    def __len__(self):
+        return len(self._decoded())
+
+    def __repr__(self):
+        return repr(self._decoded())
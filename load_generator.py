@@ -0,0 +1,352 @@
+#!/usr/bin/env python3
+"""
+Open-loop load generator for capacity testing
+
+Issues populator operations (FX rate, historical transaction and
+counterparty creation through OBPClient) at a target arrival rate that
+follows a constant, ramp, step or spike profile. Requests are sent on
+schedule whether or not earlier ones have returned, and latency is measured
+from each request's intended send time, so time spent queued behind a slow
+server is counted instead of hidden (coordinated omission).
+
+The client's circuit breakers never open and it has no error budget, so an
+overloaded server shows up as errors and latency rather than as requests
+the client refused to send. Any refusals that remain (e.g. a run deadline)
+are reported apart from server errors.
+"""
+import argparse
+import itertools
+import random
+import sys
+import time
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from obp_client import OBPClient
+from circuit_breaker import CircuitBreakers, CircuitOpenError, ErrorBudget
+from data.botswana_businesses import get_businesses, get_business_for_counterparty
+from data.sandbox_definitions import FX_RATE_DEFINITIONS, TRANSACTION_TEMPLATES
+from read_benchmark import percentile, write_samples
+from sandbox_populator import get_username_prefix, discover_bank_accounts
+import config
+
+PROFILES = ("constant", "ramp", "step", "spike")
+
+# Relative weight of each operation in the default mix
+DEFAULT_MIX = {"create_historical_transaction": 6, "create_fx_rate": 3, "create_counterparty": 1}
+
+
+def rate_profile(profile: str, rate: float, peak_rate: float = None, duration: float = 60,
+                 steps: list = None, spike_at: float = None, spike_length: float = 5):
+    """
+    Build the target arrival rate as a function of seconds since the start
+
+    Args:
+        profile: "constant", "ramp" (rate to peak_rate over the run), "step"
+            (each rate in steps for an equal share of the run) or "spike"
+            (peak_rate for spike_length seconds from spike_at, rate otherwise)
+        rate: Base requests per second
+        peak_rate: Final rate of a ramp, or the rate during a spike
+        duration: Run length in seconds
+        steps: Requests per second of each step
+        spike_at: Seconds into the run the spike starts (defaults to halfway)
+        spike_length: Seconds the spike lasts
+
+    Returns:
+        Function mapping elapsed seconds to requests per second
+    """
+    peak_rate = peak_rate if peak_rate is not None else rate * 10
+    if profile == "constant":
+        return lambda t: rate
+    if profile == "ramp":
+        return lambda t: rate + (peak_rate - rate) * min(t / duration, 1.0)
+    if profile == "step":
+        steps = steps or [rate]
+        step_seconds = duration / len(steps)
+        return lambda t: steps[min(int(t // step_seconds), len(steps) - 1)]
+    if profile == "spike":
+        spike_at = duration / 2 if spike_at is None else spike_at
+        return lambda t: peak_rate if spike_at <= t < spike_at + spike_length else rate
+    raise ValueError(f"Unknown profile: {profile}")
+
+
+def arrival_times(rate_at, duration: float, poisson: bool = False, rng: random.Random = None):
+    """
+    Yield intended send times, in seconds since the start
+
+    Args:
+        rate_at: Function mapping elapsed seconds to requests per second
+        duration: Run length in seconds
+        poisson: Use exponentially distributed gaps instead of even spacing
+        rng: Random number generator for Poisson arrivals
+    """
+    rng = rng or random.Random()
+    t = 0.0
+    while t < duration:
+        rate = rate_at(t)
+        if rate <= 0:
+            t += 0.1
+            continue
+        yield t
+        t += rng.expovariate(rate) if poisson else 1.0 / rate
+
+
+def build_operations(client: OBPClient, bank_accounts: dict, currency: str,
+                     mix: dict = None, rng: random.Random = None) -> list:
+    """
+    Build the weighted operation set from the OBPClient create methods
+
+    Args:
+        client: OBP API client
+        bank_accounts: Dict mapping bank_id to account dicts (from discover_bank_accounts)
+        currency: Currency of the accounts
+        mix: Relative weight of each operation, by endpoint name
+        rng: Random number generator used to pick operation arguments
+
+    Returns:
+        List of (endpoint, weight, callable) tuples
+    """
+    mix = mix or DEFAULT_MIX
+    rng = rng or random.Random()
+    bank_ids = list(bank_accounts)
+    pair_banks = [bank_id for bank_id in bank_ids if len(bank_accounts[bank_id]) >= 2]
+    account_list = [account for accounts in bank_accounts.values() for account in accounts]
+    businesses = get_businesses()
+    sequence = itertools.count(1)
+
+    def fx_rate():
+        rate = rng.choice(FX_RATE_DEFINITIONS)
+        return client.create_fx_rate(rng.choice(bank_ids), rate["from"], rate["to"], rate["rate"])
+
+    def historical_transaction():
+        bank_id = rng.choice(pair_banks)
+        from_account, to_account = rng.sample(bank_accounts[bank_id], 2)
+        template = rng.choice(TRANSACTION_TEMPLATES)
+        posted = (datetime.now() - timedelta(days=rng.randint(1, 30))).strftime("%Y-%m-%dT%H:%M:%SZ")
+        return client.create_historical_transaction(
+            bank_id=bank_id,
+            from_account_id=from_account["account_id"],
+            to_account_id=to_account["account_id"],
+            amount=f"{rng.uniform(*template['amount_range']):.2f}",
+            currency=currency,
+            description=template["desc"],
+            posted=posted,
+            completed=posted
+        )
+
+    def counterparty():
+        account = rng.choice(account_list)
+        cp_data = get_business_for_counterparty(rng.choice(businesses), currency)
+        return client.create_counterparty(
+            bank_id=account["bank_id"],
+            account_id=account["account_id"],
+            name=f"{cp_data['name']} {next(sequence)}",
+            description=cp_data["description"],
+            currency=cp_data["currency"],
+            other_account_routing_scheme=cp_data["other_account_routing_scheme"],
+            other_account_routing_address=cp_data["other_account_routing_address"],
+            other_bank_routing_scheme=cp_data["other_bank_routing_scheme"],
+            other_bank_routing_address=cp_data["other_bank_routing_address"],
+            bespoke=cp_data["bespoke"]
+        )
+
+    available = {
+        "create_fx_rate": fx_rate if bank_ids else None,
+        "create_historical_transaction": historical_transaction if pair_banks else None,
+        "create_counterparty": counterparty if account_list else None,
+    }
+    return [
+        (endpoint, weight, available[endpoint])
+        for endpoint, weight in mix.items()
+        if weight > 0 and available.get(endpoint)
+    ]
+
+
+def run_load(operations: list, rate_at, duration: float, max_in_flight: int = 64,
+             poisson: bool = False, seed: int = None) -> list:
+    """
+    Run an open-loop load test
+
+    A dispatcher sends each operation at its intended time onto a worker
+    pool. When every worker is busy, requests wait in the pool's queue and
+    that wait is included in their latency.
+
+    Args:
+        operations: Operations from build_operations
+        rate_at: Function mapping elapsed seconds to requests per second
+        duration: Run length in seconds
+        max_in_flight: Maximum concurrent requests
+        poisson: Use Poisson arrivals instead of even spacing
+        seed: Random seed for operation choice and arrival gaps
+
+    Returns:
+        List of samples (endpoint, intended, seconds, service_seconds, error,
+        and refused when the client refused to send the request)
+    """
+    rng = random.Random(seed)
+    endpoints = [op[0] for op in operations]
+    weights = [op[1] for op in operations]
+    calls = {op[0]: op[2] for op in operations}
+    samples = []
+
+    def execute(endpoint: str, intended: float, start: float) -> None:
+        started = time.perf_counter()
+        refused = False
+        try:
+            calls[endpoint]()
+            error = ""
+        except CircuitOpenError as e:
+            # Refused by the client without a request, not a server error
+            error = type(e).__name__
+            refused = True
+        except Exception as e:
+            error = type(e).__name__
+        finished = time.perf_counter()
+        samples.append({
+            "endpoint": endpoint,
+            "intended": intended - start,
+            "seconds": finished - intended,
+            "service_seconds": finished - started,
+            "error": error,
+            "refused": refused
+        })
+
+    with ThreadPoolExecutor(max_workers=max_in_flight) as pool:
+        start = time.perf_counter()
+        for offset in arrival_times(rate_at, duration, poisson, rng):
+            intended = start + offset
+            delay = intended - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            endpoint = rng.choices(endpoints, weights)[0]
+            pool.submit(execute, endpoint, intended, start)
+    return samples
+
+
+def print_report(samples: list, rate_at, duration: float, interval: float = None):
+    """
+    Print latency per operation and target versus achieved throughput over time
+
+    Requests the client refused to send are counted apart from server
+    errors, and neither counts towards latency or achieved throughput.
+    """
+    interval = interval or max(1.0, round(duration / 12))
+    by_endpoint = defaultdict(list)
+    errors = defaultdict(Counter)
+    refused = Counter()
+    for sample in samples:
+        if sample["error"]:
+            errors[sample["endpoint"]][sample["error"]] += 1
+            if sample["refused"]:
+                refused[sample["endpoint"]] += 1
+        else:
+            by_endpoint[sample["endpoint"]].append(sample)
+
+    print("Latency from intended send time (service time from actual send in brackets):")
+    print(f"{'Operation':<30} {'OK':>7} {'Errors':>7} {'Refused':>8} {'p50 ms':>14} {'p99 ms':>16} "
+          f"{'max ms':>9}")
+    print("-" * 97)
+    for endpoint in sorted(set(by_endpoint) | set(errors)):
+        ok = by_endpoint[endpoint]
+        latency = [s["seconds"] * 1000 for s in ok]
+        service = [s["service_seconds"] * 1000 for s in ok]
+        p50 = f"{percentile(latency, 50):.1f} ({percentile(service, 50):.1f})"
+        p99 = f"{percentile(latency, 99):.1f} ({percentile(service, 99):.1f})"
+        server_errors = sum(errors[endpoint].values()) - refused[endpoint]
+        print(f"{endpoint:<30} {len(ok):>7} {server_errors:>7} {refused[endpoint]:>8} "
+              f"{p50:>14} {p99:>16} {max(latency, default=0):>9.1f}")
+    for endpoint, counts in sorted(errors.items()):
+        for error, count in counts.most_common():
+            print(f"  {endpoint}: {error} x{count}")
+    if refused:
+        print(f"Warning: the client refused {sum(refused.values())} requests without sending them")
+    print()
+
+    print(f"Throughput per {interval:g}s interval:")
+    print(f"{'From s':>7} {'Target/s':>9} {'Sent/s':>8} {'OK/s':>7} {'Refused/s':>10} {'p99 ms':>9}")
+    print("-" * 55)
+    windows = defaultdict(list)
+    for sample in samples:
+        windows[int(sample["intended"] // interval)].append(sample)
+    window = 0
+    while window * interval < duration:
+        window_samples = windows.get(window, [])
+        ok = [s["seconds"] * 1000 for s in window_samples if not s["error"]]
+        sent = [s for s in window_samples if not s["refused"]]
+        print(f"{window * interval:>7.0f} {rate_at(window * interval):>9.1f} "
+              f"{len(sent) / interval:>8.1f} {len(ok) / interval:>7.1f} "
+              f"{(len(window_samples) - len(sent)) / interval:>10.1f} {percentile(ok, 99):>9.1f}")
+        window += 1
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Open-loop load test against a populated OBP sandbox")
+    parser.add_argument("token", nargs="?", default=None,
+                        help="DirectLogin token (uses config if not provided)")
+    parser.add_argument("--prefix", help="Bank ID prefix (defaults to the authenticated user's prefix)")
+    parser.add_argument("--profile", choices=PROFILES, default="constant", help="Arrival rate profile")
+    parser.add_argument("--rate", type=float, default=10, help="Base requests per second")
+    parser.add_argument("--peak-rate", type=float, default=None,
+                        help="Final ramp rate or spike rate (defaults to 10x --rate)")
+    parser.add_argument("--steps", help="Comma-separated rates for the step profile, e.g. 10,20,40")
+    parser.add_argument("--spike-at", type=float, default=None,
+                        help="Seconds into the run the spike starts (defaults to halfway)")
+    parser.add_argument("--spike-length", type=float, default=5, help="Seconds the spike lasts")
+    parser.add_argument("--duration", type=float, default=60, help="Run length in seconds")
+    parser.add_argument("--max-in-flight", type=int, default=64, help="Maximum concurrent requests")
+    parser.add_argument("--poisson", action="store_true", help="Poisson arrivals instead of even spacing")
+    parser.add_argument("--mix", help="Operation weights, e.g. "
+                        "create_historical_transaction=6,create_fx_rate=3,create_counterparty=1")
+    parser.add_argument("--seed", type=int, default=None, help="Random seed")
+    parser.add_argument("--output", help="Write raw samples to this CSV file")
+    args = parser.parse_args()
+
+    steps = [float(s) for s in args.steps.split(",")] if args.steps else None
+    mix = {k: float(v) for k, v in (p.split("=") for p in args.mix.split(","))} if args.mix else None
+    rate_at = rate_profile(args.profile, args.rate, args.peak_rate, args.duration,
+                           steps, args.spike_at, args.spike_length)
+
+    print("=" * 60)
+    print("OBP Open-Loop Load Test")
+    print("=" * 60)
+    print(f"Target: {config.OBP_BASE_URL}")
+    print(f"Profile: {args.profile}, {args.duration:g}s, up to {args.max_in_flight} in flight")
+    print()
+
+    # One pooled connection per in-flight request
+    config.HTTP_POOL_SIZE = max(config.HTTP_POOL_SIZE, args.max_in_flight)
+    # Breakers that never open and no error budget, so overload reaches the report
+    breakers = CircuitBreakers(ErrorBudget(0), failure_rate=float("inf"))
+    client = OBPClient(token=args.token, breakers=breakers)
+
+    prefix = args.prefix
+    if not prefix:
+        try:
+            prefix, _ = get_username_prefix(client)
+        except Exception as e:
+            print("Error: Could not get current user. Is authentication configured?")
+            print(f"Details: {e}")
+            sys.exit(1)
+
+    bank_accounts = discover_bank_accounts(client, prefix)
+    operations = build_operations(client, bank_accounts, config.CURRENCY, mix,
+                                  random.Random(args.seed))
+    if not operations:
+        print(f"No accounts found under bank ID prefix: {prefix}. Populate the sandbox first.")
+        sys.exit(1)
+    print(f"Operations: {', '.join(op[0] for op in operations)}")
+    print("Running...")
+    print()
+
+    samples = run_load(operations, rate_at, args.duration, args.max_in_flight, args.poisson, args.seed)
+    print_report(samples, rate_at, args.duration)
+
+    if args.output:
+        fields = ["endpoint", "intended", "seconds", "service_seconds", "error", "refused"]
+        write_samples(samples, args.output, fields)
+        print()
+        print(f"Wrote {len(samples)} samples to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,331 @@
+#!/usr/bin/env python3
+"""
+Offline microbenchmarks for the sandbox generation hot paths
+
+Times the pure-CPU parts of a population run without a server: the
+day-by-day template loop that generates historical transactions, payload
+construction (and JSON encoding) in OBPClient.create_* methods,
+get_business_for_counterparty and the per-bank FX rate loop. Every
+benchmark is seeded, so runs with the same scale do the same work, and
+reports nanoseconds and allocations per generated item.
+
+Results can be saved as a baseline and later runs compared against it, so
+a generation regression shows up before it reaches a large run.
+"""
+import argparse
+import gc
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import time
+import tracemalloc
+import uuid
+from contextlib import contextmanager, redirect_stdout
+from datetime import datetime, timedelta
+import sandbox_plan
+from obp_client import OBPClient
+from json_codec import encode_body
+from sandbox_populator import create_fx_rates
+from data.botswana_businesses import get_businesses, get_business_for_counterparty
+from data.sandbox_definitions import FX_RATE_DEFINITIONS, TRANSACTION_TEMPLATES
+
+# Fixed end of the history window, so the calendar (and the number of
+# monthly, weekly and quarterly occurrences) is the same on every run
+END_DATE = datetime(2024, 1, 1)
+
+
+class OfflineResponse:
+    """Stands in for a successful empty response"""
+    status_code = 201
+    content = b""
+
+
+class OfflineClient(OBPClient):
+    """OBPClient that builds and encodes request bodies without sending them"""
+
+    def __init__(self):
+        super().__init__(base_url="http://offline", token="offline")
+
+    def _request(self, method: str, endpoint: str, url: str, **kwargs):
+        # Encode the body as requests would before sending it
+        if "json" in kwargs:
+            encode_body(kwargs["json"])
+        return OfflineResponse()
+
+
+@contextmanager
+def scaled_templates(count: int):
+    """Generate history from count templates, repeating the defined ones as needed"""
+    original = sandbox_plan.TRANSACTION_TEMPLATES
+    sandbox_plan.TRANSACTION_TEMPLATES = [
+        TRANSACTION_TEMPLATES[i % len(TRANSACTION_TEMPLATES)] for i in range(count)
+    ]
+    try:
+        yield
+    finally:
+        sandbox_plan.TRANSACTION_TEMPLATES = original
+
+
+def make_accounts(count: int, seed: int) -> list:
+    """Create account dicts with seeded IDs at one bank"""
+    rng = random.Random(seed)
+    return [
+        {"bank_id": "bench.bank", "account_id": str(uuid.UUID(int=rng.getrandbits(128), version=4)),
+         "label": f"Account {i + 1}", "number": f"BENCH{i + 1:06d}", "currency": "BWP",
+         "product_code": "1000"}
+        for i in range(count)
+    ]
+
+
+def generate_history(accounts: list, months: int, templates: int, seed: int) -> list:
+    """Generate the history of one bank from a fixed seed"""
+    start_date = END_DATE - timedelta(days=months * 30)
+    with scaled_templates(templates):
+        return list(sandbox_plan.generate_historical_transactions(
+            "bench.bank", accounts, "BWP", start_date, END_DATE, random.Random(seed)
+        ))
+
+
+def build_benchmarks(accounts: int, months: int, templates: int, seed: int) -> dict:
+    """
+    Set up every benchmark at a scale
+
+    Returns:
+        Dict mapping benchmark name to (function running one operation,
+        number of items the operation produces)
+    """
+    client = OfflineClient()
+    bank_accounts = make_accounts(accounts, seed)
+    history = generate_history(bank_accounts, months, templates, seed)
+    businesses = get_businesses()
+    cp_data = [get_business_for_counterparty(business) for business in businesses]
+    devnull = open(os.devnull, "w")
+
+    def history_generation():
+        return generate_history(bank_accounts, months, templates, seed)
+
+    def historical_payloads():
+        return [client.create_historical_transaction(**tx_data) for tx_data in history]
+
+    def account_payloads():
+        return [client.create_account(bank_id=a["bank_id"], label=a["label"], currency=a["currency"],
+                                      user_id="bench-user", product_code=a["product_code"],
+                                      account_routings=[{"scheme": "NUMBER", "address": a["number"]}])
+                for a in bank_accounts]
+
+    def counterparty_conversion():
+        return [get_business_for_counterparty(business) for business in businesses]
+
+    def counterparty_payloads():
+        return [client.create_counterparty(bank_id="bench.bank", account_id=bank_accounts[0]["account_id"],
+                                           **data)
+                for data in cp_data]
+
+    def fx_rates():
+        # Per-bank FX loop, including its progress output
+        with redirect_stdout(devnull):
+            return [rate for i in range(10) for rate in create_fx_rates(client, f"bench.bank{i}")]
+
+    return {
+        "history_generation": (history_generation, len(history)),
+        "historical_payloads": (historical_payloads, len(history)),
+        "account_payloads": (account_payloads, len(bank_accounts)),
+        "counterparty_conversion": (counterparty_conversion, len(businesses)),
+        "counterparty_payloads": (counterparty_payloads, len(cp_data)),
+        "fx_rates": (fx_rates, 10 * len(FX_RATE_DEFINITIONS)),
+    }
+
+
+def measure(operation, items: int, repeat: int = 5, min_seconds: float = 0.2) -> dict:
+    """
+    Time an operation and count its allocations
+
+    Each sample runs the operation enough times to take at least
+    min_seconds; ns per item is the median over repeat samples. Allocations
+    are measured in a separate run under tracemalloc: blocks still allocated
+    afterwards (the output included) and peak traced memory.
+
+    Returns:
+        Dict with items, ns_per_item, ns_per_item_min, blocks_per_item and
+        peak_bytes_per_item
+    """
+    operation()  # warm up
+    loops = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(loops):
+            operation()
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_seconds or loops >= 1_000_000:
+            break
+        loops *= 2
+
+    gc_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        samples = []
+        for _ in range(repeat):
+            start = time.perf_counter_ns()
+            for _ in range(loops):
+                operation()
+            samples.append((time.perf_counter_ns() - start) / loops / max(items, 1))
+    finally:
+        if gc_enabled:
+            gc.enable()
+
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    tracemalloc.reset_peak()
+    result = operation()
+    _, peak = tracemalloc.get_traced_memory()
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    del result
+    blocks = sum(stat.count_diff for stat in after.compare_to(before, "filename"))
+
+    return {
+        "items": items,
+        "ns_per_item": statistics.median(samples),
+        "ns_per_item_min": min(samples),
+        "blocks_per_item": blocks / max(items, 1),
+        "peak_bytes_per_item": peak / max(items, 1),
+    }
+
+
+def run_benchmarks(accounts: int = 5, months: int = 12, templates: int = None, seed: int = 42,
+                   repeat: int = 5, only: list = None) -> dict:
+    """
+    Run the benchmarks at a scale
+
+    Args:
+        accounts: Accounts at the benchmark bank
+        months: Months of generated history
+        templates: Transaction templates (defaults to the defined ones)
+        seed: Seed for accounts and history
+        repeat: Timing samples per benchmark
+        only: Names of the benchmarks to run (all if not given)
+
+    Returns:
+        Dict with the scale, environment and per-benchmark results
+    """
+    templates = templates or len(TRANSACTION_TEMPLATES)
+    benchmarks = build_benchmarks(accounts, months, templates, seed)
+    results = {}
+    for name, (operation, items) in benchmarks.items():
+        if only and name not in only:
+            continue
+        print(f"  Running {name} ({items} items per op)...")
+        results[name] = measure(operation, items, repeat)
+    return {
+        "scale": {"accounts": accounts, "months": months, "templates": templates, "seed": seed},
+        "python": platform.python_version(),
+        "created": datetime.now().strftime("%Y-%m-%dT%H:%M:%S"),
+        "results": results,
+    }
+
+
+def compare(run: dict, baseline: dict, threshold: float = 10.0) -> list:
+    """
+    Compare a run with a baseline
+
+    Args:
+        run: Result of run_benchmarks
+        baseline: Earlier result of run_benchmarks
+        threshold: Percent increase in ns or blocks per item counted as a regression
+
+    Returns:
+        List of (benchmark, metric, baseline value, new value, percent change)
+        for every regression
+    """
+    regressions = []
+    for name, result in run["results"].items():
+        base = baseline["results"].get(name)
+        if not base:
+            continue
+        for metric in ("ns_per_item", "blocks_per_item"):
+            if not base[metric]:
+                continue
+            change = (result[metric] - base[metric]) / base[metric] * 100
+            if change > threshold:
+                regressions.append((name, metric, base[metric], result[metric], change))
+    return regressions
+
+
+def print_report(run: dict, baseline: dict = None):
+    """Print per-benchmark results, with the change from a baseline if given"""
+    print(f"{'Benchmark':<26} {'Items':>6} {'ns/item':>10} {'min':>10} {'blocks/item':>12} "
+          f"{'peak B/item':>12}" + (f" {'vs base':>8}" if baseline else ""))
+    for name, result in run["results"].items():
+        line = (f"{name:<26} {result['items']:>6} {result['ns_per_item']:>10.0f} "
+                f"{result['ns_per_item_min']:>10.0f} {result['blocks_per_item']:>12.1f} "
+                f"{result['peak_bytes_per_item']:>12.0f}")
+        base = baseline["results"].get(name) if baseline else None
+        if base and base["ns_per_item"]:
+            line += f" {(result['ns_per_item'] - base['ns_per_item']) / base['ns_per_item'] * 100:>+7.1f}%"
+        elif baseline:
+            line += f" {'new':>8}"
+        print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark sandbox generation without a server")
+    parser.add_argument("--accounts", type=int, default=5, help="Accounts at the benchmark bank")
+    parser.add_argument("--months", type=int, default=12, help="Months of generated history")
+    parser.add_argument("--templates", type=int, default=None,
+                        help="Transaction templates, repeating the defined ones (default: all defined)")
+    parser.add_argument("--seed", type=int, default=42, help="Seed for accounts and history")
+    parser.add_argument("--repeat", type=int, default=5, help="Timing samples per benchmark")
+    parser.add_argument("--only", nargs="+", metavar="NAME", help="Only run these benchmarks")
+    parser.add_argument("--save-baseline", nargs="?", const="microbench_baseline.json", metavar="FILE",
+                        help="Save the results as a baseline (default: microbench_baseline.json)")
+    parser.add_argument("--compare", nargs="?", const="microbench_baseline.json", metavar="FILE",
+                        help="Compare with a saved baseline and exit 1 on regressions")
+    parser.add_argument("--threshold", type=float, default=10.0,
+                        help="Percent slowdown or allocation growth counted as a regression")
+    args = parser.parse_args()
+
+    print("=" * 60)
+    print("OBP Sandbox Generation Microbenchmarks")
+    print("=" * 60)
+    print(f"Scale: {args.accounts} accounts, {args.months} months, "
+          f"{args.templates or len(TRANSACTION_TEMPLATES)} templates, seed {args.seed}")
+    print(f"Python {platform.python_version()} ({platform.machine()})")
+    print()
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+
+    run = run_benchmarks(args.accounts, args.months, args.templates, args.seed, args.repeat, args.only)
+    print()
+    print_report(run, baseline)
+
+    if args.save_baseline:
+        with open(args.save_baseline, "w") as f:
+            json.dump(run, f, indent=2)
+        print()
+        print(f"Saved baseline to {args.save_baseline}")
+
+    if baseline:
+        print()
+        if baseline["scale"] != run["scale"] or baseline.get("python") != run["python"]:
+            print(f"Warning: baseline was taken at {baseline['scale']} on Python "
+                  f"{baseline.get('python')}, results may not be comparable")
+        regressions = compare(run, baseline, args.threshold)
+        if not regressions:
+            print(f"No regressions above {args.threshold:.0f}% against {args.compare}")
+            return
+        print(f"Regressions above {args.threshold:.0f}% against {args.compare}:")
+        print("-" * 40)
+        for name, metric, before, after, change in regressions:
+            print(f"  {name} {metric}: {before:.1f} -> {after:.1f} ({change:+.1f}%)")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
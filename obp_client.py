@@ -1,20 +1,135 @@
 """
 OBP API Client for interacting with Open Bank Project API
 """
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed, wait
 import requests
-from typing import Optional
+from typing import Optional, TYPE_CHECKING
+from circuit_breaker import CircuitBreakers, CircuitOpenError
+from concurrency_limits import ConcurrencyLimits, OVERLOAD_STATUSES
+from deadline import RunDeadline, LatencyTracker
+from pagination import paginate
+from json_codec import PayloadTemplate, Field, LazyJSON, encode_body, as_dict, loads
+from response_cache import ResponseCache
 import config
 
+# Imported when used, so short commands do not load them
+if TYPE_CHECKING:
+    from dead_letters import DeadLetterStore
+    from payload_validation import PayloadValidator
+
+
+class APIError(Exception):
+    """Error response from the OBP API"""
+
+    def __init__(self, status_code: int, text: str):
+        self.status_code = status_code
+        self.text = text
+        super().__init__(f"API Error {status_code}: {text}")
+
+
+# Request bodies of the busiest write endpoints, encoded once per process
+HISTORICAL_TRANSACTION_TEMPLATE = PayloadTemplate({
+    "from_account_id": Field("from_account_id"),
+    "to_account_id": Field("to_account_id"),
+    "value": {
+        "currency": Field("currency"),
+        "amount": Field("amount")
+    },
+    "description": Field("description"),
+    "posted": Field("posted"),
+    "completed": Field("completed"),
+    "type": Field("type"),
+    "charge_policy": Field("charge_policy")
+})
+
+COUNTERPARTY_TEMPLATE = PayloadTemplate({
+    "name": Field("name"),
+    "description": Field("description"),
+    "currency": Field("currency"),
+    "other_account_routing_scheme": Field("other_account_routing_scheme"),
+    "other_account_routing_address": Field("other_account_routing_address"),
+    "other_account_secondary_routing_scheme": "",
+    "other_account_secondary_routing_address": "",
+    "other_bank_routing_scheme": Field("other_bank_routing_scheme"),
+    "other_bank_routing_address": Field("other_bank_routing_address"),
+    "other_branch_routing_scheme": "",
+    "other_branch_routing_address": "",
+    "is_beneficiary": Field("is_beneficiary"),
+    "bespoke": Field("bespoke")
+})
+
+TRANSACTION_REQUEST_TEMPLATE = PayloadTemplate({
+    "to": {
+        "bank_id": Field("bank_id"),
+        "account_id": Field("account_id")
+    },
+    "value": {
+        "currency": Field("currency"),
+        "amount": Field("amount")
+    },
+    "description": Field("description")
+})
+
+# Endpoints that send or fetch whole documents and get the bulk read timeout
+BULK_ENDPOINTS = {"import_sandbox_data", "get_resource_docs"}
+
+# Endpoints whose request bodies hold credentials, never dead-lettered
+SENSITIVE_ENDPOINTS = {"create_user"}
+
 
 class OBPClient:
     """Client for interacting with the Open Bank Project API"""
 
-    def __init__(self, base_url: str = None, api_version: str = None, token: str = None):
+    def __init__(self, base_url: str = None, api_version: str = None, token: str = None,
+                 breakers: CircuitBreakers = None, cache: ResponseCache = None,
+                 dead_letters: "DeadLetterStore" = None, deadline: RunDeadline = None,
+                 hedge_gets: bool = None, validator: "PayloadValidator" = None,
+                 limits: ConcurrencyLimits = None):
         self.base_url = base_url or config.OBP_BASE_URL
         self.api_version = api_version or config.OBP_API_VERSION
         self.token = token or config.OBP_DIRECT_LOGIN_TOKEN
+        self.breakers = breakers or CircuitBreakers()
+        # Cache for idempotent GETs, off unless passed in or enabled in config
+        # (cache=False turns it off whatever the config says)
+        if cache is None and config.RESPONSE_CACHE:
+            cache = ResponseCache()
+        self.cache = cache or None
+        # Store for failed write requests, so they can be re-driven later
+        self.dead_letters = dead_letters
+        # Optional time limit for the run, checked before every request
+        self.deadline = deadline
+        # Send a backup for GETs slower than the endpoint's usual tail latency
+        self.hedge_gets = config.HEDGED_GETS if hedge_gets is None else hedge_gets
+        self.latencies = LatencyTracker()
+        self.hedged = 0
+        self._hedge_pool = None
+        # Check request bodies against the target's resource docs before sending
+        if validator is None and config.VALIDATE_PAYLOADS:
+            from payload_validation import PayloadValidator
+            validator = PayloadValidator(self)
+        self.validator = validator
+        # Requests in flight per endpoint, tuned from latency and overload responses
+        if limits is None and config.ADAPTIVE_CONCURRENCY:
+            limits = ConcurrencyLimits()
+        self.limits = limits
+        # Time spent waiting on requests, for profiling
+        self.network_seconds = 0.0
+        self.requests_sent = 0
+        self._stats_lock = threading.Lock()
         self.session = requests.Session()
         self.session.headers.update({"Content-Type": "application/json"})
+        # Allow one pooled connection per worker thread
+        pool_size = max(config.HTTP_POOL_SIZE, limits.max_limit if limits else 0)
+        adapter = requests.adapters.HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        # Record to or replay from an HTTP cassette if configured
+        if config.OBP_RECORD_CASSETTE or config.OBP_REPLAY_CASSETTE:
+            from cassette import install_cassette
+            install_cassette(self.session, config.OBP_RECORD_CASSETTE, config.OBP_REPLAY_CASSETTE,
+                             config.OBP_REPLAY_LATENCY_SCALE, config.HTTP_POOL_SIZE)
 
         # If no token provided, try to login with username/password
         if not self.token:
@@ -38,50 +153,308 @@ class OBPClient:
         if not all([username, password, consumer_key]):
             return  # No credentials configured
 
+        self.token = self.direct_login(username, password, consumer_key)
+        self._set_auth_header()
+        print(f"Successfully logged in as: {username}")
+
+    def direct_login(self, username: str, password: str, consumer_key: str = None) -> str:
+        """
+        Log a user in with DirectLogin, without changing this client's token
+
+        Args:
+            username: Username
+            password: Password
+            consumer_key: Consumer key (defaults to config.OBP_CONSUMER_KEY)
+
+        Returns:
+            The user's DirectLogin token
+        """
+        consumer_key = consumer_key or config.OBP_CONSUMER_KEY
         auth_header = f'DirectLogin username="{username}",password="{password}",consumer_key="{consumer_key}"'
 
-        response = requests.post(
+        response = self.session.post(
             f"{self.base_url}/my/logins/direct",
             headers={
                 "Authorization": auth_header,
                 "Content-Type": "application/json"
-            }
+            },
+            timeout=(config.OBP_CONNECT_TIMEOUT, config.OBP_WRITE_TIMEOUT)
         )
 
         if response.status_code == 201:
-            data = response.json()
-            self.token = data.get("token")
-            self._set_auth_header()
-            print(f"Successfully logged in as: {username}")
-        else:
-            raise Exception(f"Login failed: {response.status_code} - {response.text}")
+            return response.json().get("token")
+        raise APIError(response.status_code, f"Login failed: {response.text}")
 
     def _url(self, path: str) -> str:
         """Build full URL for API endpoint"""
         return f"{self.base_url}/obp/{self.api_version}{path}"
 
-    def _handle_response(self, response: requests.Response) -> dict:
-        """Handle API response and raise errors if needed"""
+    def _request(self, method: str, endpoint: str, url: str, expected_statuses: tuple = (),
+                 **kwargs) -> requests.Response:
+        """
+        Send a request through the run deadline, the endpoint's circuit breaker
+        and its concurrency limit
+
+        Args:
+            method: HTTP method
+            endpoint: Endpoint name the circuit breaker is kept for
+            url: Full URL
+            expected_statuses: Error statuses that are an expected answer, not
+                counted against the circuit breaker nor dead-lettered
+            kwargs: Passed to requests
+
+        Returns:
+            The response, whatever its status code
+        """
+        # Invalid bodies fail here, without a request or a breaker failure
+        if self.validator and kwargs.get("json") is not None:
+            self.validator.check(method, endpoint, url, as_dict(kwargs["json"]))
+        try:
+            if self.deadline:
+                self.deadline.check(endpoint)
+            self.breakers.before_call(endpoint)
+        except CircuitOpenError as e:
+            self._dead_letter(method, endpoint, url, kwargs, e)
+            raise
+        kwargs.setdefault("timeout", self._timeout(method, endpoint))
+        send_kwargs = kwargs
+        if kwargs.get("json") is not None:
+            # Encode with the configured codec instead of requests' json module
+            send_kwargs = dict(kwargs, data=encode_body(kwargs["json"]))
+            del send_kwargs["json"]
+        limit = self.limits.get(endpoint) if self.limits and endpoint not in BULK_ENDPOINTS else None
+        if limit:
+            limit.acquire()
+        start = time.perf_counter()
+        overloaded = True
+        try:
+            response = self._send(method, endpoint, url, **send_kwargs)
+            overloaded = response.status_code in OVERLOAD_STATUSES
+        except requests.RequestException as e:
+            self.breakers.record(endpoint, False)
+            self._dead_letter(method, endpoint, url, kwargs, e)
+            raise
+        finally:
+            if limit:
+                limit.release(time.perf_counter() - start, overloaded)
+        expected = response.status_code in expected_statuses
+        self.breakers.record(endpoint, expected or not self._is_failure(response.status_code))
+        if method != "GET" and response.status_code < 400:
+            if self.cache:
+                self.cache.invalidate(url)
+            # Only build and fingerprint the body when this URL has dead letters to resolve
+            if self.dead_letters is not None and self.dead_letters.holds(method, url):
+                self.dead_letters.resolve(method, url, as_dict(kwargs.get("json")))
+        elif response.status_code >= 400 and response.status_code != 404 and not expected:
+            self._dead_letter(method, endpoint, url, kwargs,
+                              APIError(response.status_code, response.text))
+        return response
+
+    def _timeout(self, method: str, endpoint: str) -> tuple:
+        """Get the (connect, read) timeout for a request, capped by the run deadline"""
+        if endpoint in BULK_ENDPOINTS:
+            read_timeout = config.OBP_BULK_TIMEOUT
+        elif method == "GET":
+            read_timeout = config.OBP_READ_TIMEOUT
+        else:
+            read_timeout = config.OBP_WRITE_TIMEOUT
+        if self.deadline:
+            read_timeout = max(1.0, min(read_timeout, self.deadline.remaining()))
+        return (config.OBP_CONNECT_TIMEOUT, read_timeout)
+
+    def _send(self, method: str, endpoint: str, url: str, **kwargs) -> requests.Response:
+        """
+        Send a request, hedging GETs when enabled
+
+        A hedged GET that has not returned after the endpoint's tail latency
+        gets a backup request, and the first response to arrive is used.
+        """
+        hedge_after = self.latencies.hedge_delay(endpoint) if self.hedge_gets and method == "GET" else None
+        if hedge_after is None:
+            return self._timed_request(method, endpoint, url, **kwargs)
+
+        if self._hedge_pool is None:
+            with self._stats_lock:
+                if self._hedge_pool is None:
+                    self._hedge_pool = ThreadPoolExecutor(max_workers=config.HTTP_POOL_SIZE,
+                                                          thread_name_prefix="hedge")
+        primary = self._hedge_pool.submit(self._timed_request, method, endpoint, url, **kwargs)
+        done, _ = wait([primary], timeout=hedge_after)
+        if done:
+            return primary.result()
+
+        with self._stats_lock:
+            self.hedged += 1
+        backup = self._hedge_pool.submit(self._timed_request, method, endpoint, url, **kwargs)
+        error = None
+        for future in as_completed([primary, backup]):
+            try:
+                return future.result()
+            except requests.RequestException as e:
+                error = e
+        raise error
+
+    def _timed_request(self, method: str, endpoint: str, url: str, **kwargs) -> requests.Response:
+        """Send one HTTP request, recording its latency"""
+        start = time.perf_counter()
+        try:
+            response = self.session.request(method, url, **kwargs)
+        finally:
+            seconds = time.perf_counter() - start
+            with self._stats_lock:
+                self.network_seconds += seconds
+                self.requests_sent += 1
+        self.latencies.record(endpoint, seconds)
+        return response
+
+    def _dead_letter(self, method: str, endpoint: str, url: str, kwargs: dict, error: Exception):
+        """Save a failed write request to the dead-letter store"""
+        # Reads can simply be repeated, streamed bodies cannot be stored and
+        # credentials must not be
+        if (self.dead_letters is None or method == "GET" or "data" in kwargs
+                or endpoint in SENSITIVE_ENDPOINTS):
+            return
+        self.dead_letters.add(method, url, endpoint, as_dict(kwargs.get("json")), error)
+
+    def resubmit(self, method: str, endpoint: str, url: str, payload=None) -> requests.Response:
+        """
+        Send a dead-lettered write request again
+
+        Success removes it from the dead-letter store and failure raises its
+        attempt count there, a 404 included (for a write it usually means a
+        parent entity is missing, which a later re-drive may fix).
+
+        Args:
+            method: HTTP method
+            endpoint: Endpoint name
+            url: Full URL
+            payload: JSON body, or None
+
+        Returns:
+            The response, whatever its status code
+        """
+        kwargs = {"json": payload} if payload is not None else {}
+        response = self._request(method, endpoint, url, **kwargs)
+        if response.status_code == 404:
+            self._dead_letter(method, endpoint, url, kwargs, APIError(404, response.text))
+        return response
+
+    def _get(self, endpoint: str, url: str, params: dict = None, cached: bool = True) -> dict:
+        """
+        Send a GET request, answering from the response cache when possible
+
+        Fresh cached responses are returned without a request. Stale ones
+        with an ETag are revalidated with If-None-Match.
+
+        Args:
+            endpoint: Endpoint name, used for the circuit breaker and cache TTL
+            url: Full URL
+            params: Query parameters
+            cached: Use the response cache (pages of a list are read once, so
+                they are not cached)
+
+        Returns:
+            Response body
+        """
+        if not cached or not self.cache or not self.cache.caches(endpoint):
+            return self._handle_response(self._request("GET", endpoint, url, params=params))
+
+        key = self.cache.key(url, params)
+        entry = self.cache.lookup(key)
+        if entry is not None and entry.fresh:
+            return entry.data
+
+        headers = {}
+        if entry is not None and entry.etag:
+            headers["If-None-Match"] = entry.etag
+        response = self._request("GET", endpoint, url, params=params, headers=headers)
+        if response.status_code == 304 and entry is not None:
+            self.cache.refresh(key, endpoint)
+            return entry.data
+
+        data = self._handle_response(response)
+        self.cache.store(key, endpoint, data, response.headers.get("ETag"))
+        return data
+
+    @staticmethod
+    def _page_params(limit: int = None, offset: int = None) -> dict:
+        """Get the query parameters selecting one page of a list, or None for the whole list"""
+        if limit is None and offset is None:
+            return None
+        params = {"limit": limit or config.LIST_PAGE_SIZE}
+        if offset:
+            params["offset"] = offset
+        return params
+
+    @staticmethod
+    def _is_failure(status_code: int) -> bool:
+        """Whether a status code counts against the endpoint's circuit breaker"""
+        # Not found is an answer and rate limiting is handled by the caller
+        return status_code >= 400 and status_code not in (404, 429)
+
+    def _handle_response(self, response: requests.Response, lazy: bool = False) -> dict:
+        """
+        Handle API response and raise errors if needed
+
+        Args:
+            response: The response
+            lazy: Return a LazyJSON that decodes only the fields read from it
+                (for write responses, of which callers read an ID or two)
+        """
         if response.status_code >= 400:
-            error_msg = f"API Error {response.status_code}: {response.text}"
-            raise Exception(error_msg)
-        return response.json()
+            raise APIError(response.status_code, response.text)
+        if not response.content:
+            return {}
+        if lazy:
+            return LazyJSON(response.content)
+        return loads(response.content)
 
     # User endpoints
     def get_current_user(self) -> dict:
         """Get the currently authenticated user"""
-        response = self.session.get(self._url("/users/current"))
-        return self._handle_response(response)
+        return self._get("get_current_user", self._url("/users/current"))
+
+    def create_user(self, email: str, username: str, password: str,
+                    first_name: str, last_name: str) -> dict:
+        """
+        Create a user who can then log in with DirectLogin
+
+        A 400 or 409 (the username is taken) raises APIError as usual, but
+        is not counted against the circuit breaker.
+        """
+        payload = {
+            "email": email,
+            "username": username,
+            "password": password,
+            "first_name": first_name,
+            "last_name": last_name
+        }
+        response = self._request("POST", "create_user", self._url("/users"),
+                                 expected_statuses=(400, 409), json=payload)
+        return self._handle_response(response, lazy=True)
+
+    def get_resource_docs(self) -> dict:
+        """Get the resource docs (endpoints with their request schemas) of the API version"""
+        return self._get("get_resource_docs", self._url(f"/resource-docs/{self.api_version}/obp"))
 
     # Bank endpoints
-    def get_banks(self) -> dict:
-        """Get list of all banks"""
-        response = self.session.get(self._url("/banks"))
-        return self._handle_response(response)
+    def get_banks(self, limit: int = None, offset: int = None) -> dict:
+        """Get list of all banks, or one page of it when limit or offset is given"""
+        params = self._page_params(limit, offset)
+        return self._get("get_banks", self._url("/banks"), params=params, cached=params is None)
+
+    def iter_banks(self, page_size: int = None):
+        """Yield every bank, a page at a time (see pagination.paginate)"""
+        return paginate(lambda limit, offset: self.get_banks(limit, offset), "banks", page_size)
 
     def get_bank(self, bank_id: str) -> dict:
         """Get a specific bank by ID"""
-        response = self.session.get(self._url(f"/banks/{bank_id}"))
+        return self._get("get_bank", self._url(f"/banks/{bank_id}"))
+
+    def delete_bank(self, bank_id: str) -> dict:
+        """Delete a bank and everything under it (cascading delete)"""
+        response = self._request("DELETE", "delete_bank",
+                                 self._url(f"/management/cascading/banks/{bank_id}"))
         return self._handle_response(response)
 
     def create_bank(self, bank_id: str, full_name: str, short_name: str,
@@ -108,19 +481,37 @@ class OBPClient:
             "website": website,
             "bank_routings": bank_routings or []
         }
-        response = self.session.post(self._url("/banks"), json=payload)
-        return self._handle_response(response)
+        response = self._request("POST", "create_bank", self._url("/banks"), json=payload)
+        return self._handle_response(response, lazy=True)
 
     # Account endpoints
-    def get_accounts_at_bank(self, bank_id: str) -> dict:
-        """Get all accounts at a specific bank"""
-        response = self.session.get(self._url(f"/banks/{bank_id}/accounts"))
+    def get_my_accounts(self) -> dict:
+        """Get the accounts of the current user at every bank"""
+        return self._get("get_my_accounts", self._url("/my/accounts"))
+
+    def get_accounts_at_bank(self, bank_id: str, limit: int = None, offset: int = None) -> dict:
+        """Get all accounts at a specific bank, or one page of them when limit or offset is given"""
+        params = self._page_params(limit, offset)
+        return self._get("get_accounts_at_bank", self._url(f"/banks/{bank_id}/accounts"),
+                         params=params, cached=params is None)
+
+    def iter_accounts_at_bank(self, bank_id: str, page_size: int = None):
+        """Yield every account at a bank, a page at a time (see pagination.paginate)"""
+        return paginate(lambda limit, offset: self.get_accounts_at_bank(bank_id, limit, offset),
+                        "accounts", page_size)
+
+    def delete_account(self, bank_id: str, account_id: str) -> dict:
+        """Delete an account with its transactions and views (cascading delete)"""
+        response = self._request(
+            "DELETE", "delete_account",
+            self._url(f"/management/cascading/banks/{bank_id}/accounts/{account_id}")
+        )
         return self._handle_response(response)
 
     def create_account(self, bank_id: str, label: str, currency: str,
                        balance_amount: str = "0", user_id: str = None,
                        product_code: str = "", branch_id: str = "",
-                       account_routings: list = None) -> dict:
+                       account_routings: list = None, account_id: str = None) -> dict:
         """
         Create a new account at a bank
 
@@ -133,6 +524,7 @@ class OBPClient:
             product_code: Product code for the account type
             branch_id: Branch ID
             account_routings: List of account routing info
+            account_id: Account ID to create the account with (generated by OBP if not given)
         """
         payload = {
             "label": label,
@@ -148,14 +540,39 @@ class OBPClient:
         if user_id:
             payload["user_id"] = user_id
 
-        response = self.session.post(self._url(f"/banks/{bank_id}/accounts"), json=payload)
-        return self._handle_response(response)
+        if account_id:
+            response = self._request("PUT", "create_account",
+                                     self._url(f"/banks/{bank_id}/accounts/{account_id}"), json=payload)
+        else:
+            response = self._request("POST", "create_account",
+                                     self._url(f"/banks/{bank_id}/accounts"), json=payload)
+        return self._handle_response(response, lazy=True)
 
     # Counterparty endpoints
-    def get_counterparties(self, bank_id: str, account_id: str, view_id: str = "owner") -> dict:
-        """Get counterparties for an account"""
-        response = self.session.get(
-            self._url(f"/banks/{bank_id}/accounts/{account_id}/{view_id}/counterparties")
+    def get_counterparties(self, bank_id: str, account_id: str, view_id: str = "owner",
+                           limit: int = None, offset: int = None) -> dict:
+        """Get counterparties for an account, or one page of them when limit or offset is given"""
+        params = self._page_params(limit, offset)
+        return self._get(
+            "get_counterparties",
+            self._url(f"/banks/{bank_id}/accounts/{account_id}/{view_id}/counterparties"),
+            params=params, cached=params is None
+        )
+
+    def iter_counterparties(self, bank_id: str, account_id: str, view_id: str = "owner",
+                            page_size: int = None):
+        """Yield every counterparty of an account, a page at a time (see pagination.paginate)"""
+        return paginate(
+            lambda limit, offset: self.get_counterparties(bank_id, account_id, view_id, limit, offset),
+            "counterparties", page_size
+        )
+
+    def delete_counterparty(self, bank_id: str, account_id: str, counterparty_id: str,
+                            view_id: str = "owner") -> dict:
+        """Delete a counterparty of an account"""
+        response = self._request(
+            "DELETE", "delete_counterparty",
+            self._url(f"/banks/{bank_id}/accounts/{account_id}/{view_id}/counterparties/{counterparty_id}")
         )
         return self._handle_response(response)
 
@@ -185,26 +602,23 @@ class OBPClient:
             view_id: View ID (usually "owner")
             bespoke: List of custom key-value pairs
         """
-        payload = {
-            "name": name,
-            "description": description,
-            "currency": currency,
-            "other_account_routing_scheme": other_account_routing_scheme,
-            "other_account_routing_address": other_account_routing_address,
-            "other_account_secondary_routing_scheme": "",
-            "other_account_secondary_routing_address": "",
-            "other_bank_routing_scheme": other_bank_routing_scheme,
-            "other_bank_routing_address": other_bank_routing_address,
-            "other_branch_routing_scheme": "",
-            "other_branch_routing_address": "",
-            "is_beneficiary": is_beneficiary,
-            "bespoke": bespoke or []
-        }
-        response = self.session.post(
+        payload = COUNTERPARTY_TEMPLATE.render(
+            name=name,
+            description=description,
+            currency=currency,
+            other_account_routing_scheme=other_account_routing_scheme,
+            other_account_routing_address=other_account_routing_address,
+            other_bank_routing_scheme=other_bank_routing_scheme,
+            other_bank_routing_address=other_bank_routing_address,
+            is_beneficiary=is_beneficiary,
+            bespoke=bespoke or []
+        )
+        response = self._request(
+            "POST", "create_counterparty",
             self._url(f"/banks/{bank_id}/accounts/{account_id}/{view_id}/counterparties"),
             json=payload
         )
-        return self._handle_response(response)
+        return self._handle_response(response, lazy=True)
 
     def bank_exists(self, bank_id: str) -> bool:
         """Check if a bank exists"""
@@ -214,6 +628,66 @@ class OBPClient:
         except Exception:
             return False
 
+    # Transaction endpoints
+    def get_transactions(self, bank_id: str, account_id: str, view_id: str = "owner",
+                         limit: int = 50, offset: int = 0,
+                         from_date: str = None, to_date: str = None,
+                         sort_direction: str = None) -> dict:
+        """
+        Get one page of transactions for an account
+
+        Args:
+            bank_id: Bank ID of the account
+            account_id: Account ID
+            view_id: View ID (usually "owner")
+            limit: Maximum number of transactions to return
+            offset: Number of transactions to skip
+            from_date: Only transactions completed on or after this date (ISO format)
+            to_date: Only transactions completed on or before this date (ISO format)
+            sort_direction: "ASC" or "DESC" by completed date
+        """
+        params = {"limit": limit, "offset": offset}
+        if from_date:
+            params["from_date"] = from_date
+        if to_date:
+            params["to_date"] = to_date
+        if sort_direction:
+            params["sort_direction"] = sort_direction
+        return self._get(
+            "get_transactions",
+            self._url(f"/banks/{bank_id}/accounts/{account_id}/{view_id}/transactions"),
+            params=params
+        )
+
+    def iter_transactions(self, bank_id: str, account_id: str, view_id: str = "owner",
+                          from_date: str = None, to_date: str = None,
+                          sort_direction: str = None, page_size: int = None):
+        """
+        Yield every transaction of an account, a page at a time (see pagination.paginate)
+
+        Args:
+            bank_id: Bank ID of the account
+            account_id: Account ID
+            view_id: View ID (usually "owner")
+            from_date: Only transactions completed on or after this date (ISO format)
+            to_date: Only transactions completed on or before this date (ISO format)
+            sort_direction: "ASC" or "DESC" by completed date
+            page_size: Transactions per page (defaults to config.LIST_PAGE_SIZE)
+        """
+        return paginate(
+            lambda limit, offset: self.get_transactions(bank_id, account_id, view_id, limit, offset,
+                                                        from_date, to_date, sort_direction),
+            "transactions", page_size
+        )
+
+    def get_transaction(self, bank_id: str, account_id: str, transaction_id: str,
+                        view_id: str = "owner") -> dict:
+        """Get a single transaction of an account"""
+        return self._get(
+            "get_transaction",
+            self._url(f"/banks/{bank_id}/accounts/{account_id}/{view_id}/transactions/{transaction_id}/transaction")
+        )
+
     # FX Rate endpoints
     def create_fx_rate(self, bank_id: str, from_currency: str, to_currency: str,
                        conversion_value: float, inverse_conversion_value: float = None) -> dict:
@@ -243,8 +717,9 @@ class OBPClient:
             "inverse_conversion_value": inverse_conversion_value,
             "effective_date": datetime.now().strftime("%Y-%m-%dT%H:%M:%SZ")
         }
-        response = self.session.put(self._url(f"/banks/{bank_id}/fx"), json=payload)
-        return self._handle_response(response)
+        response = self._request("PUT", "create_fx_rate",
+                                 self._url(f"/banks/{bank_id}/fx"), json=payload)
+        return self._handle_response(response, lazy=True)
 
     # Historical Transaction endpoints
     def create_historical_transaction(self, bank_id: str, from_account_id: str,
@@ -270,25 +745,75 @@ class OBPClient:
         Returns:
             Historical transaction response
         """
-        payload = {
-            "from_account_id": from_account_id,
-            "to_account_id": to_account_id,
-            "value": {
-                "currency": currency,
-                "amount": amount
-            },
-            "description": description,
-            "posted": posted,
-            "completed": completed,
-            "type": transaction_type,
-            "charge_policy": charge_policy
-        }
-        response = self.session.post(
+        payload = HISTORICAL_TRANSACTION_TEMPLATE.render(
+            from_account_id=from_account_id,
+            to_account_id=to_account_id,
+            currency=currency,
+            amount=amount,
+            description=description,
+            posted=posted,
+            completed=completed,
+            type=transaction_type,
+            charge_policy=charge_policy
+        )
+        response = self._request(
+            "POST", "create_historical_transaction",
             self._url(f"/banks/{bank_id}/management/historical/transactions"),
             json=payload
         )
+        return self._handle_response(response, lazy=True)
+
+    # Sandbox data import endpoints
+    def import_sandbox_data(self, document, secret_token: str = None) -> dict:
+        """
+        Import banks, users, accounts and transactions in one request
+
+        Args:
+            document: Import document as a dict, or an iterable of bytes that
+                is streamed to the server with chunked transfer encoding
+            secret_token: Sandbox data import secret configured on the server
+
+        Returns:
+            Import response (empty dict if the server returns no body)
+        """
+        params = {}
+        secret_token = secret_token or config.OBP_SANDBOX_IMPORT_SECRET
+        if secret_token:
+            params["secret_token"] = secret_token
+
+        if isinstance(document, dict):
+            response = self._request("POST", "import_sandbox_data", self._url("/sandbox/data-import"),
+                                     params=params, json=document)
+        else:
+            response = self._request("POST", "import_sandbox_data", self._url("/sandbox/data-import"),
+                                     params=params, data=document)
         return self._handle_response(response)
 
+    # Dynamic entity endpoints
+    def create_sandbox_action(self, action: str, timestamp: str, details: str = "") -> dict:
+        """
+        Create a record in the personal sandbox_actions dynamic entity
+
+        Args:
+            action: Action name (e.g. "created_bank")
+            timestamp: When the action happened (ISO format: "2024-01-15T10:30:00Z")
+            details: Free text details
+
+        Returns:
+            Created record
+        """
+        payload = {
+            "action": action,
+            "timestamp": timestamp,
+            "details": details
+        }
+        response = self._request(
+            "POST", "create_sandbox_action",
+            f"{self.base_url}/obp/dynamic-entity/my/sandbox_actions",
+            json=payload
+        )
+        return self._handle_response(response, lazy=True)
+
     # Transaction Request endpoints
     def create_transaction_request_account(self, from_bank_id: str, from_account_id: str,
                                            to_bank_id: str, to_account_id: str,
@@ -311,19 +836,16 @@ class OBPClient:
         Returns:
             Transaction request response
         """
-        payload = {
-            "to": {
-                "bank_id": to_bank_id,
-                "account_id": to_account_id
-            },
-            "value": {
-                "currency": currency,
-                "amount": amount
-            },
-            "description": description
-        }
-        response = self.session.post(
+        payload = TRANSACTION_REQUEST_TEMPLATE.render(
+            bank_id=to_bank_id,
+            account_id=to_account_id,
+            currency=currency,
+            amount=amount,
+            description=description
+        )
+        response = self._request(
+            "POST", "create_transaction_request_account",
             self._url(f"/banks/{from_bank_id}/accounts/{from_account_id}/{view_id}/transaction-request-types/ACCOUNT/transaction-requests"),
             json=payload
         )
-        return self._handle_response(response)
+        return self._handle_response(response, lazy=True)
@@ -0,0 +1,56 @@
+"""
+Streaming iteration over paged OBP list endpoints
+
+OBP list endpoints take limit and offset query parameters. paginate walks
+such an endpoint a page at a time and yields its records one by one, while
+the next page is already being fetched in the background, so only the
+current and the next page are ever held in memory and the consumer rarely
+waits on the network.
+"""
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Iterator
+import config
+
+
+def paginate(fetch_page: Callable[[int, int], dict], key: str, page_size: int = None,
+             prefetch: bool = True) -> Iterator[dict]:
+    """
+    Yield the records of a paged list endpoint one by one
+
+    Paging stops at the first page with fewer records than the page size.
+    A server that ignores the paging parameters is handled too: if it
+    returns more than a page, that is everything, and if it returns the same
+    page again, the walk stops there.
+
+    Args:
+        fetch_page: Function taking (limit, offset) and returning a response body
+        key: Field of the response body holding the records (e.g. "banks")
+        page_size: Records per page (defaults to config.LIST_PAGE_SIZE)
+        prefetch: Fetch the next page while the current one is consumed
+
+    Yields:
+        Record dicts
+    """
+    page_size = page_size or config.LIST_PAGE_SIZE
+    executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="prefetch") if prefetch else None
+    offset = 0
+    pending = executor.submit(fetch_page, page_size, offset) if executor else None
+    previous_first = None
+    try:
+        while True:
+            page = pending.result() if executor else fetch_page(page_size, offset)
+            records = page.get(key, [])
+            if offset and records and records[0] == previous_first:
+                print(f"  Warning: {key} paging returned the same page twice, stopping at {offset}")
+                return
+            previous_first = records[0] if records else None
+            offset += len(records)
+            full = len(records) == page_size
+            if full and executor:
+                pending = executor.submit(fetch_page, page_size, offset)
+            yield from records
+            if not full:
+                return
+    finally:
+        if executor:
+            executor.shutdown(wait=False, cancel_futures=True)
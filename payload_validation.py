@@ -0,0 +1,267 @@
+"""
+Local validation of request bodies against OBP resource docs
+
+The request body schemas of the target's resource docs are fetched once,
+cached on disk per OBP instance and API version, and compiled into
+validator functions. OBPClient checks every JSON body before sending it, so
+a payload the server would reject fails in microseconds with
+PayloadValidationError instead of costing a round trip, a slot in the rate
+budget and a failure against the endpoint's circuit breaker. Rejected
+payloads are appended to a JSON lines error report.
+
+Limits the resource docs do not state, such as the 36 character
+description limit, are added as local rules.
+"""
+import json
+import os
+import re
+import threading
+import time
+from datetime import datetime, timezone
+import config
+
+# Limits enforced by OBP but missing from the resource docs, by client endpoint
+LOCAL_RULES = {
+    "create_historical_transaction": {"description": {"type": "string", "maxLength": 36}},
+    "create_counterparty": {"description": {"type": "string", "maxLength": 36}},
+}
+
+# Request body fields holding credentials, masked in the error report
+SECRET_FIELDS = {"password", "secret_token", "token"}
+
+PLACEHOLDER = re.compile(r"^[A-Z][A-Z0-9_]*$")
+
+JSON_TYPES = {
+    "string": str,
+    "boolean": bool,
+    "object": dict,
+    "array": list,
+}
+
+
+class PayloadValidationError(ValueError):
+    """Raised instead of sending a request whose body fails validation"""
+
+    def __init__(self, endpoint: str, errors: list):
+        self.endpoint = endpoint
+        self.errors = errors
+        super().__init__(f"Invalid {endpoint} payload: {'; '.join(errors)}")
+
+
+def compile_schema(schema: dict, path: str = "$"):
+    """
+    Compile a JSON schema into a validator function
+
+    Supports the subset used by OBP resource docs: type, properties,
+    required, items, enum, minLength, maxLength, pattern, minimum and
+    maximum. Unknown keywords are ignored.
+
+    Returns:
+        Function taking a value and returning a list of error messages
+    """
+    checks = []
+    kind = schema.get("type")
+    if isinstance(kind, list):
+        kind = next((k for k in kind if k != "null"), None)
+
+    if kind in JSON_TYPES:
+        expected = JSON_TYPES[kind]
+        checks.append(lambda value: [] if isinstance(value, expected)
+                      else [f"{path}: expected {kind}, got {type(value).__name__}"])
+    elif kind in ("number", "integer"):
+        expected = int if kind == "integer" else (int, float)
+        checks.append(lambda value: [] if isinstance(value, expected) and not isinstance(value, bool)
+                      else [f"{path}: expected {kind}, got {type(value).__name__}"])
+
+    if "enum" in schema:
+        allowed = schema["enum"]
+        checks.append(lambda value: [] if value in allowed else [f"{path}: {value!r} not in {allowed}"])
+    if "maxLength" in schema:
+        max_length = schema["maxLength"]
+        checks.append(lambda value: [f"{path}: longer than {max_length} characters"]
+                      if isinstance(value, str) and len(value) > max_length else [])
+    if "minLength" in schema:
+        min_length = schema["minLength"]
+        checks.append(lambda value: [f"{path}: shorter than {min_length} characters"]
+                      if isinstance(value, str) and len(value) < min_length else [])
+    if "pattern" in schema:
+        pattern = re.compile(schema["pattern"])
+        checks.append(lambda value: [f"{path}: does not match {pattern.pattern}"]
+                      if isinstance(value, str) and not pattern.search(value) else [])
+    if "minimum" in schema:
+        minimum = schema["minimum"]
+        checks.append(lambda value: [f"{path}: below {minimum}"]
+                      if isinstance(value, (int, float)) and value < minimum else [])
+    if "maximum" in schema:
+        maximum = schema["maximum"]
+        checks.append(lambda value: [f"{path}: above {maximum}"]
+                      if isinstance(value, (int, float)) and value > maximum else [])
+
+    required = schema.get("required", [])
+    properties = {name: compile_schema(sub, f"{path}.{name}")
+                  for name, sub in schema.get("properties", {}).items()}
+    if required or properties:
+        def check_object(value):
+            if not isinstance(value, dict):
+                return []
+            errors = [f"{path}.{name}: required" for name in required if name not in value]
+            for name, validate in properties.items():
+                if value.get(name) is not None:
+                    errors.extend(validate(value[name]))
+            return errors
+        checks.append(check_object)
+
+    if "items" in schema and isinstance(schema["items"], dict):
+        validate_item = compile_schema(schema["items"], f"{path}[]")
+        checks.append(lambda value: [error for item in value for error in validate_item(item)]
+                      if isinstance(value, list) else [])
+
+    def validate(value):
+        errors = []
+        for check in checks:
+            errors.extend(check(value))
+            if errors:
+                break
+        return errors
+
+    return validate
+
+
+def merge_rules(schema: dict, rules: dict) -> dict:
+    """Add local property rules to an object schema"""
+    schema = dict(schema or {"type": "object"})
+    properties = dict(schema.get("properties", {}))
+    for name, rule in rules.items():
+        properties[name] = dict(properties.get(name, {}), **rule)
+    schema["properties"] = properties
+    return schema
+
+
+def url_pattern(request_url: str) -> tuple:
+    """
+    Turn a resource doc URL such as /banks/BANK_ID/accounts into a regex
+
+    Returns:
+        (compiled pattern, number of literal segments)
+    """
+    segments = request_url.strip("/").split("/")
+    literal = [not PLACEHOLDER.match(segment) for segment in segments]
+    regex = "/".join(re.escape(s) if lit else "[^/]+" for s, lit in zip(segments, literal))
+    return re.compile(f"^/{regex}/?$"), sum(literal)
+
+
+class PayloadValidator:
+    """Validates request bodies with schemas from the target's resource docs"""
+
+    def __init__(self, client, cache_path: str = None, report_path: str = None,
+                 ttl_hours: float = None):
+        """
+        Args:
+            client: OBPClient whose target's resource docs are used
+            cache_path: JSON file caching the schemas (defaults to config.RESOURCE_DOCS_CACHE_FILE)
+            report_path: JSON lines file rejected payloads are appended to
+                (defaults to config.VALIDATION_REPORT_FILE)
+            ttl_hours: Hours before cached schemas are fetched again
+                (defaults to config.RESOURCE_DOCS_TTL_HOURS)
+        """
+        self.client = client
+        self.cache_path = cache_path or config.RESOURCE_DOCS_CACHE_FILE
+        self.report_path = report_path or config.VALIDATION_REPORT_FILE
+        self.ttl_hours = config.RESOURCE_DOCS_TTL_HOURS if ttl_hours is None else ttl_hours
+        self.rejected = 0
+        self._docs = None
+        self._validators = {}
+        self._lock = threading.Lock()
+
+    def _cache_key(self) -> str:
+        return f"{self.client.base_url} {self.client.api_version}"
+
+    def _load_docs(self) -> list:
+        """Get (verb, request URL, schema) for every write endpoint, from the cache or the server"""
+        cache = {}
+        if os.path.exists(self.cache_path):
+            try:
+                with open(self.cache_path) as f:
+                    cache = json.load(f)
+            except ValueError as e:
+                print(f"  Payload validation: ignoring unreadable {self.cache_path} ({e})")
+        entry = cache.get(self._cache_key())
+        if entry and time.time() - entry["fetched_at"] < self.ttl_hours * 3600:
+            return entry["docs"]
+
+        try:
+            resource_docs = self.client.get_resource_docs().get("resource_docs", [])
+        except Exception as e:
+            print(f"  Payload validation: could not fetch resource docs ({e}), using local rules only")
+            return entry["docs"] if entry else []
+
+        docs = []
+        for doc in resource_docs:
+            schema = doc.get("typed_request_body")
+            if doc.get("request_verb") in ("POST", "PUT") and isinstance(schema, dict):
+                docs.append([doc["request_verb"], doc["request_url"], schema])
+        cache[self._cache_key()] = {"fetched_at": time.time(), "docs": docs}
+        # Several processes may refresh the cache at once, each through its own file
+        tmp_path = f"{self.cache_path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp_path, "w") as f:
+                json.dump(cache, f)
+            os.replace(tmp_path, self.cache_path)
+        except OSError as e:
+            print(f"  Payload validation: could not cache resource docs ({e})")
+        return docs
+
+    def _compile(self, method: str, endpoint: str, path: str):
+        """Compile the validator for an endpoint from its best matching resource doc"""
+        best = None
+        for verb, request_url, schema in self._docs:
+            if verb != method:
+                continue
+            pattern, literal = url_pattern(request_url)
+            if pattern.match(path) and (best is None or literal > best[0]):
+                best = (literal, schema)
+        schema = best[1] if best else None
+        if endpoint in LOCAL_RULES:
+            schema = merge_rules(schema, LOCAL_RULES[endpoint])
+        return compile_schema(schema) if schema else None
+
+    def check(self, method: str, endpoint: str, url: str, payload):
+        """
+        Validate a request body, raising PayloadValidationError if it is invalid
+
+        Args:
+            method: HTTP method
+            endpoint: Client endpoint name
+            url: Full request URL
+            payload: JSON body
+        """
+        key = (method, endpoint)
+        validate = self._validators.get(key, False)
+        if validate is False:
+            with self._lock:
+                if self._docs is None:
+                    self._docs = self._load_docs()
+                prefix = f"{self.client.base_url}/obp/{self.client.api_version}"
+                path = url[len(prefix):] if url.startswith(prefix) else url
+                validate = self._validators[key] = self._compile(method, endpoint, path)
+        if validate is None:
+            return
+        errors = validate(payload)
+        if errors:
+            self._report(endpoint, url, payload, errors)
+            raise PayloadValidationError(endpoint, errors)
+
+    def _report(self, endpoint: str, url: str, payload, errors: list):
+        """Append a rejected payload to the error report"""
+        record = {
+            "timestamp": datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ"),
+            "endpoint": endpoint,
+            "url": url,
+            "errors": errors,
+            "payload": {k: "***" if k in SECRET_FIELDS else v for k, v in payload.items()}
+                       if isinstance(payload, dict) else payload,
+        }
+        with self._lock:
+            self.rejected += 1
+            with open(self.report_path, "a") as f:
+                f.write(json.dumps(record) + "\n")
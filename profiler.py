@@ -0,0 +1,135 @@
+"""
+Per-stage profiling for OBP Sandbox Populator
+
+Wraps each stage of a population run with cProfile and tracemalloc and
+reports where its time went: wall time, CPU time, time blocked on the
+network inside OBPClient requests, time in deliberate sleeps, peak memory
+and the top allocation sites.
+
+CPU, network and sleep time cover every thread of the process, so for
+stages with worker threads (history) they are summed over the workers and
+can exceed the wall time. The function profile covers the thread running
+the stage only; the workers' time shows there as waiting on them.
+"""
+import cProfile
+import io
+import pstats
+import threading
+import time
+import tracemalloc
+from collections import OrderedDict
+from contextlib import contextmanager
+
+
+class StageStats:
+    """Totals for one stage, accumulated over every time it runs"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.wall = 0.0
+        self.cpu = 0.0
+        self.network = 0.0
+        self.requests = 0
+        self.sleep = 0.0
+        self.peak_memory = 0
+        self.allocations = {}
+        self.profile = cProfile.Profile()
+
+
+class StageProfiler:
+    """Profiles named stages of a run and writes a report"""
+
+    def __init__(self, client=None, top: int = 10, frames: int = 1):
+        """
+        Args:
+            client: OBPClient whose network time is attributed to stages
+            top: Number of functions and allocation sites listed per stage
+            frames: Traceback depth kept by tracemalloc
+        """
+        self.client = client
+        self.top = top
+        self.stages = OrderedDict()
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(frames)
+
+    @contextmanager
+    def stage(self, name: str):
+        """Profile the code in the with block as part of the named stage"""
+        stats = self.stages.setdefault(name, StageStats(name))
+        # Time sleeps on every thread, not just this one
+        real_sleep = time.sleep
+        sleep_lock = threading.Lock()
+
+        def timed_sleep(seconds):
+            # Count the requested time, elapsed time would include waiting for the GIL
+            with sleep_lock:
+                stats.sleep += max(0.0, seconds)
+            real_sleep(seconds)
+
+        network_before = self.client.network_seconds if self.client else 0.0
+        requests_before = self.client.requests_sent if self.client else 0
+        snapshot_before = tracemalloc.take_snapshot()
+        tracemalloc.reset_peak()
+        wall_start = time.perf_counter()
+        cpu_start = time.process_time()
+        time.sleep = timed_sleep
+        stats.profile.enable()
+        try:
+            yield stats
+        finally:
+            stats.profile.disable()
+            time.sleep = real_sleep
+            stats.cpu += time.process_time() - cpu_start
+            stats.wall += time.perf_counter() - wall_start
+            stats.peak_memory = max(stats.peak_memory, tracemalloc.get_traced_memory()[1])
+            if self.client:
+                stats.network += self.client.network_seconds - network_before
+                stats.requests += self.client.requests_sent - requests_before
+            for diff in tracemalloc.take_snapshot().compare_to(snapshot_before, "lineno"):
+                if diff.size_diff > 0:
+                    site = str(diff.traceback[0])
+                    stats.allocations[site] = stats.allocations.get(site, 0) + diff.size_diff
+
+    def summary_lines(self) -> list:
+        """Format the per-stage table"""
+        lines = [
+            f"{'Stage':<26} {'Wall s':>9} {'CPU s':>8} {'Network s':>10} {'Sleep s':>8} "
+            f"{'Requests':>9} {'Peak MB':>8}",
+            "-" * 84,
+        ]
+        for stats in self.stages.values():
+            lines.append(
+                f"{stats.name:<26} {stats.wall:>9.2f} {stats.cpu:>8.2f} {stats.network:>10.2f} "
+                f"{stats.sleep:>8.2f} {stats.requests:>9} {stats.peak_memory / 1e6:>8.1f}"
+            )
+        lines.append("(CPU, network and sleep time are summed over all threads)")
+        return lines
+
+    def report(self) -> str:
+        """Build the full report with top functions and allocation sites per stage"""
+        lines = self.summary_lines()
+        for stats in self.stages.values():
+            lines.extend(["", "=" * 84, f"Stage: {stats.name}", "=" * 84, ""])
+
+            lines.append(f"Top {self.top} allocation sites (bytes allocated during stage):")
+            top_sites = sorted(stats.allocations.items(), key=lambda s: s[1], reverse=True)[:self.top]
+            for site, size in top_sites:
+                lines.append(f"  {size / 1024:>10.1f} KiB  {site}")
+            lines.append("")
+
+            if stats.profile.getstats():
+                out = io.StringIO()
+                pstats.Stats(stats.profile, stream=out).sort_stats("cumulative").print_stats(self.top)
+                lines.append(out.getvalue().rstrip())
+        return "\n".join(lines) + "\n"
+
+    def write_report(self, path: str):
+        """Write the full report to a file and print the per-stage table"""
+        with open(path, "w") as f:
+            f.write(self.report())
+        print("Profile:")
+        print("-" * 40)
+        for line in self.summary_lines():
+            print(line)
+        print(f"Full profile report written to {path}")
+        print()
@@ -0,0 +1,29 @@
+"""
+Request pacing shared by worker threads
+"""
+import threading
+import time
+
+
+class RateLimiter:
+    """Spaces requests evenly so that no more than a given rate is sent"""
+
+    def __init__(self, rate_per_second: float):
+        """
+        Args:
+            rate_per_second: Maximum requests per second (0 for no limit)
+        """
+        self.interval = 1.0 / rate_per_second if rate_per_second else 0.0
+        self._next_slot = time.monotonic()
+        self._lock = threading.Lock()
+
+    def wait(self):
+        """Block until the caller may send its next request"""
+        if not self.interval:
+            return
+        with self._lock:
+            now = time.monotonic()
+            slot = max(self._next_slot, now)
+            self._next_slot = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
@@ -0,0 +1,249 @@
+#!/usr/bin/env python3
+"""
+Read-path benchmark for a populated sandbox
+
+Hits the bank, account, counterparty and transaction listing endpoints for
+the accounts under the user's bank ID prefix, concurrently, and records the
+latency of every request together with the number of transactions in the
+account. Comparing latency across history sizes shows where reads degrade.
+"""
+import argparse
+import csv
+import math
+import sys
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from obp_client import OBPClient
+from sandbox_populator import get_username_prefix
+import config
+
+
+def percentile(values: list, pct: float) -> float:
+    """Get a percentile (0-100) of a list of numbers, nearest rank"""
+    if not values:
+        return 0.0
+    values = sorted(values)
+    rank = max(1, math.ceil(pct / 100 * len(values)))
+    return values[rank - 1]
+
+
+def discover_accounts(client: OBPClient, prefix: str, workers: int = 8) -> list:
+    """
+    Find the accounts at every bank under a bank ID prefix
+
+    Returns:
+        List of dicts with bank_id and account_id
+    """
+    bank_ids = [
+        bank.get("id") for bank in client.iter_banks()
+        if str(bank.get("id", "")).startswith(f"{prefix}.")
+    ]
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        results = pool.map(lambda b: list(client.iter_accounts_at_bank(b)), bank_ids)
+        return [
+            {"bank_id": bank_id, "account_id": account.get("id") or account.get("account_id")}
+            for bank_id, accounts in zip(bank_ids, results)
+            for account in accounts
+        ]
+
+
+def walk_transactions(client: OBPClient, account: dict, page_size: int) -> list:
+    """
+    Page through all transactions of an account, timing every page
+
+    Returns:
+        List of samples for the get_transactions endpoint
+    """
+    samples = []
+    offset = 0
+    while True:
+        start = time.perf_counter()
+        try:
+            page = client.get_transactions(account["bank_id"], account["account_id"],
+                                           limit=page_size, offset=offset)
+        except Exception as e:
+            print(f"  Warning: Could not list transactions of {account['account_id']}: {e}")
+            break
+        seconds = time.perf_counter() - start
+        count = len(page.get("transactions", []))
+        samples.append({
+            "endpoint": "get_transactions",
+            "bank_id": account["bank_id"],
+            "account_id": account["account_id"],
+            "offset": offset,
+            "seconds": seconds
+        })
+        offset += count
+        if count < page_size:
+            break
+    for sample in samples:
+        sample["history"] = offset
+    return samples
+
+
+def run_read_benchmark(client: OBPClient, accounts: list, page_size: int = 50,
+                       repeats: int = 5, workers: int = 8) -> list:
+    """
+    Benchmark the read endpoints for a set of accounts
+
+    Each account's transactions are paged through once to measure its history
+    size, then bank, account, counterparty and first-page transaction reads
+    are repeated concurrently.
+
+    Args:
+        client: OBP API client
+        accounts: Accounts from discover_accounts
+        page_size: Transactions per page
+        repeats: Times each read is repeated
+        workers: Number of concurrent requests
+
+    Returns:
+        List of samples (endpoint, bank_id, account_id, history, offset, seconds)
+    """
+    samples = []
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for walk in pool.map(lambda a: walk_transactions(client, a, page_size), accounts):
+            samples.extend(walk)
+
+        history = {s["account_id"]: s["history"] for s in samples}
+        bank_history = defaultdict(int)
+        for account in accounts:
+            bank_history[account["bank_id"]] += history.get(account["account_id"], 0)
+
+        reads = []
+        for _ in range(repeats):
+            for bank_id, total in bank_history.items():
+                reads.append(("get_bank", bank_id, None, total,
+                              lambda b=bank_id: client.get_bank(b)))
+                reads.append(("get_accounts_at_bank", bank_id, None, total,
+                              lambda b=bank_id: client.get_accounts_at_bank(b)))
+            for account in accounts:
+                bank_id, account_id = account["bank_id"], account["account_id"]
+                reads.append(("get_counterparties", bank_id, account_id, history.get(account_id, 0),
+                              lambda b=bank_id, a=account_id: client.get_counterparties(b, a)))
+                reads.append(("get_transactions", bank_id, account_id, history.get(account_id, 0),
+                              lambda b=bank_id, a=account_id: client.get_transactions(b, a, limit=page_size)))
+
+        def timed_read(read) -> dict:
+            endpoint, bank_id, account_id, history_size, call = read
+            start = time.perf_counter()
+            try:
+                call()
+                error = ""
+            except Exception as e:
+                error = str(e)
+            return {
+                "endpoint": endpoint,
+                "bank_id": bank_id,
+                "account_id": account_id,
+                "history": history_size,
+                "offset": 0,
+                "seconds": time.perf_counter() - start,
+                "error": error
+            }
+
+        samples.extend(pool.map(timed_read, reads))
+    return samples
+
+
+def history_bucket(history: int) -> str:
+    """Group history sizes into power-of-two buckets"""
+    if history == 0:
+        return "0"
+    upper = 1
+    while upper < history:
+        upper *= 2
+    return f"{upper // 2 + 1}-{upper}" if upper > 1 else "1"
+
+
+def print_report(samples: list):
+    """Print latency per endpoint and transaction listing latency by history size"""
+    by_endpoint = defaultdict(list)
+    errors = defaultdict(int)
+    for sample in samples:
+        if sample.get("error"):
+            errors[sample["endpoint"]] += 1
+        else:
+            by_endpoint[sample["endpoint"]].append(sample["seconds"] * 1000)
+
+    print(f"{'Endpoint':<24} {'Requests':>9} {'Errors':>7} {'p50 ms':>9} {'p95 ms':>9} {'max ms':>9}")
+    print("-" * 72)
+    for endpoint, values in sorted(by_endpoint.items()):
+        print(f"{endpoint:<24} {len(values):>9} {errors[endpoint]:>7} "
+              f"{percentile(values, 50):>9.1f} {percentile(values, 95):>9.1f} {max(values):>9.1f}")
+    print()
+
+    by_history = defaultdict(list)
+    for sample in samples:
+        if sample["endpoint"] == "get_transactions" and not sample.get("error"):
+            by_history[sample["history"]].append(sample)
+
+    print("Transaction listing by history size (transactions per account):")
+    print(f"{'History':<16} {'Pages':>7} {'p50 ms':>9} {'p95 ms':>9} {'deep page p50 ms':>17}")
+    print("-" * 62)
+    buckets = defaultdict(list)
+    for history, bucket_samples in by_history.items():
+        buckets[history_bucket(history)].extend(bucket_samples)
+    for bucket, bucket_samples in sorted(buckets.items(), key=lambda b: int(b[0].split("-")[0])):
+        values = [s["seconds"] * 1000 for s in bucket_samples]
+        deep = [s["seconds"] * 1000 for s in bucket_samples if s["offset"] > 0]
+        print(f"{bucket:<16} {len(values):>7} {percentile(values, 50):>9.1f} "
+              f"{percentile(values, 95):>9.1f} {percentile(deep, 50) if deep else 0:>17.1f}")
+
+
+def write_samples(samples: list, path: str, fields: list = None):
+    """Write raw samples to a CSV file"""
+    fields = fields or ["endpoint", "bank_id", "account_id", "history", "offset", "seconds", "error"]
+    with open(path, "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=fields, extrasaction="ignore")
+        writer.writeheader()
+        writer.writerows(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark OBP read endpoints on populated sandbox data")
+    parser.add_argument("token", nargs="?", default=None,
+                        help="DirectLogin token (uses config if not provided)")
+    parser.add_argument("--prefix", help="Bank ID prefix (defaults to the authenticated user's prefix)")
+    parser.add_argument("--page-size", type=int, default=50, help="Transactions per page")
+    parser.add_argument("--repeats", type=int, default=5, help="Times each read is repeated")
+    parser.add_argument("--workers", type=int, default=8, help="Number of concurrent requests")
+    parser.add_argument("--output", help="Write raw samples to this CSV file")
+    args = parser.parse_args()
+
+    print("=" * 60)
+    print("OBP Read Benchmark")
+    print("=" * 60)
+    print(f"Target: {config.OBP_BASE_URL}")
+    print()
+
+    # Without the response cache, so every read reaches the server
+    client = OBPClient(token=args.token, cache=False)
+
+    prefix = args.prefix
+    if not prefix:
+        try:
+            prefix, _ = get_username_prefix(client)
+        except Exception as e:
+            print("Error: Could not get current user. Is authentication configured?")
+            print(f"Details: {e}")
+            sys.exit(1)
+
+    accounts = discover_accounts(client, prefix, args.workers)
+    print(f"Found {len(accounts)} accounts under bank ID prefix: {prefix}.")
+    if not accounts:
+        return
+    print()
+
+    samples = run_read_benchmark(client, accounts, args.page_size, args.repeats, args.workers)
+    print_report(samples)
+
+    if args.output:
+        write_samples(samples, args.output)
+        print()
+        print(f"Wrote {len(samples)} samples to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+Re-drive failed requests from the dead-letter store
+
+Resubmits the write requests saved in the dead-letter store concurrently,
+at a bounded request rate. Requests that succeed are removed from the
+store; requests that fail again stay in it with their attempt count raised.
+
+A POST that failed with a read timeout or a dropped connection may have
+been applied by the server anyway, and sending it again could create a
+duplicate. Such requests are left in the store unless --include-ambiguous
+is given.
+"""
+import argparse
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from obp_client import OBPClient
+from dead_letters import DeadLetterStore
+from rate_limiter import RateLimiter
+import config
+
+# Errors after which a request may or may not have reached the server
+AMBIGUOUS_ERRORS = {"ReadTimeout", "ConnectionError", "ChunkedEncodingError"}
+
+
+def is_ambiguous(entry: dict) -> bool:
+    """Whether resending a dead letter could apply it twice (a non-idempotent POST that may have gone through)"""
+    return entry["method"] == "POST" and entry["error_class"] in AMBIGUOUS_ERRORS
+
+
+def redrive(client: OBPClient, entries: list, workers: int = None,
+            rate_per_second: float = None, include_ambiguous: bool = False) -> Counter:
+    """
+    Resubmit dead-lettered requests
+
+    Args:
+        client: OBP API client with the dead-letter store attached
+        entries: Dead letters to resubmit (from DeadLetterStore.entries)
+        workers: Number of concurrent requests
+        rate_per_second: Maximum requests per second (0 for no limit)
+        include_ambiguous: Also resend POSTs that may have been applied
+            already (see is_ambiguous)
+
+    Returns:
+        Counter of outcomes: succeeded, failed, skipped and ambiguous
+    """
+    workers = workers or config.REDRIVE_WORKERS
+    if rate_per_second is None:
+        rate_per_second = config.REDRIVE_RATE_PER_SECOND
+    limiter = RateLimiter(rate_per_second)
+
+    def resubmit(entry: dict) -> str:
+        if not entry["url"].startswith(client.base_url):
+            return "skipped"
+        if not include_ambiguous and is_ambiguous(entry):
+            return "ambiguous"
+        limiter.wait()
+        try:
+            response = client.resubmit(entry["method"], entry["endpoint"], entry["url"], entry["payload"])
+        except Exception as e:
+            print(f"  Failed {entry['endpoint']} {entry['url']}: {e}")
+            return "failed"
+        if response.status_code >= 400:
+            print(f"  Failed {entry['endpoint']} {entry['url']}: API Error {response.status_code}")
+            return "failed"
+        return "succeeded"
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        return Counter(executor.map(resubmit, entries))
+
+
+def print_entries(entries: list):
+    """Print dead letters grouped by endpoint and error class"""
+    groups = Counter((e["endpoint"], e["error_class"], e["status_code"]) for e in entries)
+    for (endpoint, error_class, status_code), count in sorted(groups.items()):
+        status = f" {status_code}" if status_code else ""
+        print(f"  {endpoint:<32} {error_class}{status}: {count}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Resubmit failed requests from the dead-letter store")
+    parser.add_argument("token", nargs="?", default=None,
+                        help="DirectLogin token (uses config if not provided)")
+    parser.add_argument("--store", default=config.DEAD_LETTER_FILE, help="Dead-letter store file")
+    parser.add_argument("--endpoint", help="Only re-drive requests to this endpoint")
+    parser.add_argument("--max-attempts", type=int, default=None,
+                        help="Skip requests that already failed more often than this")
+    parser.add_argument("--workers", type=int, default=config.REDRIVE_WORKERS,
+                        help="Number of concurrent requests")
+    parser.add_argument("--rate", type=float, default=config.REDRIVE_RATE_PER_SECOND,
+                        help="Maximum requests per second (0 for no limit)")
+    parser.add_argument("--include-ambiguous", action="store_true",
+                        help="Also resend POSTs that failed with a read timeout or dropped "
+                             "connection (they may have been applied and could be duplicated)")
+    parser.add_argument("--list", action="store_true", help="List dead letters without re-driving")
+    args = parser.parse_args()
+
+    print("=" * 60)
+    print("OBP Dead-Letter Re-drive")
+    print("=" * 60)
+    print(f"Target: {config.OBP_BASE_URL}")
+    print()
+
+    store = DeadLetterStore(args.store)
+    entries = store.entries(args.endpoint, args.max_attempts)
+    print(f"{len(entries)} dead letters in {args.store}")
+    print_entries(entries)
+    print()
+
+    if not entries or args.list:
+        store.close()
+        return
+
+    client = OBPClient(token=args.token, dead_letters=store)
+    print(f"Re-driving with {args.workers} workers at up to {args.rate:g} requests/s...")
+    print("-" * 40)
+    outcomes = redrive(client, entries, args.workers, args.rate, args.include_ambiguous)
+    store.close()
+
+    print()
+    print("=" * 60)
+    print("Re-drive complete!")
+    print("=" * 60)
+    print(f"Succeeded: {outcomes['succeeded']}")
+    print(f"Failed again: {outcomes['failed']}")
+    if outcomes["skipped"]:
+        print(f"Skipped (recorded against another server): {outcomes['skipped']}")
+    if outcomes["ambiguous"]:
+        print(f"Left in the store (may have been applied, see --include-ambiguous): "
+              f"{outcomes['ambiguous']}")
+    print(f"Remaining dead letters: {len(store)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+"""
+Response cache for idempotent OBP GET endpoints
+
+Responses are kept per URL with a time-to-live per endpoint and evicted in
+least-recently-used order. Expired entries that came with an ETag are kept
+so the next request can be a conditional If-None-Match request, and a
+successful write invalidates cached responses for the written resource,
+its parents and everything under it.
+"""
+import threading
+import time
+from collections import OrderedDict
+from urllib.parse import urlparse
+import config
+
+# Seconds a response stays fresh, by endpoint. Endpoints not listed are not cached.
+DEFAULT_TTLS = {
+    "get_current_user": 300,
+    "get_banks": 30,
+    "get_bank": 60,
+    "get_accounts_at_bank": 30,
+    "get_counterparties": 30,
+}
+
+
+class CacheEntry:
+    """A cached response body with its ETag and expiry time"""
+
+    __slots__ = ("data", "etag", "expires_at")
+
+    def __init__(self, data, etag: str, expires_at: float):
+        self.data = data
+        self.etag = etag
+        self.expires_at = expires_at
+
+    @property
+    def fresh(self) -> bool:
+        return time.monotonic() < self.expires_at
+
+
+class ResponseCache:
+    """LRU cache of GET responses with per-endpoint TTLs"""
+
+    def __init__(self, ttls: dict = None, max_entries: int = None):
+        """
+        Args:
+            ttls: Seconds a response stays fresh, by endpoint name
+            max_entries: Maximum number of cached responses
+        """
+        self.ttls = DEFAULT_TTLS if ttls is None else ttls
+        self.max_entries = max_entries or config.RESPONSE_CACHE_SIZE
+        self.hits = 0
+        self.revalidated = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def caches(self, endpoint: str) -> bool:
+        """Whether responses of an endpoint are cached"""
+        return endpoint in self.ttls
+
+    @staticmethod
+    def key(url: str, params: dict = None) -> tuple:
+        """Build the cache key for a URL and its query parameters"""
+        return (url, tuple(sorted((params or {}).items())))
+
+    def lookup(self, key: tuple):
+        """Get the entry for a key, fresh or not, marking it recently used"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            if entry is not None and entry.fresh:
+                self.hits += 1
+            else:
+                self.misses += 1
+            return entry
+
+    def store(self, key: tuple, endpoint: str, data, etag: str = None):
+        """Cache a response body"""
+        with self._lock:
+            self._entries[key] = CacheEntry(data, etag, time.monotonic() + self.ttls[endpoint])
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def refresh(self, key: tuple, endpoint: str):
+        """Extend an entry's lifetime after a 304 Not Modified response"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                entry.expires_at = time.monotonic() + self.ttls[endpoint]
+                self.revalidated += 1
+
+    def invalidate(self, url: str):
+        """
+        Drop cached responses affected by a write to a URL
+
+        The written resource, its parent collections and everything under it
+        are invalidated. Cascading management deletes are mapped back to the
+        resource path they delete.
+        """
+        parsed = urlparse(url)
+        path = parsed.path.replace("/management/cascading", "", 1).rstrip("/")
+        base = f"{parsed.scheme}://{parsed.netloc}"
+        parents = set()
+        parent = path
+        while parent.count("/") > 3:  # stop at /obp/<version>
+            parent = parent.rsplit("/", 1)[0]
+            parents.add(base + parent)
+        resource = base + path
+
+        with self._lock:
+            for key in list(self._entries):
+                cached_url = key[0]
+                if cached_url in parents or cached_url == resource or cached_url.startswith(resource + "/"):
+                    del self._entries[key]
+
+    def clear(self):
+        """Drop every cached response"""
+        with self._lock:
+            self._entries.clear()
@@ -0,0 +1,282 @@
+"""
+Sandbox data-import backend for OBP Sandbox Populator
+
+Compiles a sandbox plan into the document accepted by OBP's
+/sandbox/data-import endpoint and submits it in a few large requests instead
+of one request per entity. Banks and accounts go in the first request and
+historical transactions follow in chunks, each streamed to the server so a
+large sandbox is never held in memory as one JSON string.
+
+The import endpoint does not cover FX rates, counterparties or transaction
+requests, so those are still created through the per-entity OBPClient calls.
+"""
+import uuid
+from decimal import Decimal
+from itertools import islice
+from typing import Iterator
+from obp_client import OBPClient
+from sandbox_plan import iter_plan_transactions
+from json_codec import dumps
+import config
+
+
+def account_balances(plan: dict) -> dict:
+    """
+    Compute the final balance of every account in a plan
+
+    Walks the plan's historical transactions once without keeping them, so
+    the account balances can be written before the transactions themselves.
+
+    Returns:
+        Dict mapping account_id to Decimal balance
+    """
+    balances = {
+        account["account_id"]: Decimal("0")
+        for accounts in plan["accounts"].values()
+        for account in accounts
+    }
+    for tx in iter_plan_transactions(plan):
+        amount = Decimal(tx["amount"])
+        balances[tx["from_account_id"]] -= amount
+        balances[tx["to_account_id"]] += amount
+    return balances
+
+
+def build_import_banks(plan: dict) -> list:
+    """Convert the plan's banks to the import document format"""
+    return [
+        {
+            "id": bank["bank_id"],
+            "short_name": bank["short_name"],
+            "full_name": bank["full_name"],
+            "logo": "",
+            "website": bank["website"]
+        }
+        for bank in plan["banks"]
+    ]
+
+
+def build_import_accounts(plan: dict, owners: list, balances: dict) -> list:
+    """Convert the plan's accounts to the import document format"""
+    return [
+        {
+            "id": account["account_id"],
+            "bank": account["bank_id"],
+            "label": account["label"],
+            "number": account["number"],
+            "type": account["product_code"],
+            "balance": {
+                "currency": account["currency"],
+                "amount": f"{balances[account['account_id']]:.2f}"
+            },
+            "IBAN": "",
+            "owners": owners,
+            "generate_public_view": False,
+            "generate_accountants_view": False,
+            "generate_auditors_view": False
+        }
+        for accounts in plan["accounts"].values()
+        for account in accounts
+    ]
+
+
+def iter_import_transactions(plan: dict) -> Iterator[dict]:
+    """
+    Convert the plan's historical transactions to import transactions
+
+    The import format is single sided, so each transfer becomes a debit on
+    the source account and a credit on the destination account, each with
+    the running balance of its account. Transaction IDs are derived from the
+    plan's seed and the transaction's place in the plan, so submitting the
+    same plan again after a partial failure reuses them instead of creating
+    duplicates.
+
+    Yields:
+        Import transaction dicts
+    """
+    accounts = {
+        account["account_id"]: account
+        for bank_accounts in plan["accounts"].values()
+        for account in bank_accounts
+    }
+    balances = {account_id: Decimal("0") for account_id in accounts}
+
+    for index, tx in enumerate(iter_plan_transactions(plan)):
+        amount = Decimal(tx["amount"])
+        from_account = accounts[tx["from_account_id"]]
+        to_account = accounts[tx["to_account_id"]]
+
+        for this_account, other_account, value in (
+            (from_account, to_account, -amount),
+            (to_account, from_account, amount),
+        ):
+            balances[this_account["account_id"]] += value
+            yield {
+                "id": str(uuid.uuid5(
+                    uuid.NAMESPACE_URL,
+                    f"{plan['seed']}/{tx['bank_id']}/{this_account['account_id']}/{tx['posted']}/{index}"
+                )),
+                "this_account": {
+                    "id": this_account["account_id"],
+                    "bank": tx["bank_id"]
+                },
+                "counterparty": {
+                    "name": other_account["label"],
+                    "account_number": other_account["number"]
+                },
+                "details": {
+                    "type": "SANDBOX_TAN",
+                    "description": tx["description"],
+                    "posted": tx["posted"],
+                    "completed": tx["completed"],
+                    "new_balance": f"{balances[this_account['account_id']]:.2f}",
+                    "value": f"{value:.2f}"
+                }
+            }
+
+
+def iter_document(banks: list, accounts: list, transactions: list) -> Iterator[bytes]:
+    """
+    Encode an import document piece by piece
+
+    Yields:
+        Encoded chunks of the JSON document
+    """
+    yield b'{"banks": ' + dumps(banks)
+    yield b', "users": [], "accounts": ' + dumps(accounts)
+    yield b', "branches": [], "atms": [], "products": [], "crm_events": []'
+    yield b', "transactions": ['
+    for i, tx in enumerate(transactions):
+        yield (b", " if i else b"") + dumps(tx)
+    yield b"]}"
+
+
+def iter_import_documents(plan: dict, owners: list,
+                          chunk_size: int = None) -> Iterator[tuple]:
+    """
+    Split a plan into import documents
+
+    The first document holds the banks, accounts and the first chunk of
+    transactions, later documents only hold transactions.
+
+    Args:
+        plan: Plan from sandbox_plan.plan_sandbox
+        owners: Usernames that will own the imported accounts
+        chunk_size: Maximum number of import transactions per document
+
+    Yields:
+        Tuples of (transaction_count, encoded document iterator)
+    """
+    chunk_size = chunk_size or config.IMPORT_CHUNK_SIZE
+    banks = build_import_banks(plan)
+    accounts = build_import_accounts(plan, owners, account_balances(plan))
+
+    transactions = iter_import_transactions(plan)
+    first = True
+    while True:
+        chunk = list(islice(transactions, chunk_size))
+        if not chunk and not first:
+            break
+        if first:
+            yield (len(chunk), iter_document(banks, accounts, chunk))
+            first = False
+        else:
+            yield (len(chunk), iter_document([], [], chunk))
+
+
+def import_sandbox(client: OBPClient, plan: dict, owners: list,
+                   chunk_size: int = None) -> int:
+    """
+    Submit a plan through the sandbox data-import endpoint
+
+    Args:
+        client: OBP API client
+        plan: Plan from sandbox_plan.plan_sandbox
+        owners: Usernames that will own the imported accounts
+        chunk_size: Maximum number of import transactions per request
+
+    Returns:
+        Number of import transactions submitted
+    """
+    total = 0
+    for i, (count, document) in enumerate(iter_import_documents(plan, owners, chunk_size)):
+        print(f"  Submitting import document {i + 1} ({count} transactions)...")
+        client.import_sandbox_data(document)
+        total += count
+    return total
+
+
+def populate_sandbox_import(client: OBPClient, plan: dict, owners: list,
+                            chunk_size: int = None, export=None) -> dict:
+    """
+    Populate a sandbox from a plan using the data-import endpoint
+
+    Banks, accounts and historical transactions are imported in bulk, then
+    FX rates, counterparties and transaction requests fall back to the
+    per-entity API calls.
+
+    Args:
+        client: OBP API client
+        plan: Plan from sandbox_plan.plan_sandbox
+        owners: Usernames that will own the imported accounts
+        chunk_size: Maximum number of import transactions per request
+        export: Optional analytics_export.AnalyticsExport of created entities.
+            Imported transactions are exported as planned, without server IDs
+
+    Returns:
+        Dict with counts of what was created
+    """
+    # Imported here to avoid a circular import with sandbox_populator
+    from sandbox_populator import create_fx_rates, create_counterparties, create_transaction_requests
+
+    print("Importing banks, accounts and historical transactions...")
+    print("-" * 40)
+    imported = import_sandbox(client, plan, owners, chunk_size)
+    print(f"Imported {len(plan['banks'])} banks and {imported} transactions")
+    print()
+    if export:
+        for bank in plan["banks"]:
+            export.add_bank(bank)
+        for accounts in plan["accounts"].values():
+            for account in accounts:
+                export.add_account(account)
+        for tx in iter_plan_transactions(plan):
+            export.add_transaction(tx)
+
+    print("Creating FX rates...")
+    print("-" * 40)
+    fx_rates = []
+    for bank in plan["banks"]:
+        print(f"FX rates for bank: {bank['bank_id']}")
+        fx_rates.extend(create_fx_rates(client, bank["bank_id"]))
+    print()
+
+    print("Creating counterparties...")
+    print("-" * 40)
+    counterparties = []
+    for bank_id, cp_plan in plan["counterparties"].items():
+        print(f"  Adding counterparties to account: {cp_plan['account_id']}")
+        counterparties.extend(create_counterparties(
+            client, bank_id, cp_plan["account_id"],
+            cp_plan["businesses"], plan["currency"], export
+        ))
+    print(f"Created {len(counterparties)} counterparties")
+    print()
+
+    all_accounts = [account for accounts in plan["accounts"].values() for account in accounts]
+    transaction_requests = []
+    if len(all_accounts) >= 2:
+        print("Creating transaction requests...")
+        print("-" * 40)
+        transaction_requests = create_transaction_requests(client, all_accounts, plan["currency"])
+        print(f"Created {len(transaction_requests)} transaction requests")
+        print()
+
+    return {
+        "banks": len(plan["banks"]),
+        "accounts": len(all_accounts),
+        "transactions": imported,
+        "fx_rates": len(fx_rates),
+        "counterparties": len(counterparties),
+        "transaction_requests": len(transaction_requests)
+    }
@@ -0,0 +1,220 @@
+"""
+Sandbox plan for OBP Sandbox Populator
+
+Describes everything the populator would create (banks, accounts,
+counterparties, FX rates and historical transactions) without touching the
+API. Historical transactions are generated lazily from a seed so that a plan
+can be walked several times and always produce the same data.
+"""
+import math
+import random
+import uuid
+from datetime import datetime, timedelta
+from typing import Iterator
+from data.botswana_businesses import get_businesses
+from data.sandbox_definitions import (
+    BANK_DEFINITIONS, ACCOUNT_DEFINITIONS, FX_RATE_DEFINITIONS, TRANSACTION_TEMPLATES
+)
+import config
+
+
+def history_window(months: int = 12, end_date: datetime = None) -> tuple:
+    """
+    Get the date range covered by historical transactions
+
+    Args:
+        months: Number of months of history
+        end_date: End of the window (defaults to now)
+
+    Returns:
+        Tuple of (start_date, end_date)
+    """
+    end_date = end_date or datetime.now()
+    return (end_date - timedelta(days=months * 30), end_date)
+
+
+def last_history_day(start_date: datetime, end_date: datetime) -> datetime:
+    """Get the last day generate_historical_transactions covers for a window"""
+    days = math.ceil((end_date - start_date) / timedelta(days=1))
+    return start_date + timedelta(days=days - 1)
+
+
+def template_occurs(template: dict, date: datetime) -> bool:
+    """Check whether a transaction template fires on the given day"""
+    if template["frequency"] == "monthly":
+        return date.day == 1
+    elif template["frequency"] == "weekly":
+        return date.weekday() == 0  # Mondays
+    elif template["frequency"] == "biweekly":
+        return date.day in [1, 15]
+    elif template["frequency"] == "quarterly":
+        return date.day == 1 and date.month % 3 == 1
+    return False
+
+
+def generate_historical_transactions(bank_id: str, accounts: list, currency: str,
+                                     start_date: datetime, end_date: datetime,
+                                     rng=None) -> Iterator[dict]:
+    """
+    Generate historical transactions between accounts of one bank
+
+    Transactions are yielded in chronological order, one day at a time, as
+    keyword arguments for OBPClient.create_historical_transaction.
+
+    Args:
+        bank_id: Bank ID of the accounts
+        accounts: List of account dicts (each with account_id)
+        currency: Currency code
+        start_date: First day of history
+        end_date: Day after the last day of history
+        rng: Random number generator (defaults to the random module)
+
+    Yields:
+        Historical transaction dicts
+    """
+    rng = rng or random
+    if len(accounts) < 2:
+        return
+
+    current_date = start_date
+    while current_date < end_date:
+        for template in TRANSACTION_TEMPLATES:
+            if not template_occurs(template, current_date):
+                continue
+
+            # Pick random from and to accounts
+            from_account = rng.choice(accounts)
+            to_account = rng.choice([a for a in accounts if a["account_id"] != from_account["account_id"]])
+
+            amount = rng.uniform(*template["amount_range"])
+
+            # Add some random hours/minutes to the timestamp
+            tx_time = current_date.replace(
+                hour=rng.randint(8, 18),
+                minute=rng.randint(0, 59),
+                second=rng.randint(0, 59)
+            )
+            timestamp = tx_time.strftime("%Y-%m-%dT%H:%M:%SZ")
+
+            yield {
+                "bank_id": bank_id,
+                "from_account_id": from_account["account_id"],
+                "to_account_id": to_account["account_id"],
+                "amount": f"{amount:.2f}",
+                "currency": currency,
+                "description": template["desc"][:36],  # Truncate to 36 chars
+                "posted": timestamp,
+                "completed": timestamp
+            }
+
+        current_date += timedelta(days=1)
+
+
+def plan_sandbox(username: str, user_id: str = None,
+                 num_banks: int = None, num_accounts: int = None,
+                 currency: str = None, months: int = 12,
+                 seed: int = None, end_date: datetime = None) -> dict:
+    """
+    Plan the sandbox for a user without calling the API
+
+    Account IDs are generated locally so the plan can be submitted through
+    the sandbox data-import endpoint, which accepts client chosen IDs.
+
+    Args:
+        username: Username prefix for bank IDs
+        user_id: User ID who will own the accounts
+        num_banks: Number of banks (defaults to config.NUM_BANKS)
+        num_accounts: Accounts per bank (defaults to config.NUM_ACCOUNTS_PER_BANK)
+        currency: Currency code (defaults to config.CURRENCY)
+        months: Number of months of historical transactions
+        seed: Seed for all random data in the plan
+        end_date: End of the history window (defaults to now)
+
+    Returns:
+        Plan dictionary
+    """
+    num_banks = config.NUM_BANKS if num_banks is None else num_banks
+    num_accounts = config.NUM_ACCOUNTS_PER_BANK if num_accounts is None else num_accounts
+    currency = currency or config.CURRENCY
+    seed = random.randrange(2 ** 32) if seed is None else seed
+    rng = random.Random(seed)
+
+    start_date, end_date = history_window(months, end_date)
+
+    # Distribute businesses across accounts, same split as populate_sandbox
+    all_businesses = get_businesses()
+    businesses_per_account = max(1, len(all_businesses) // max(1, num_banks * num_accounts))
+    business_idx = 0
+
+    banks = []
+    accounts = {}
+    counterparties = {}
+    for bank_def in BANK_DEFINITIONS[:num_banks]:
+        bank_id = f"{username}.{bank_def['suffix']}"
+        banks.append({
+            "bank_id": bank_id,
+            "full_name": bank_def["full_name"],
+            "short_name": bank_def["short_name"],
+            "website": bank_def["website"],
+            "bank_routings": [
+                {
+                    "scheme": "BIC",
+                    "address": f"{bank_def['short_name']}BWGX"
+                }
+            ]
+        })
+
+        bank_accounts = []
+        for i, acct_def in enumerate(ACCOUNT_DEFINITIONS[:num_accounts]):
+            bank_accounts.append({
+                "bank_id": bank_id,
+                "account_id": str(uuid.UUID(int=rng.getrandbits(128), version=4)),
+                "number": f"{bank_def['short_name']}{len(banks):02d}{i + 1:06d}",
+                "label": f"{acct_def['label']} {i + 1}",
+                "product_code": acct_def["product_code"],
+                "currency": currency
+            })
+        accounts[bank_id] = bank_accounts
+
+        # Counterparties go to the first account of each bank
+        if bank_accounts:
+            end_idx = min(business_idx + businesses_per_account * 2, len(all_businesses))
+            counterparties[bank_id] = {
+                "account_id": bank_accounts[0]["account_id"],
+                "businesses": all_businesses[business_idx:end_idx]
+            }
+            business_idx = end_idx
+
+    return {
+        "username": username,
+        "user_id": user_id,
+        "currency": currency,
+        "seed": seed,
+        "start_date": start_date,
+        "end_date": end_date,
+        "banks": banks,
+        "accounts": accounts,
+        "counterparties": counterparties,
+        "fx_rates": FX_RATE_DEFINITIONS
+    }
+
+
+def iter_plan_transactions(plan: dict) -> Iterator[dict]:
+    """
+    Generate the historical transactions of a plan
+
+    The generator is seeded from the plan, so every call yields the same
+    transactions in the same order.
+
+    Args:
+        plan: Plan from plan_sandbox
+
+    Yields:
+        Historical transaction dicts
+    """
+    rng = random.Random(plan["seed"])
+    for bank_id, accounts in plan["accounts"].items():
+        yield from generate_historical_transactions(
+            bank_id, accounts, plan["currency"],
+            plan["start_date"], plan["end_date"], rng
+        )
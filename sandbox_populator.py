@@ -6,15 +6,41 @@ Creates sandbox data in an Open Bank Project instance:
 - 2 Banks (with bank_id prefixed by authenticated user's username)
 - 5 Accounts per bank (owned by authenticated user)
 - Counterparties representing small businesses in Botswana
+
+Each stage can also be run on its own (see STAGES), using the bank and
+account IDs recorded in the local sandbox state.
 """
+import argparse
 import sys
-import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
 from datetime import datetime, timedelta
-from typing import Optional
-from obp_client import OBPClient
+from typing import Optional, TYPE_CHECKING
+from obp_client import OBPClient, APIError
+from account_partitions import run_partitioned
+from response_cache import ResponseCache
+from circuit_breaker import CircuitOpenError
+from deadline import RunDeadline
 from data.botswana_businesses import get_businesses, get_business_for_counterparty
+from data.sandbox_definitions import (
+    BANK_DEFINITIONS, ACCOUNT_DEFINITIONS, FX_RATE_DEFINITIONS, TRANSACTION_REQUEST_DEFINITIONS
+)
+from history_watermarks import HistoryWatermarks
+from sandbox_state import SandboxState
+from sandbox_plan import (
+    history_window, last_history_day, generate_historical_transactions, iter_plan_transactions
+)
 import config
 
+# Imported when used (see open_outputs), so single stages start quickly
+if TYPE_CHECKING:
+    from audit_writer import AuditWriter
+    from analytics_export import AnalyticsExport
+
+STAGES = ["banks", "fx", "accounts", "users", "counterparties", "history", "transfers"]
+
 
 def get_username_prefix(client: OBPClient) -> tuple:
     """
@@ -33,7 +59,8 @@ def get_username_prefix(client: OBPClient) -> tuple:
     return (clean_username.lower(), user_id)
 
 
-def create_banks(client: OBPClient, username: str, count: int = 2) -> list:
+def create_banks(client: OBPClient, username: str, count: int = 2,
+                 audit: "AuditWriter" = None, export: "AnalyticsExport" = None) -> list:
     """
     Create banks with IDs prefixed by username
 
@@ -41,34 +68,21 @@ def create_banks(client: OBPClient, username: str, count: int = 2) -> list:
         client: OBP API client
         username: Username to prefix bank IDs
         count: Number of banks to create
+        audit: Optional writer for sandbox_actions records
+        export: Optional columnar export of created entities
 
     Returns:
         List of created bank data
     """
     banks = []
-    bank_definitions = [
-        {
-            "suffix": "cbb",
-            "full_name": "Commercial Bank of Botswana",
-            "short_name": "CBB",
-            "website": "https://www.cbb.co.bw"
-        },
-        {
-            "suffix": "bsb",
-            "full_name": "Botswana Savings Bank",
-            "short_name": "BSB",
-            "website": "https://www.bsb.co.bw"
-        }
-    ]
-
-    for i in range(min(count, len(bank_definitions))):
-        bank_def = bank_definitions[i]
+    skipped = False
+    for bank_def in BANK_DEFINITIONS[:count]:
         bank_id = f"{username}.{bank_def['suffix']}"
 
         print(f"Creating bank: {bank_id}")
 
         # Check if bank already exists
-        if client.bank_exists(bank_id):
+        if not skipped and client.bank_exists(bank_id):
             print(f"  Bank {bank_id} already exists, skipping...")
             try:
                 bank = client.get_bank(bank_id)
@@ -77,27 +91,93 @@ def create_banks(client: OBPClient, username: str, count: int = 2) -> list:
                 print(f"  Warning: Could not fetch existing bank: {e}")
             continue
 
+        bank_data = {
+            "bank_id": bank_id,
+            "full_name": bank_def["full_name"],
+            "short_name": bank_def["short_name"],
+            "website": bank_def["website"],
+            "bank_routings": [
+                {
+                    "scheme": "BIC",
+                    "address": f"{bank_def['short_name']}BWGX"
+                }
+            ]
+        }
         try:
-            bank = client.create_bank(
-                bank_id=bank_id,
-                full_name=bank_def["full_name"],
-                short_name=bank_def["short_name"],
-                website=bank_def["website"],
-                bank_routings=[
-                    {
-                        "scheme": "BIC",
-                        "address": f"{bank_def['short_name']}BWGX"
-                    }
-                ]
-            )
+            bank = client.create_bank(**bank_data)
             print(f"  Created bank: {bank.get('full_name', bank_id)}")
             banks.append(bank)
+            if audit:
+                audit.log("created_bank", f"Created bank {bank_id}")
+            if export:
+                export.add_bank(bank_data)
+        except CircuitOpenError as e:
+            # Refused writes are dead-lettered without a request, so the
+            # remaining banks are still passed to the client
+            if not skipped:
+                skipped = True
+                print(f"  Skipping remaining banks: {e}")
         except Exception as e:
             print(f"  Error creating bank {bank_id}: {e}")
 
     return banks
 
 
+def run_each(client: OBPClient, items: list, create, skip_message: str,
+             failed: list = None) -> list:
+    """
+    Create an entity for every item, concurrently when the client adapts its concurrency
+
+    Args:
+        client: OBP API client
+        items: Items to create entities from
+        create: Function creating the entity for one item, returning None
+            if it failed and raising CircuitOpenError if the client refused
+            it (the client dead-letters refused writes, so every item is
+            still passed to it)
+        skip_message: Printed with the error once items are refused
+        failed: Optional list the items that failed or were skipped are
+            appended to
+
+    Returns:
+        List of created entities, in item order
+    """
+    if not client.limits:
+        created = []
+        skipped = False
+        for item in items:
+            try:
+                entity = create(item)
+            except CircuitOpenError as e:
+                if not skipped:
+                    skipped = True
+                    print(f"{skip_message}: {e}")
+                entity = None
+            if entity is not None:
+                created.append(entity)
+            elif failed is not None:
+                failed.append(item)
+        return created
+
+    skipped = threading.Event()
+
+    def run(item):
+        try:
+            return create(item)
+        except CircuitOpenError as e:
+            if not skipped.is_set():
+                skipped.set()
+                print(f"{skip_message}: {e}")
+            return None
+
+    # The endpoint's concurrency limit decides how many of these are in flight
+    with ThreadPoolExecutor(max_workers=client.limits.max_limit) as pool:
+        entities = list(pool.map(run, items))
+    if failed is not None:
+        failed.extend(item for item, entity in zip(items, entities) if entity is None)
+    return [entity for entity in entities if entity is not None]
+
+
 def create_fx_rates(client: OBPClient, bank_id: str) -> list:
     """
     Create FX rates for a bank to enable currency conversions
@@ -109,96 +189,7 @@ def create_fx_rates(client: OBPClient, bank_id: str) -> list:
     Returns:
         List of created FX rate data
     """
-    fx_rates = []
-
-    # FX rates - Approximate rates as of 2024
-    # BWP = Botswana Pula, ZAR = South African Rand, KES = Kenyan Shilling
-    # NGN = Nigerian Naira, EGP = Egyptian Pound, GHS = Ghanaian Cedi
-    # TZS = Tanzanian Shilling, UGX = Ugandan Shilling, ZMW = Zambian Kwacha
-    # NAD = Namibian Dollar, CNY = Chinese Yuan
-    rate_definitions = [
-        # BWP (Botswana Pula) pairs
-        {"from": "EUR", "to": "BWP", "rate": 14.85},
-        {"from": "BWP", "to": "EUR", "rate": 0.0673},
-        {"from": "USD", "to": "BWP", "rate": 13.65},
-        {"from": "BWP", "to": "USD", "rate": 0.0733},
-        {"from": "GBP", "to": "BWP", "rate": 17.25},
-        {"from": "BWP", "to": "GBP", "rate": 0.0580},
-
-        # ZAR (South African Rand) pairs
-        {"from": "EUR", "to": "ZAR", "rate": 20.15},
-        {"from": "ZAR", "to": "EUR", "rate": 0.0496},
-        {"from": "USD", "to": "ZAR", "rate": 18.50},
-        {"from": "ZAR", "to": "USD", "rate": 0.0541},
-        {"from": "BWP", "to": "ZAR", "rate": 1.36},
-        {"from": "ZAR", "to": "BWP", "rate": 0.735},
-
-        # KES (Kenyan Shilling) pairs
-        {"from": "EUR", "to": "KES", "rate": 166.50},
-        {"from": "KES", "to": "EUR", "rate": 0.0060},
-        {"from": "USD", "to": "KES", "rate": 153.00},
-        {"from": "KES", "to": "USD", "rate": 0.0065},
-
-        # NGN (Nigerian Naira) pairs
-        {"from": "EUR", "to": "NGN", "rate": 1750.00},
-        {"from": "NGN", "to": "EUR", "rate": 0.000571},
-        {"from": "USD", "to": "NGN", "rate": 1600.00},
-        {"from": "NGN", "to": "USD", "rate": 0.000625},
-
-        # EGP (Egyptian Pound) pairs
-        {"from": "EUR", "to": "EGP", "rate": 53.50},
-        {"from": "EGP", "to": "EUR", "rate": 0.0187},
-        {"from": "USD", "to": "EGP", "rate": 49.00},
-        {"from": "EGP", "to": "USD", "rate": 0.0204},
-
-        # GHS (Ghanaian Cedi) pairs
-        {"from": "EUR", "to": "GHS", "rate": 17.20},
-        {"from": "GHS", "to": "EUR", "rate": 0.0581},
-        {"from": "USD", "to": "GHS", "rate": 15.80},
-        {"from": "GHS", "to": "USD", "rate": 0.0633},
-
-        # TZS (Tanzanian Shilling) pairs
-        {"from": "EUR", "to": "TZS", "rate": 2750.00},
-        {"from": "TZS", "to": "EUR", "rate": 0.000364},
-        {"from": "USD", "to": "TZS", "rate": 2525.00},
-        {"from": "TZS", "to": "USD", "rate": 0.000396},
-
-        # UGX (Ugandan Shilling) pairs
-        {"from": "EUR", "to": "UGX", "rate": 4100.00},
-        {"from": "UGX", "to": "EUR", "rate": 0.000244},
-        {"from": "USD", "to": "UGX", "rate": 3760.00},
-        {"from": "UGX", "to": "USD", "rate": 0.000266},
-
-        # ZMW (Zambian Kwacha) pairs
-        {"from": "EUR", "to": "ZMW", "rate": 29.50},
-        {"from": "ZMW", "to": "EUR", "rate": 0.0339},
-        {"from": "USD", "to": "ZMW", "rate": 27.00},
-        {"from": "ZMW", "to": "USD", "rate": 0.0370},
-
-        # NAD (Namibian Dollar) pairs
-        {"from": "EUR", "to": "NAD", "rate": 20.15},
-        {"from": "NAD", "to": "EUR", "rate": 0.0496},
-        {"from": "USD", "to": "NAD", "rate": 18.50},
-        {"from": "NAD", "to": "USD", "rate": 0.0541},
-
-        # CNY (Chinese Yuan) pairs
-        {"from": "EUR", "to": "CNY", "rate": 7.85},
-        {"from": "CNY", "to": "EUR", "rate": 0.1274},
-        {"from": "USD", "to": "CNY", "rate": 7.20},
-        {"from": "CNY", "to": "USD", "rate": 0.1389},
-        {"from": "BWP", "to": "CNY", "rate": 0.528},
-        {"from": "CNY", "to": "BWP", "rate": 1.894},
-
-        # Major currency pairs
-        {"from": "EUR", "to": "USD", "rate": 1.09},
-        {"from": "USD", "to": "EUR", "rate": 0.92},
-        {"from": "GBP", "to": "USD", "rate": 1.27},
-        {"from": "USD", "to": "GBP", "rate": 0.79},
-        {"from": "GBP", "to": "EUR", "rate": 1.16},
-        {"from": "EUR", "to": "GBP", "rate": 0.86},
-    ]
-
-    for rate_def in rate_definitions:
+    def create(rate_def):
         from_curr = rate_def["from"]
         to_curr = rate_def["to"]
         rate = rate_def["rate"]
@@ -213,15 +204,19 @@ def create_fx_rates(client: OBPClient, bank_id: str) -> list:
                 conversion_value=rate
             )
             print(f"    Created FX rate: {from_curr}/{to_curr}")
-            fx_rates.append(fx_rate)
+            return fx_rate
+        except CircuitOpenError:
+            raise
         except Exception as e:
             print(f"    Error creating FX rate {from_curr}/{to_curr}: {e}")
+            return None
 
-    return fx_rates
+    return run_each(client, FX_RATE_DEFINITIONS, create, "    Skipping remaining FX rates")
 
 
 def create_accounts(client: OBPClient, bank_id: str, user_id: str,
-                    count: int = 5, currency: str = "BWP") -> list:
+                    count: int = 5, currency: str = "BWP",
+                    audit: "AuditWriter" = None, export: "AnalyticsExport" = None) -> list:
     """
     Create accounts at a bank
 
@@ -231,21 +226,15 @@ def create_accounts(client: OBPClient, bank_id: str, user_id: str,
         user_id: User ID who will own the accounts
         count: Number of accounts to create
         currency: Currency code for accounts
+        audit: Optional writer for sandbox_actions records
+        export: Optional columnar export of created entities
 
     Returns:
         List of created account data
     """
     accounts = []
-    account_definitions = [
-        {"label": "Current Account", "product_code": "CURRENT"},
-        {"label": "Savings Account", "product_code": "SAVINGS"},
-        {"label": "Business Account", "product_code": "BUSINESS"},
-        {"label": "Investment Account", "product_code": "INVESTMENT"},
-        {"label": "Emergency Fund", "product_code": "SAVINGS"},
-    ]
-
-    for i in range(min(count, len(account_definitions))):
-        acct_def = account_definitions[i]
+    skipped = False
+    for i, acct_def in enumerate(ACCOUNT_DEFINITIONS[:count]):
         label = f"{acct_def['label']} {i + 1}"
 
         print(f"  Creating account: {label}")
@@ -260,6 +249,17 @@ def create_accounts(client: OBPClient, bank_id: str, user_id: str,
             )
             print(f"    Created account: {account.get('account_id', 'unknown')}")
             accounts.append(account)
+            if audit:
+                audit.log("created_account", f"Created account {account.get('account_id')} at {bank_id}")
+            if export:
+                export.add_account({"bank_id": bank_id, "account_id": account.get("account_id"),
+                                    "label": label, "currency": currency,
+                                    "product_code": acct_def["product_code"]})
+        except CircuitOpenError as e:
+            # Refused writes are dead-lettered, so the rest are still passed on
+            if not skipped:
+                skipped = True
+                print(f"    Skipping remaining accounts: {e}")
         except Exception as e:
             print(f"    Error creating account {label}: {e}")
 
@@ -269,149 +269,189 @@ def create_accounts(client: OBPClient, bank_id: str, user_id: str,
 def create_historical_transactions(client: OBPClient, bank_accounts: dict,
                                     currency: str = "BWP",
                                     months: int = 12,
-                                    delay_seconds: float = 0.1) -> list:
+                                    delay_seconds: float = 0.1,
+                                    audit: "AuditWriter" = None,
+                                    watermarks: HistoryWatermarks = None,
+                                    start_date: datetime = None,
+                                    end_date: datetime = None,
+                                    workers: int = None,
+                                    planned: list = None,
+                                    export: "AnalyticsExport" = None,
+                                    failed: list = None) -> list:
     """
     Create historical transactions to build up account history
 
+    Transactions are submitted in parallel, partitioned by bank and
+    account: each account's transactions are posted one at a time in
+    chronological order, and transactions of disjoint accounts run
+    concurrently.
+
     Args:
         client: OBP API client
         bank_accounts: Dict mapping bank_id to list of account dicts
         currency: Currency code
         months: Number of months of history to create
-        delay_seconds: Delay between API requests to avoid rate limiting
+        delay_seconds: Delay before each API request on a worker, to avoid rate
+            limiting (not used when the client adapts its concurrency, which
+            backs off on 429s itself)
+        audit: Optional writer for sandbox_actions records
+        watermarks: Optional high-water marks. History starts the day after
+            the marks of each bank's accounts, and the marks advance to the
+            last day submitted without errors. After a bank's first failure
+            its later days are not submitted, and days already created past
+            the mark are recorded so the next run skips them
+        start_date: First day of history for accounts without a mark
+            (defaults to months before end_date)
+        end_date: End of the history window (defaults to now)
+        workers: Number of concurrent requests (defaults to config.HISTORY_WORKERS,
+            or the highest concurrency limit when the client adapts it)
+        planned: Transactions generated in advance (e.g. from
+            sandbox_plan.iter_plan_transactions) to submit instead of
+            generating new ones
+        export: Optional columnar export of created entities
+        failed: Optional list the transactions not created are appended to
 
     Returns:
         List of created historical transactions
     """
-    import time
-
+    workers = workers or (client.limits.max_limit if client.limits else config.HISTORY_WORKERS)
+    if client.limits:
+        delay_seconds = 0
     transactions = []
+    window_start, end_date = history_window(months, end_date)
+    start_date = start_date or window_start
 
-    # Transaction templates for realistic patterns
-    transaction_templates = [
-        # Regular monthly transactions
-        {"desc": "Salary deposit", "amount_range": (5000, 15000), "frequency": "monthly"},
-        {"desc": "Rent payment", "amount_range": (800, 2500), "frequency": "monthly"},
-        {"desc": "Utility bill", "amount_range": (100, 400), "frequency": "monthly"},
-        {"desc": "Mobile phone", "amount_range": (50, 150), "frequency": "monthly"},
-        {"desc": "Internet service", "amount_range": (80, 200), "frequency": "monthly"},
-        {"desc": "Insurance premium", "amount_range": (200, 600), "frequency": "monthly"},
-
-        # Weekly transactions
-        {"desc": "Grocery shopping", "amount_range": (150, 500), "frequency": "weekly"},
-        {"desc": "Fuel purchase", "amount_range": (100, 300), "frequency": "weekly"},
-
-        # Occasional transactions
-        {"desc": "Restaurant dining", "amount_range": (50, 300), "frequency": "biweekly"},
-        {"desc": "Online shopping", "amount_range": (100, 800), "frequency": "biweekly"},
-        {"desc": "Medical expense", "amount_range": (100, 1000), "frequency": "quarterly"},
-        {"desc": "Vehicle maintenance", "amount_range": (200, 1500), "frequency": "quarterly"},
-        {"desc": "Clothing purchase", "amount_range": (150, 600), "frequency": "quarterly"},
-        {"desc": "Entertainment", "amount_range": (50, 200), "frequency": "biweekly"},
-        {"desc": "Savings transfer", "amount_range": (500, 2000), "frequency": "monthly"},
-        {"desc": "Investment deposit", "amount_range": (1000, 5000), "frequency": "monthly"},
-    ]
-
-    end_date = datetime.now()
-    start_date = end_date - timedelta(days=months * 30)
-
+    pending = []
+    banks = {}
     for bank_id, accounts in bank_accounts.items():
         if len(accounts) < 2:
             continue
 
-        print(f"  Creating historical transactions for bank: {bank_id}")
-
-        # Generate transactions for each month
-        current_date = start_date
-        tx_count = 0
-
-        while current_date < end_date:
-            for template in transaction_templates:
-                # Determine if this transaction should occur based on frequency
-                should_create = False
-                if template["frequency"] == "monthly":
-                    should_create = current_date.day == 1
-                elif template["frequency"] == "weekly":
-                    should_create = current_date.weekday() == 0  # Mondays
-                elif template["frequency"] == "biweekly":
-                    should_create = current_date.day in [1, 15]
-                elif template["frequency"] == "quarterly":
-                    should_create = current_date.day == 1 and current_date.month % 3 == 1
-
-                if should_create:
-                    # Pick random from and to accounts
-                    from_account = random.choice(accounts)
-                    to_account = random.choice([a for a in accounts if a["account_id"] != from_account["account_id"]])
-
-                    if not to_account:
-                        continue
-
-                    amount = random.uniform(*template["amount_range"])
-                    amount_str = f"{amount:.2f}"
-
-                    # Add some random hours/minutes to the timestamp
-                    tx_time = current_date.replace(
-                        hour=random.randint(8, 18),
-                        minute=random.randint(0, 59),
-                        second=random.randint(0, 59)
-                    )
-                    timestamp = tx_time.strftime("%Y-%m-%dT%H:%M:%SZ")
-
-                    try:
-                        # Add delay to avoid rate limiting
-                        time.sleep(delay_seconds)
-
-                        tx = client.create_historical_transaction(
-                            bank_id=bank_id,
-                            from_account_id=from_account["account_id"],
-                            to_account_id=to_account["account_id"],
-                            amount=amount_str,
-                            currency=currency,
-                            description=template["desc"][:36],  # Truncate to 36 chars
-                            posted=timestamp,
-                            completed=timestamp
-                        )
-                        transactions.append(tx)
-                        tx_count += 1
-
-                        # Print progress every 50 transactions
-                        if tx_count % 50 == 0:
-                            print(f"    Progress: {tx_count} transactions created...")
-
-                    except Exception as e:
-                        error_msg = str(e)
-                        if "429" in error_msg:
-                            print(f"    Rate limited at {tx_count} transactions. Waiting 60 seconds...")
-                            time.sleep(60)
-                            # Retry this transaction
-                            try:
-                                tx = client.create_historical_transaction(
-                                    bank_id=bank_id,
-                                    from_account_id=from_account["account_id"],
-                                    to_account_id=to_account["account_id"],
-                                    amount=amount_str,
-                                    currency=currency,
-                                    description=template["desc"][:36],
-                                    posted=timestamp,
-                                    completed=timestamp
-                                )
-                                transactions.append(tx)
-                                tx_count += 1
-                            except Exception as retry_e:
-                                print(f"    Retry failed: {retry_e}")
-                        else:
-                            print(f"    Error: {e}")
-                            return transactions
-
-            current_date += timedelta(days=1)
-
-        print(f"    Created {tx_count} historical transactions")
+        bank_start = watermarks.start_for(accounts, start_date) if watermarks else start_date
+        if bank_start >= end_date:
+            print(f"  History for bank {bank_id} is up to date")
+            continue
+
+        print(f"  Creating historical transactions for bank: {bank_id} "
+              f"(from {bank_start.strftime('%Y-%m-%d')})")
+        # failed_day is the day of the first transaction that was not created,
+        # the marks stop before it. days are the days submitted so far, and
+        # failed_days those with a transaction that was not created
+        done_days = watermarks.days_created(bank_id) if watermarks else set()
+        banks[bank_id] = {"accounts": accounts, "start": bank_start, "count": 0,
+                          "failed_day": None, "skipped": False, "days": set(done_days),
+                          "failed_days": set()}
+        if planned is not None:
+            first_day = bank_start.strftime("%Y-%m-%d")
+            bank_pending = (tx_data for tx_data in planned
+                            if tx_data["bank_id"] == bank_id and tx_data["posted"] >= first_day)
+        else:
+            bank_pending = generate_historical_transactions(bank_id, accounts, currency,
+                                                            bank_start, end_date)
+        pending.extend(tx_data for tx_data in bank_pending if tx_data["posted"][:10] not in done_days)
+
+    lock = threading.Lock()
+
+    def record_failure(bank: dict, tx_data: dict):
+        with lock:
+            if failed is not None:
+                failed.append(tx_data)
+            day = tx_data["posted"][:10]
+            bank["failed_days"].add(day)
+            if not bank["failed_day"] or day < bank["failed_day"]:
+                bank["failed_day"] = day
+
+    def record_success(tx_data: dict, tx: dict):
+        bank_id = tx_data["bank_id"]
+        if export:
+            export.add_transaction(tx_data, tx.get("transaction_id"))
+        with lock:
+            transactions.append(tx)
+            bank = banks[bank_id]
+            bank["count"] += 1
+            tx_count = bank["count"]
+        # Print progress every 50 transactions
+        if tx_count % 50 == 0:
+            print(f"    Progress: {tx_count} transactions created at {bank_id}...")
+            if audit:
+                audit.log("created_historical_transactions",
+                          f"Created batch of 50 transactions at {bank_id}")
+
+    def submit(tx_data: dict):
+        bank_id = tx_data["bank_id"]
+        bank = banks[bank_id]
+        day = tx_data["posted"][:10]
+        with lock:
+            # Days after a failure are left for the next run, unless they
+            # were started already (their failures are dead-lettered)
+            if (watermarks and bank["failed_day"] and day > bank["failed_day"]
+                    and day not in bank["days"]):
+                return
+            bank["days"].add(day)
+        try:
+            # Add delay to avoid rate limiting (refused requests send nothing)
+            if not bank["skipped"]:
+                time.sleep(delay_seconds)
+
+            # Refused once the circuit is open, and dead-lettered by the client
+            record_success(tx_data, client.create_historical_transaction(**tx_data))
+
+        except CircuitOpenError as e:
+            if not bank["skipped"]:
+                bank["skipped"] = True
+                print(f"    Skipping remaining history for bank {bank_id}: {e}")
+            record_failure(bank, tx_data)
+        except Exception as e:
+            if isinstance(e, APIError) and e.status_code == 429:
+                if client.limits:
+                    # The adaptive limits have already cut concurrency for the endpoint
+                    print(f"    Rate limited at {bank['count']} transactions at {bank_id}. "
+                          f"Retrying at a lower concurrency...")
+                else:
+                    print(f"    Rate limited at {bank['count']} transactions at {bank_id}. "
+                          f"Waiting 60 seconds...")
+                    time.sleep(60)
+                # Retry this transaction, still holding its accounts
+                try:
+                    record_success(tx_data, client.create_historical_transaction(**tx_data))
+                except Exception as retry_e:
+                    print(f"    Retry failed: {retry_e}")
+                    record_failure(bank, tx_data)
+            else:
+                print(f"    Error: {e}")
+                record_failure(bank, tx_data)
+
+    run_partitioned(
+        pending,
+        lambda tx_data: (tx_data["from_account_id"], tx_data["to_account_id"]),
+        submit,
+        workers
+    )
+
+    for bank_id, bank in banks.items():
+        tx_count = bank["count"]
+        print(f"    Created {tx_count} historical transactions at {bank_id}")
+        if audit and tx_count % 50:
+            audit.log("created_historical_transactions",
+                      f"Created batch of {tx_count % 50} transactions at {bank_id}")
+
+        if watermarks:
+            if bank["failed_day"]:
+                last_day = datetime.strptime(bank["failed_day"], "%Y-%m-%d") - timedelta(days=1)
+            else:
+                last_day = last_history_day(bank["start"], end_date)
+            watermarks.advance(bank["accounts"], last_day)
+            # Days with a failure are generated again by the next run
+            watermarks.record_created_days(bank_id, bank["days"] - bank["failed_days"], last_day)
+    if watermarks:
+        watermarks.save()
 
     return transactions
 
 
 def create_transaction_requests(client: OBPClient, all_accounts: list,
-                                 currency: str = "BWP") -> list:
+                                 currency: str = "BWP", clients=None,
+                                 definitions: list = None, failed: list = None) -> list:
     """
     Create transaction requests between accounts
 
@@ -419,25 +459,20 @@ def create_transaction_requests(client: OBPClient, all_accounts: list,
         client: OBP API client
         all_accounts: List of all accounts (each with bank_id and account_id)
         currency: Currency code
+        clients: Optional UserClientPool, to send requests from accounts of
+            sandbox users (with an owner) as their owner
+        definitions: Transaction requests to create (defaults to
+            TRANSACTION_REQUEST_DEFINITIONS)
+        failed: Optional list the definitions not created are appended to
 
     Returns:
         List of created transaction request data
     """
     transaction_requests = []
+    definitions = TRANSACTION_REQUEST_DEFINITIONS if definitions is None else definitions
+    skipped = False
 
-    # Sample transactions to create
-    transactions = [
-        {"from_idx": 0, "to_idx": 1, "amount": "100.00", "description": "Monthly savings transfer"},
-        {"from_idx": 0, "to_idx": 2, "amount": "250.50", "description": "Business expenses"},
-        {"from_idx": 1, "to_idx": 3, "amount": "500.00", "description": "Investment deposit"},
-        {"from_idx": 2, "to_idx": 0, "amount": "75.25", "description": "Refund payment"},
-        {"from_idx": 3, "to_idx": 4, "amount": "1000.00", "description": "Emergency fund top-up"},
-        {"from_idx": 5, "to_idx": 0, "amount": "200.00", "description": "Cross-bank transfer"},
-        {"from_idx": 6, "to_idx": 1, "amount": "350.00", "description": "Savings deposit"},
-        {"from_idx": 0, "to_idx": 7, "amount": "150.00", "description": "Business payment"},
-    ]
-
-    for txn in transactions:
+    for txn in definitions:
         from_idx = txn["from_idx"]
         to_idx = txn["to_idx"]
 
@@ -457,7 +492,10 @@ def create_transaction_requests(client: OBPClient, all_accounts: list,
         print(f"    To: {to_bank_id}/{to_account_id}")
 
         try:
-            txn_request = client.create_transaction_request_account(
+            sender = client
+            if clients and from_account.get("owner"):
+                sender = clients.get(from_account["owner"])
+            txn_request = sender.create_transaction_request_account(
                 from_bank_id=from_bank_id,
                 from_account_id=from_account_id,
                 to_bank_id=to_bank_id,
@@ -470,14 +508,24 @@ def create_transaction_requests(client: OBPClient, all_accounts: list,
             status = txn_request.get("status", "unknown")
             print(f"    Created transaction request: {txn_id} (status: {status})")
             transaction_requests.append(txn_request)
+        except CircuitOpenError as e:
+            # Refused writes are dead-lettered, so the rest are still passed on
+            if not skipped:
+                skipped = True
+                print(f"    Skipping remaining transaction requests: {e}")
+            if failed is not None:
+                failed.append(txn)
         except Exception as e:
             print(f"    Error creating transaction request: {e}")
+            if failed is not None:
+                failed.append(txn)
 
     return transaction_requests
 
 
 def create_counterparties(client: OBPClient, bank_id: str, account_id: str,
-                          businesses: list, currency: str = "BWP") -> list:
+                          businesses: list, currency: str = "BWP",
+                          export: "AnalyticsExport" = None, failed: list = None) -> list:
     """
     Create counterparties for an account
 
@@ -487,13 +535,13 @@ def create_counterparties(client: OBPClient, bank_id: str, account_id: str,
         account_id: Account ID to add counterparties to
         businesses: List of business data to create as counterparties
         currency: Currency code
+        export: Optional columnar export of created entities
+        failed: Optional list the businesses not created are appended to
 
     Returns:
         List of created counterparty data
     """
-    counterparties = []
-
-    for business in businesses:
+    def create(business):
         cp_data = get_business_for_counterparty(business, currency)
 
         print(f"    Creating counterparty: {cp_data['name']}")
@@ -512,19 +560,477 @@ def create_counterparties(client: OBPClient, bank_id: str, account_id: str,
                 bespoke=cp_data["bespoke"]
             )
             print(f"      Created counterparty: {counterparty.get('counterparty_id', 'unknown')}")
-            counterparties.append(counterparty)
+            if export:
+                export.add_counterparty(bank_id, account_id, counterparty.get("counterparty_id"), cp_data)
+            return counterparty
+        except CircuitOpenError:
+            raise
         except Exception as e:
             print(f"      Error creating counterparty {cp_data['name']}: {e}")
+            return None
+
+    return run_each(client, businesses, create, "      Skipping remaining counterparties", failed)
+
+
+def discover_bank_accounts(client: OBPClient, prefix: str) -> dict:
+    """
+    Find the existing accounts at every bank under a bank ID prefix
+
+    Args:
+        client: OBP API client
+        prefix: Bank ID prefix (usually the username prefix)
+
+    Returns:
+        Dict mapping bank_id to list of account dicts (bank_id, account_id, label)
+    """
+    bank_accounts = {}
+    for bank in client.iter_banks():
+        bank_id = bank.get("id")
+        if not str(bank_id).startswith(f"{prefix}."):
+            continue
+        bank_accounts[bank_id] = [
+            {
+                "bank_id": bank_id,
+                "account_id": account.get("id") or account.get("account_id"),
+                "label": account.get("label")
+            }
+            for account in client.iter_accounts_at_bank(bank_id)
+        ]
+    return bank_accounts
+
+
+def load_bank_ids(client: OBPClient, prefix: str, state: SandboxState, refresh: bool = False) -> list:
+    """
+    Get the IDs of the banks under a bank ID prefix
+
+    Uses the banks recorded in the local state, and otherwise (or when
+    refreshing) walks the list of banks, recording the result.
+
+    Args:
+        client: OBP API client
+        prefix: Bank ID prefix (usually the username prefix)
+        state: Local sandbox state for the prefix
+        refresh: Look the banks up even if the state has them
+
+    Returns:
+        List of bank IDs
+    """
+    if state.bank_ids and not refresh:
+        return state.bank_ids
+    bank_ids = [bank.get("id") for bank in client.iter_banks()
+                if str(bank.get("id")).startswith(f"{prefix}.")]
+    state.set_banks(bank_ids)
+    return bank_ids
+
+
+def load_bank_accounts(client: OBPClient, prefix: str, state: SandboxState,
+                       refresh: bool = False) -> dict:
+    """
+    Get the accounts at every bank under a bank ID prefix
+
+    Uses the accounts recorded in the local state, and otherwise (or when
+    refreshing) the current user's accounts from one /my/accounts request,
+    falling back to listing each bank's accounts. The result is recorded.
+
+    Args:
+        client: OBP API client
+        prefix: Bank ID prefix (usually the username prefix)
+        state: Local sandbox state for the prefix
+        refresh: Look the accounts up even if the state has them
+
+    Returns:
+        Dict mapping bank_id to list of account dicts (bank_id, account_id,
+        label and, for accounts of sandbox users, owner)
+    """
+    bank_accounts = state.bank_accounts
+    if any(bank_accounts.values()) and not refresh:
+        return bank_accounts
+    try:
+        accounts = client.get_my_accounts().get("accounts", [])
+    except CircuitOpenError:
+        raise
+    except Exception as e:
+        print(f"  Could not list accounts in one request ({e}), listing each bank instead")
+        bank_accounts = discover_bank_accounts(client, prefix)
+    else:
+        bank_accounts = {}
+        for account in accounts:
+            bank_id = account.get("bank_id")
+            if str(bank_id).startswith(f"{prefix}."):
+                bank_accounts.setdefault(bank_id, []).append({
+                    "bank_id": bank_id,
+                    "account_id": account.get("id") or account.get("account_id"),
+                    "label": account.get("label")
+                })
+    state.set_bank_accounts(bank_accounts)
+    return state.bank_accounts
+
+
+def counterparty_businesses(all_businesses: list, bank_index: int) -> list:
+    """
+    Get the businesses added as counterparties at a bank
+
+    Each bank's first account gets its own slice of the businesses, so
+    counterparties are spread across banks without repeats.
+
+    Args:
+        all_businesses: Businesses from get_businesses
+        bank_index: Position of the bank among the banks that get counterparties
+
+    Returns:
+        List of business data
+    """
+    per_account = max(1, len(all_businesses) // (config.NUM_BANKS * config.NUM_ACCOUNTS_PER_BANK))
+    start = min(bank_index * per_account * 2, len(all_businesses))
+    return all_businesses[start:min(start + per_account * 2, len(all_businesses))]
+
+
+def run_client(token: Optional[str] = None) -> OBPClient:
+    """Create the client of a run: cached lookups, a dead-letter store and the configured deadline"""
+    from dead_letters import DeadLetterStore
+
+    return OBPClient(token=token, cache=ResponseCache(), dead_letters=DeadLetterStore(),
+                     deadline=RunDeadline() if config.RUN_DEADLINE_SECONDS else None)
+
+
+def open_outputs(client: OBPClient, audit_actions: bool = None, export_dir: str = None) -> tuple:
+    """
+    Open the audit writer and columnar export of a run, if they are enabled
+
+    Their modules are only imported when they are used.
+
+    Args:
+        client: OBP API client
+        audit_actions: Log actions to the sandbox_actions dynamic entity
+            (defaults to config.AUDIT_SANDBOX_ACTIONS)
+        export_dir: Export directory (defaults to config.EXPORT_DIR, empty for none)
+
+    Returns:
+        Tuple of (AuditWriter or None, AnalyticsExport or None)
+    """
+    if audit_actions is None:
+        audit_actions = config.AUDIT_SANDBOX_ACTIONS
+    audit = None
+    if audit_actions:
+        from audit_writer import AuditWriter
+        audit = AuditWriter(client)
+    export_dir = export_dir or config.EXPORT_DIR
+    export = None
+    if export_dir:
+        from analytics_export import AnalyticsExport
+        export = AnalyticsExport(export_dir)
+    return audit, export
+
+
+def top_up_history(token: Optional[str] = None, audit_actions: bool = None,
+                   export_dir: str = None):
+    """
+    Add historical transactions for the days since the last run
+
+    Existing accounts under the user's prefix get history from the day after
+    their high-water mark up to yesterday. Accounts without a mark get one
+    day, so a sandbox populated before marks were kept is not re-posted.
+
+    Args:
+        token: Optional DirectLogin token (uses config if not provided)
+        audit_actions: Log actions to the sandbox_actions dynamic entity
+            (defaults to config.AUDIT_SANDBOX_ACTIONS)
+        export_dir: Export created transactions to Parquet/Arrow files in
+            this directory (defaults to config.EXPORT_DIR, empty for none)
+    """
+    print("=" * 60)
+    print("OBP Sandbox History Top-Up")
+    print("=" * 60)
+    print(f"Target: {config.OBP_BASE_URL}")
+    print()
+
+    client = run_client(token)
+
+    try:
+        username, _ = get_username_prefix(client)
+        print(f"Bank ID prefix: {username}")
+    except Exception as e:
+        print(f"Error: Could not get current user. Is authentication configured?")
+        print(f"Details: {e}")
+        sys.exit(1)
+    print()
+
+    audit, export = open_outputs(client, audit_actions, export_dir)
+
+    bank_accounts = discover_bank_accounts(client, username)
+    end_date = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+
+    print("Creating historical transactions since last run...")
+    print("-" * 40)
+    historical_transactions = create_historical_transactions(
+        client, bank_accounts, config.CURRENCY, audit=audit,
+        watermarks=HistoryWatermarks(client.base_url),
+        start_date=end_date - timedelta(days=1), end_date=end_date, export=export
+    )
+    print(f"Created {len(historical_transactions)} historical transactions total")
+    print()
+
+    if audit:
+        audit.close()
+    if export:
+        export.close()
+
+    print_circuit_summary(client)
+    print_concurrency_limits(client)
+    print_dead_letters(client)
+    print_rejected_payloads(client)
+
+    print("=" * 60)
+    print("History top-up complete!")
+    print("=" * 60)
+
+
+def create_plan_banks(client: OBPClient, banks: list, audit: "AuditWriter" = None,
+                      export: "AnalyticsExport" = None) -> int:
+    """
+    Create the banks of a plan, skipping banks that already exist
+
+    Args:
+        client: OBP API client
+        banks: Bank dicts from sandbox_plan.plan_sandbox
+        audit: Optional writer for sandbox_actions records
+        export: Optional columnar export of created entities
+
+    Returns:
+        Number of banks that exist afterwards
+    """
+    created = 0
+    skipped = False
+    for bank in banks:
+        print(f"Creating bank: {bank['bank_id']}")
+        if not skipped and client.bank_exists(bank["bank_id"]):
+            print(f"  Bank {bank['bank_id']} already exists, skipping...")
+            created += 1
+            continue
+        try:
+            client.create_bank(**bank)
+            print(f"  Created bank: {bank['full_name']}")
+            created += 1
+            if audit:
+                audit.log("created_bank", f"Created bank {bank['bank_id']}")
+            if export:
+                export.add_bank(bank)
+        except CircuitOpenError as e:
+            # Refused writes are dead-lettered, so the rest are still passed on
+            if not skipped:
+                skipped = True
+                print(f"  Skipping remaining banks: {e}")
+        except Exception as e:
+            print(f"  Error creating bank {bank['bank_id']}: {e}")
+    return created
 
-    return counterparties
 
+def create_plan_accounts(client: OBPClient, accounts: list, user_id: str,
+                         audit: "AuditWriter" = None, export: "AnalyticsExport" = None) -> list:
+    """
+    Create the accounts of a plan with their planned account IDs
 
-def populate_sandbox(token: Optional[str] = None):
+    Args:
+        client: OBP API client
+        accounts: Account dicts from sandbox_plan.plan_sandbox
+        user_id: User ID who will own the accounts
+        audit: Optional writer for sandbox_actions records
+        export: Optional columnar export of created entities
+
+    Returns:
+        List of the planned account dicts that were created
+    """
+    created = []
+    skipped = False
+    for account in accounts:
+        print(f"  Creating account: {account['label']}")
+        try:
+            client.create_account(
+                bank_id=account["bank_id"],
+                label=account["label"],
+                currency=account["currency"],
+                user_id=user_id,
+                product_code=account["product_code"],
+                account_routings=[{"scheme": "NUMBER", "address": account["number"]}],
+                account_id=account["account_id"]
+            )
+            print(f"    Created account: {account['account_id']}")
+            created.append(account)
+            if audit:
+                audit.log("created_account", f"Created account {account['account_id']} at {account['bank_id']}")
+            if export:
+                export.add_account(account)
+        except CircuitOpenError as e:
+            # Refused writes are dead-lettered, so the rest are still passed on
+            if not skipped:
+                skipped = True
+                print(f"    Skipping remaining accounts: {e}")
+        except Exception as e:
+            print(f"    Error creating account {account['label']}: {e}")
+    return created
+
+
+def populate_sandbox_from_plan(client: OBPClient, plan: dict, user_id: str,
+                              planned: list = None, audit: "AuditWriter" = None,
+                              export: "AnalyticsExport" = None) -> dict:
+    """
+    Populate a sandbox from a plan with per-entity API calls
+
+    Accounts are created with the plan's account IDs, so every instance the
+    plan is submitted to ends up with the same banks, accounts and history.
+
+    Args:
+        client: OBP API client
+        plan: Plan from sandbox_plan.plan_sandbox
+        user_id: User ID who will own the accounts on this instance
+        planned: The plan's historical transactions, generated once by the
+            caller (generated from the plan's seed if not given)
+        audit: Optional writer for sandbox_actions records
+        export: Optional columnar export of created entities
+
+    Returns:
+        Dict with counts of what was created
+    """
+    if planned is None:
+        planned = list(iter_plan_transactions(plan))
+
+    print("Creating banks...")
+    print("-" * 40)
+    banks = create_plan_banks(client, plan["banks"], audit, export)
+    print()
+
+    print("Creating FX rates...")
+    print("-" * 40)
+    fx_rates = []
+    for bank in plan["banks"]:
+        print(f"FX rates for bank: {bank['bank_id']}")
+        fx_rates.extend(create_fx_rates(client, bank["bank_id"]))
+    print()
+
+    all_accounts = []
+    for bank_id, accounts in plan["accounts"].items():
+        print(f"Creating accounts for bank: {bank_id}")
+        print("-" * 40)
+        all_accounts.extend(create_plan_accounts(client, accounts, user_id, audit, export))
+        print()
+
+    print("Creating counterparties...")
+    print("-" * 40)
+    counterparties = []
+    for bank_id, cp_plan in plan["counterparties"].items():
+        print(f"  Adding counterparties to account: {cp_plan['account_id']}")
+        counterparties.extend(create_counterparties(
+            client, bank_id, cp_plan["account_id"], cp_plan["businesses"], plan["currency"], export
+        ))
+    print(f"Created {len(counterparties)} counterparties")
+    print()
+
+    print("Creating historical transactions...")
+    print("-" * 40)
+    historical_transactions = create_historical_transactions(
+        client, plan["accounts"], plan["currency"], audit=audit,
+        start_date=plan["start_date"], end_date=plan["end_date"], planned=planned, export=export
+    )
+    print(f"Created {len(historical_transactions)} historical transactions total")
+    print()
+
+    transaction_requests = []
+    if len(all_accounts) >= 2:
+        print("Creating transaction requests...")
+        print("-" * 40)
+        transaction_requests = create_transaction_requests(client, all_accounts, plan["currency"])
+        print(f"Created {len(transaction_requests)} transaction requests")
+        print()
+
+    return {
+        "banks": banks,
+        "accounts": len(all_accounts),
+        "transactions": len(historical_transactions),
+        "planned_transactions": len(planned),
+        "fx_rates": len(fx_rates),
+        "counterparties": len(counterparties),
+        "transaction_requests": len(transaction_requests)
+    }
+
+
+def print_circuit_summary(client: OBPClient):
+    """Print endpoints whose circuit opened, the error budget used, and deadline and hedging outcomes"""
+    budget = client.breakers.error_budget
+    opened = {endpoint: breaker for endpoint, breaker in client.breakers.summary().items()
+              if breaker["times_opened"]}
+    deadline_reached = client.deadline and client.deadline.remaining() <= client.deadline.margin
+    if not opened and not budget.failures and not deadline_reached and not client.hedged:
+        return
+    print("Endpoint health:")
+    print("-" * 40)
+    for endpoint, breaker in opened.items():
+        print(f"  {endpoint}: opened {breaker['times_opened']} time(s), now {breaker['state']}")
+    print(f"  Failed requests: {budget.failures} (budget {budget.max_failures or 'unlimited'})")
+    if budget.exhausted:
+        print("  Error budget exhausted, remaining writes were dead-lettered")
+    if deadline_reached:
+        print(f"  Run deadline of {client.deadline.seconds:.0f}s reached, remaining writes were dead-lettered")
+    if client.hedged:
+        print(f"  Hedged GETs: {client.hedged}")
+    print()
+
+
+def print_concurrency_limits(client: OBPClient):
+    """Print the concurrency limit each endpoint settled on"""
+    if client.limits is None:
+        return
+    limits = client.limits.summary()
+    if not limits:
+        return
+    print("Concurrency limits:")
+    print("-" * 40)
+    for endpoint, limit in limits.items():
+        print(f"  {endpoint}: settled at {limit['settled']:.1f} in flight (now {limit['limit']}), "
+              f"no-load latency {limit['baseline_ms']:.0f}ms, "
+              f"{limit['decreases']} overload cut(s) over {limit['samples']} requests")
+    print()
+
+
+def print_rejected_payloads(client: OBPClient):
+    """Print how many request bodies failed local validation and were not sent"""
+    validator = client.validator
+    if validator is None or not validator.rejected:
+        return
+    print("Rejected payloads:")
+    print("-" * 40)
+    print(f"  {validator.rejected} request(s) failed validation and were not sent, "
+          f"see {validator.report_path}")
+    print()
+
+
+def print_dead_letters(client: OBPClient):
+    """Print how many failed requests were saved for re-driving"""
+    store = client.dead_letters
+    if store is None or not len(store):
+        return
+    print("Dead letters:")
+    print("-" * 40)
+    print(f"  {store.added} failed request(s) saved this run, {len(store)} in {store.path}")
+    print("  Resubmit them with: python redrive.py")
+    print()
+
+
+def populate_sandbox(token: Optional[str] = None, backend: str = "api",
+                     audit_actions: bool = None, profile_path: str = None,
+                     export_dir: str = None):
     """
     Main function to populate the OBP sandbox
 
     Args:
         token: Optional DirectLogin token (uses config if not provided)
+        backend: "api" to create every entity with its own request, or
+            "import" to submit banks, accounts and history through the
+            sandbox data-import endpoint
+        audit_actions: Log actions to the sandbox_actions dynamic entity
+            (defaults to config.AUDIT_SANDBOX_ACTIONS)
+        profile_path: Profile every stage and write the report to this file
+        export_dir: Export created entities to Parquet/Arrow files in this
+            directory (defaults to config.EXPORT_DIR, empty for none)
     """
     print("=" * 60)
     print("OBP Sandbox Populator")
@@ -532,13 +1038,20 @@ def populate_sandbox(token: Optional[str] = None):
     print(f"Target: {config.OBP_BASE_URL}")
     print()
 
-    # Initialize client
-    client = OBPClient(token=token)
+    # Initialize client, caching lookups such as get_bank after bank_exists
+    client = run_client(token)
+
+    profiler = None
+    if profile_path:
+        from profiler import StageProfiler
+        profiler = StageProfiler(client)
+    stage = profiler.stage if profiler else (lambda name: nullcontext())
 
     # Get current user info
     print("Getting current user info...")
     try:
-        username, user_id = get_username_prefix(client)
+        with stage("login"):
+            username, user_id = get_username_prefix(client)
         print(f"Authenticated as: {username} (ID: {user_id})")
         print(f"Bank ID prefix: {username}")
     except Exception as e:
@@ -548,12 +1061,54 @@ def populate_sandbox(token: Optional[str] = None):
 
     print()
 
+    audit, export = open_outputs(client, audit_actions, export_dir)
+
+    if backend == "import":
+        from sandbox_import import populate_sandbox_import
+        from sandbox_plan import plan_sandbox
+
+        with stage("plan"):
+            plan = plan_sandbox(username, user_id, months=12)
+            owners = [client.get_current_user().get("username")]
+        with stage("import"):
+            summary = populate_sandbox_import(client, plan, owners, export=export)
+        watermarks = HistoryWatermarks(client.base_url)
+        for accounts in plan["accounts"].values():
+            watermarks.advance(accounts, last_history_day(plan["start_date"], plan["end_date"]))
+        watermarks.save()
+        state = SandboxState(client.base_url, username)
+        state.set_bank_accounts(plan["accounts"])
+        state.save()
+        if audit:
+            audit.log("imported_sandbox",
+                      f"Imported {summary['banks']} banks, {summary['accounts']} accounts "
+                      f"and {summary['transactions']} transactions")
+            audit.close()
+        if export:
+            export.close()
+
+        print_circuit_summary(client)
+        print_concurrency_limits(client)
+        print_dead_letters(client)
+        print_rejected_payloads(client)
+        if profiler:
+            profiler.write_report(profile_path)
+
+        print("=" * 60)
+        print("Sandbox population complete!")
+        print("=" * 60)
+        return
+
     # Create banks
     print("Creating banks...")
     print("-" * 40)
-    banks = create_banks(client, username, config.NUM_BANKS)
+    with stage("banks"):
+        banks = create_banks(client, username, config.NUM_BANKS, audit=audit, export=export)
     print(f"Created {len(banks)} banks")
     print()
+    state = SandboxState(client.base_url, username)
+    state.set_banks([bank.get("id") or bank.get("bank_id") for bank in banks
+                     if bank.get("id") or bank.get("bank_id")])
 
     # Create FX rates for each bank
     print("Creating FX rates...")
@@ -562,21 +1117,19 @@ def populate_sandbox(token: Optional[str] = None):
         bank_id = bank.get("id") or bank.get("bank_id")
         if bank_id:
             print(f"FX rates for bank: {bank_id}")
-            create_fx_rates(client, bank_id)
+            with stage("fx_rates"):
+                create_fx_rates(client, bank_id)
     print()
 
     # Get Botswana businesses for counterparties
     # Distribute businesses across accounts
     all_businesses = get_businesses()
-    businesses_per_account = len(all_businesses) // (config.NUM_BANKS * config.NUM_ACCOUNTS_PER_BANK)
-    if businesses_per_account < 1:
-        businesses_per_account = 1
 
     # Track all accounts for transaction requests
     all_accounts = []
 
     # Create accounts and counterparties for each bank
-    business_idx = 0
+    counterparty_banks = 0
     for bank in banks:
         bank_id = bank.get("id") or bank.get("bank_id")
         if not bank_id:
@@ -586,10 +1139,11 @@ def populate_sandbox(token: Optional[str] = None):
         print(f"Creating accounts for bank: {bank_id}")
         print("-" * 40)
 
-        accounts = create_accounts(
-            client, bank_id, user_id,
-            config.NUM_ACCOUNTS_PER_BANK, config.CURRENCY
-        )
+        with stage("accounts"):
+            accounts = create_accounts(
+                client, bank_id, user_id,
+                config.NUM_ACCOUNTS_PER_BANK, config.CURRENCY, audit=audit, export=export
+            )
 
         # Track accounts with their bank_id for transaction requests
         for account in accounts:
@@ -598,6 +1152,7 @@ def populate_sandbox(token: Optional[str] = None):
                 "account_id": account.get("account_id"),
                 "label": account.get("label")
             })
+        state.add_accounts(bank_id, accounts)
 
         # Add counterparties to the first account of each bank
         if accounts:
@@ -606,15 +1161,15 @@ def populate_sandbox(token: Optional[str] = None):
 
             if account_id:
                 # Get a slice of businesses for this account
-                end_idx = min(business_idx + businesses_per_account * 2, len(all_businesses))
-                account_businesses = all_businesses[business_idx:end_idx]
-                business_idx = end_idx
+                account_businesses = counterparty_businesses(all_businesses, counterparty_banks)
+                counterparty_banks += 1
 
                 print(f"  Adding counterparties to account: {account_id}")
-                counterparties = create_counterparties(
-                    client, bank_id, account_id,
-                    account_businesses, config.CURRENCY
-                )
+                with stage("counterparties"):
+                    counterparties = create_counterparties(
+                        client, bank_id, account_id,
+                        account_businesses, config.CURRENCY, export
+                    )
                 print(f"  Created {len(counterparties)} counterparties")
 
         print()
@@ -630,9 +1185,11 @@ def populate_sandbox(token: Optional[str] = None):
 
     print("Creating historical transactions (past 12 months)...")
     print("-" * 40)
-    historical_transactions = create_historical_transactions(
-        client, bank_accounts, config.CURRENCY, months=12
-    )
+    with stage("historical_transactions"):
+        historical_transactions = create_historical_transactions(
+            client, bank_accounts, config.CURRENCY, months=12, audit=audit,
+            watermarks=HistoryWatermarks(client.base_url), export=export
+        )
     print(f"Created {len(historical_transactions)} historical transactions total")
     print()
 
@@ -640,18 +1197,270 @@ def populate_sandbox(token: Optional[str] = None):
     if len(all_accounts) >= 2:
         print("Creating transaction requests...")
         print("-" * 40)
-        transaction_requests = create_transaction_requests(
-            client, all_accounts, config.CURRENCY
-        )
+        with stage("transaction_requests"):
+            transaction_requests = create_transaction_requests(
+                client, all_accounts, config.CURRENCY
+            )
         print(f"Created {len(transaction_requests)} transaction requests")
         print()
 
+    state.save()
+    if audit:
+        audit.close()
+    if export:
+        export.close()
+
+    print_circuit_summary(client)
+    print_concurrency_limits(client)
+    print_dead_letters(client)
+    print_rejected_payloads(client)
+    if profiler:
+        profiler.write_report(profile_path)
+
     print("=" * 60)
     print("Sandbox population complete!")
     print("=" * 60)
 
 
+def run_stage(stage: str, token: Optional[str] = None, months: int = 12,
+              audit_actions: bool = None, export_dir: str = None, refresh: bool = False,
+              users: int = None):
+    """
+    Run a single stage of the population against an existing sandbox
+
+    The banks and accounts a stage works on come from the local sandbox
+    state, or from one bulk lookup when the state has none (or when
+    refreshing), so no earlier stage is repeated.
+
+    Args:
+        stage: One of STAGES
+        token: Optional DirectLogin token (uses config if not provided)
+        months: Months of history for the history stage
+        audit_actions: Log actions to the sandbox_actions dynamic entity
+            (defaults to config.AUDIT_SANDBOX_ACTIONS)
+        export_dir: Export created entities to Parquet/Arrow files in this
+            directory (defaults to config.EXPORT_DIR, empty for none)
+        refresh: Look banks and accounts up on the server even if they are
+            recorded in the local state
+        users: Sandbox users for the users stage (defaults to config.SANDBOX_USERS)
+    """
+    print("=" * 60)
+    print(f"OBP Sandbox Populator: {stage}")
+    print("=" * 60)
+    print(f"Target: {config.OBP_BASE_URL}")
+    print()
+
+    client = run_client(token)
+
+    try:
+        username, user_id = get_username_prefix(client)
+        print(f"Bank ID prefix: {username}")
+    except Exception as e:
+        print(f"Error: Could not get current user. Is authentication configured?")
+        print(f"Details: {e}")
+        sys.exit(1)
+    print()
+
+    audit, export = open_outputs(client, audit_actions, export_dir)
+    state = SandboxState(client.base_url, username)
+
+    try:
+        if stage == "banks":
+            print("Creating banks...")
+            print("-" * 40)
+            banks = create_banks(client, username, config.NUM_BANKS, audit=audit, export=export)
+            state.set_banks(state.bank_ids + [bank.get("id") or bank.get("bank_id") for bank in banks
+                                              if bank.get("id") or bank.get("bank_id")])
+            print(f"Created {len(banks)} banks")
+
+        elif stage == "fx":
+            print("Creating FX rates...")
+            print("-" * 40)
+            for bank_id in load_bank_ids(client, username, state, refresh):
+                print(f"FX rates for bank: {bank_id}")
+                create_fx_rates(client, bank_id)
+
+        elif stage == "accounts":
+            for bank_id in load_bank_ids(client, username, state, refresh):
+                print(f"Creating accounts for bank: {bank_id}")
+                print("-" * 40)
+                accounts = create_accounts(
+                    client, bank_id, user_id,
+                    config.NUM_ACCOUNTS_PER_BANK, config.CURRENCY, audit=audit, export=export
+                )
+                state.add_accounts(bank_id, accounts)
+                print()
+
+        elif stage == "users":
+            from sandbox_users import provision_users
+
+            count = users or config.SANDBOX_USERS
+            print(f"Provisioning {count} sandbox users...")
+            print("-" * 40)
+            summary = provision_users(client, username, count,
+                                      load_bank_ids(client, username, state, refresh), state,
+                                      audit=audit, export=export)
+            print(f"Created {summary['created']} users ({summary['existing']} existed, "
+                  f"{summary['logins']} logins, {summary['failed']} failed) "
+                  f"with {summary['accounts']} accounts")
+
+        elif stage == "counterparties":
+            all_businesses = get_businesses()
+            bank_accounts = load_bank_accounts(client, username, state, refresh)
+            counterparty_banks = 0
+            for bank_id, accounts in bank_accounts.items():
+                if not accounts:
+                    continue
+                account_id = accounts[0]["account_id"]
+                print(f"  Adding counterparties to account: {bank_id}/{account_id}")
+                counterparties = create_counterparties(
+                    client, bank_id, account_id,
+                    counterparty_businesses(all_businesses, counterparty_banks), config.CURRENCY, export
+                )
+                counterparty_banks += 1
+                print(f"  Created {len(counterparties)} counterparties")
+
+        elif stage == "history":
+            bank_accounts = load_bank_accounts(client, username, state, refresh)
+            print(f"Creating historical transactions (past {months} months)...")
+            print("-" * 40)
+            historical_transactions = create_historical_transactions(
+                client, bank_accounts, config.CURRENCY, months=months, audit=audit,
+                watermarks=HistoryWatermarks(client.base_url), export=export
+            )
+            print(f"Created {len(historical_transactions)} historical transactions total")
+
+        elif stage == "transfers":
+            bank_accounts = load_bank_accounts(client, username, state, refresh)
+            all_accounts = [account for accounts in bank_accounts.values() for account in accounts]
+            clients = None
+            if state.owners:
+                from sandbox_users import UserClientPool
+                clients = UserClientPool(client)
+            print("Creating transaction requests...")
+            print("-" * 40)
+            transaction_requests = create_transaction_requests(client, all_accounts, config.CURRENCY,
+                                                               clients)
+            if clients:
+                clients.tokens.save()
+            print(f"Created {len(transaction_requests)} transaction requests")
+
+        else:
+            raise ValueError(f"Unknown stage: {stage}")
+    except Exception as e:
+        # Still save the state and print the summaries for what did get done
+        print(f"Error: Stage {stage} failed: {type(e).__name__}: {e}")
+    print()
+
+    state.save()
+    if audit:
+        audit.close()
+    if export:
+        export.close()
+
+    print_circuit_summary(client)
+    print_concurrency_limits(client)
+    print_dead_letters(client)
+    print_rejected_payloads(client)
+
+    print("=" * 60)
+    print(f"Stage {stage} complete!")
+    print("=" * 60)
+
+
+def main():
+    # Options shared by every command
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument("token", nargs="?", default=None,
+                        help="DirectLogin token (uses config if not provided)")
+    common.add_argument("--audit", action="store_true",
+                        help="Log actions to the sandbox_actions dynamic entity "
+                             "(see create_sandbox_actions_entity.py)")
+    common.add_argument("--record", metavar="CASSETTE",
+                        help="Record every request and response to a cassette file")
+    common.add_argument("--replay", metavar="CASSETTE",
+                        help="Serve responses from a recorded cassette instead of the network")
+    common.add_argument("--replay-latency-scale", type=float, default=None,
+                        help="Multiply recorded latencies on replay (0 for none)")
+    common.add_argument("--deadline", type=float, default=None, metavar="SECONDS",
+                        help="Stop sending new requests when the run is close to this many seconds")
+    common.add_argument("--hedge", action="store_true",
+                        help="Send a backup request for GETs slower than their p95 latency")
+    common.add_argument("--adaptive", action="store_true",
+                        help="Tune the requests in flight per endpoint from latency and overload responses")
+    common.add_argument("--export", metavar="DIR",
+                        help="Export created entities to Parquet/Arrow files in this directory")
+    common.add_argument("--export-format", choices=["parquet", "arrow"], default=None,
+                        help="File format of the export (default: parquet)")
+
+    parser = argparse.ArgumentParser(description="Populate an OBP sandbox with test data")
+    commands = parser.add_subparsers(dest="command", metavar="COMMAND")
+
+    full = commands.add_parser("all", parents=[common], help="Run every stage (the default)")
+    full.add_argument("--backend", choices=["api", "import"], default="api",
+                      help="Create entities one request at a time, or in bulk via sandbox data-import")
+    full.add_argument("--profile", nargs="?", const="profile_report.txt", metavar="REPORT",
+                      help="Profile each stage and write a report (default: profile_report.txt)")
+    full.add_argument("--top-up", action="store_true",
+                      help="Only add historical transactions for the days since the last run")
+
+    stage_help = {
+        "banks": "Create the banks",
+        "fx": "Create FX rates at the existing banks",
+        "accounts": "Create accounts at the existing banks",
+        "users": "Create sandbox users, each with accounts of their own at the existing banks",
+        "counterparties": "Add counterparties to the first account of each bank",
+        "history": "Add historical transactions since each account's last run",
+        "transfers": "Create transaction requests between the existing accounts",
+    }
+    for name in STAGES:
+        command = commands.add_parser(name, parents=[common], help=stage_help[name])
+        command.add_argument("--refresh", action="store_true",
+                             help="Look banks and accounts up on the server instead of the local state")
+        if name == "users":
+            command.add_argument("--count", type=int, default=None,
+                                 help="Number of sandbox users (default: SANDBOX_USERS)")
+        if name == "history":
+            command.add_argument("--months", type=int, default=12,
+                                 help="Months of history for accounts without earlier history")
+
+    # Without a command (e.g. just a token or --top-up) run every stage, as before
+    argv = sys.argv[1:]
+    if not argv or argv[0] not in STAGES + ["all", "-h", "--help"]:
+        argv = ["all"] + argv
+    args = parser.parse_args(argv)
+
+    if args.record:
+        config.OBP_RECORD_CASSETTE = args.record
+    if args.replay:
+        config.OBP_REPLAY_CASSETTE = args.replay
+    if args.replay_latency_scale is not None:
+        config.OBP_REPLAY_LATENCY_SCALE = args.replay_latency_scale
+    if args.deadline is not None:
+        config.RUN_DEADLINE_SECONDS = args.deadline
+    if args.hedge:
+        config.HEDGED_GETS = True
+    if args.adaptive:
+        config.ADAPTIVE_CONCURRENCY = True
+    if args.export:
+        config.EXPORT_DIR = args.export
+    if args.export_format:
+        config.EXPORT_FORMAT = args.export_format
+
+    if args.command in STAGES:
+        run_stage(args.command, args.token, months=getattr(args, "months", 12),
+                  audit_actions=True if args.audit else None, refresh=args.refresh,
+                  users=getattr(args, "count", None))
+        return
+
+    if args.top_up:
+        top_up_history(args.token, audit_actions=True if args.audit else None)
+        return
+
+    populate_sandbox(args.token, backend=args.backend,
+                     audit_actions=True if args.audit else None,
+                     profile_path=args.profile)
+
+
 if __name__ == "__main__":
-    # Check if token is provided as command line argument
-    token = sys.argv[1] if len(sys.argv) > 1 else None
-    populate_sandbox(token)
+    main()
@@ -0,0 +1,113 @@
+"""
+Local record of the banks and accounts created in a sandbox
+
+Keeps the bank and account IDs created under a bank ID prefix in a JSON
+file keyed by OBP base URL, so a single stage (FX rates, counterparties,
+history or transfers) can run without first looking everything up again.
+"""
+import json
+import os
+import threading
+import config
+
+
+class SandboxState:
+    """Bank and account IDs under one prefix on one OBP instance, persisted to a JSON file"""
+
+    def __init__(self, base_url: str = None, prefix: str = "", path: str = None):
+        """
+        Args:
+            base_url: OBP instance the IDs belong to (defaults to config.OBP_BASE_URL)
+            prefix: Bank ID prefix the IDs were created under
+            path: JSON file holding the state (defaults to config.SANDBOX_STATE_FILE)
+        """
+        self.base_url = base_url or config.OBP_BASE_URL
+        self.prefix = prefix
+        self.path = path or config.SANDBOX_STATE_FILE
+        self._lock = threading.Lock()
+        self._all = {}
+        if os.path.exists(self.path):
+            with open(self.path) as f:
+                self._all = json.load(f)
+        self.state = self._all.setdefault(self.base_url, {}).setdefault(prefix, {})
+
+    @property
+    def bank_ids(self) -> list:
+        """IDs of the recorded banks, in creation order"""
+        return list(self.state.get("banks", []))
+
+    @property
+    def bank_accounts(self) -> dict:
+        """Dict mapping bank_id to its recorded account dicts (bank_id, account_id, label and owner)"""
+        return {bank_id: list(self.state.get("accounts", {}).get(bank_id, [])) for bank_id in self.bank_ids}
+
+    def set_banks(self, bank_ids: list):
+        """Record the banks, keeping the accounts of banks that are still listed"""
+        with self._lock:
+            self.state["banks"] = list(dict.fromkeys(bank_ids))
+            accounts = self.state.get("accounts", {})
+            self.state["accounts"] = {b: accounts[b] for b in self.state["banks"] if b in accounts}
+
+    def add_accounts(self, bank_id: str, accounts: list, owner: str = None):
+        """
+        Record accounts created at a bank
+
+        Args:
+            bank_id: Bank ID
+            accounts: Created account dicts (with account_id and label)
+            owner: Username of the sandbox user owning the accounts, if they
+                are not the authenticated user's
+        """
+        with self._lock:
+            if bank_id not in self.state.setdefault("banks", []):
+                self.state["banks"].append(bank_id)
+            recorded = self.state.setdefault("accounts", {}).setdefault(bank_id, [])
+            known = {a["account_id"] for a in recorded}
+            recorded.extend(
+                dict({"bank_id": bank_id, "account_id": a.get("account_id"), "label": a.get("label")},
+                     **({"owner": owner} if owner else {}))
+                for a in accounts if a.get("account_id") and a.get("account_id") not in known
+            )
+
+    @property
+    def owners(self) -> set:
+        """Usernames of the sandbox users owning recorded accounts"""
+        return {a["owner"] for accounts in self.bank_accounts.values() for a in accounts if a.get("owner")}
+
+    def set_bank_accounts(self, bank_accounts: dict):
+        """
+        Replace the recorded banks and accounts, e.g. after looking them up
+
+        Accounts owned by sandbox users keep their owner, and are kept even
+        if missing from the lookup, which only sees the authenticated user's
+        accounts.
+        """
+        with self._lock:
+            recorded = self.state.get("accounts", {})
+            owned = {bank_id: {a["account_id"]: a for a in accounts if a.get("owner")}
+                     for bank_id, accounts in recorded.items()}
+            banks = list(bank_accounts) + [b for b in self.state.get("banks", [])
+                                           if owned.get(b) and b not in bank_accounts]
+            self.state["banks"] = banks
+            self.state["accounts"] = {}
+            for bank_id in banks:
+                owners = owned.get(bank_id, {})
+                listed = [dict({"bank_id": bank_id, "account_id": a["account_id"], "label": a.get("label")},
+                               **({"owner": owners[a["account_id"]]["owner"]} if a["account_id"] in owners else {}))
+                          for a in bank_accounts.get(bank_id, [])]
+                listed_ids = {a["account_id"] for a in listed}
+                self.state["accounts"][bank_id] = listed + [a for account_id, a in owners.items()
+                                                            if account_id not in listed_ids]
+
+    def clear(self):
+        """Forget everything recorded under the prefix"""
+        with self._lock:
+            self.state.clear()
+
+    def save(self):
+        """Write the state back to the file"""
+        with self._lock:
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, "w") as f:
+                json.dump(self._all, f, indent=2, sort_keys=True)
+            os.replace(tmp_path, self.path)
@@ -0,0 +1,270 @@
+"""
+Concurrent provisioning of sandbox users with accounts of their own
+
+Creates users named after the bank ID prefix (aliceuser1, aliceuser2, ...)
+a few at a time, logs each in with DirectLogin and caches the tokens in a
+local JSON file, so later runs reuse them instead of logging in again.
+Unless SANDBOX_USER_PASSWORD is set, the users' password is generated once
+per OBP instance and kept in the same owner-only file. Each
+user gets an OBPClient of their own from a UserClientPool and creates their
+accounts with it, spread round-robin over the banks under the prefix. The
+per-user clients share the run's circuit breakers, error budget,
+concurrency limits and dead-letter store.
+"""
+import json
+import os
+import secrets
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from obp_client import OBPClient, APIError
+from circuit_breaker import CircuitOpenError
+from data.sandbox_definitions import USER_FIRST_NAMES, USER_LAST_NAMES
+import config
+
+
+def sandbox_username(prefix: str, number: int) -> str:
+    """Get the username of a sandbox user, as the web front end names them"""
+    return f"{prefix}user{number}"
+
+
+class TokenCache:
+    """DirectLogin tokens and user IDs of sandbox users, persisted to a JSON file"""
+
+    def __init__(self, base_url: str = None, path: str = None, ttl_hours: float = None):
+        """
+        Args:
+            base_url: OBP instance the tokens belong to (defaults to config.OBP_BASE_URL)
+            path: JSON file holding the tokens (defaults to config.USER_TOKEN_FILE)
+            ttl_hours: Hours a token is reused before logging in again
+                (defaults to config.USER_TOKEN_TTL_HOURS)
+        """
+        self.base_url = base_url or config.OBP_BASE_URL
+        self.path = path or config.USER_TOKEN_FILE
+        self.ttl_hours = config.USER_TOKEN_TTL_HOURS if ttl_hours is None else ttl_hours
+        self._lock = threading.Lock()
+        self._all = {}
+        if os.path.exists(self.path):
+            with open(self.path) as f:
+                self._all = json.load(f)
+        self.users = self._all.setdefault(self.base_url, {})
+
+    def get(self, username: str):
+        """Get a user's entry (token, user_id, logged_in_at), or None if missing or expired"""
+        entry = self.users.get(username)
+        if entry is None or time.time() - entry["logged_in_at"] > self.ttl_hours * 3600:
+            return None
+        return entry
+
+    def put(self, username: str, token: str, user_id: str = None):
+        """Record a user's token"""
+        with self._lock:
+            entry = self.users.get(username)
+            logged_in_at = entry["logged_in_at"] if entry and entry["token"] == token else time.time()
+            self.users[username] = {"token": token, "user_id": user_id, "logged_in_at": logged_in_at}
+
+    def password(self) -> str:
+        """Get the generated password of the instance's sandbox users, creating it on first use"""
+        with self._lock:
+            passwords = self._all.setdefault("passwords", {})
+            if self.base_url in passwords:
+                return passwords[self.base_url]
+            # Random, plus one character of each class OBP's password rules ask for
+            password = passwords[self.base_url] = f"{secrets.token_urlsafe(18)}Aa1!"
+        # Saved before any user is created with it
+        self.save()
+        return password
+
+    def save(self):
+        """Write the tokens back to the file, readable only by the owner"""
+        with self._lock:
+            tmp_path = f"{self.path}.tmp"
+            with open(os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600), "w") as f:
+                json.dump(self._all, f, indent=2, sort_keys=True)
+            os.replace(tmp_path, self.path)
+
+
+class UserClientPool:
+    """OBPClients authenticated as sandbox users, logging users in as needed"""
+
+    def __init__(self, client: OBPClient, tokens: TokenCache = None, password: str = None,
+                 size: int = None):
+        """
+        Args:
+            client: The run's client, whose breakers, limits and stores are shared
+            tokens: Token cache (defaults to one for the client's base URL)
+            password: Password of the sandbox users (defaults to config.SANDBOX_USER_PASSWORD,
+                or one generated and kept in the token cache)
+            size: Clients kept alive, least recently used first out
+                (defaults to config.USER_CLIENT_POOL_SIZE)
+        """
+        self.client = client
+        self.tokens = tokens or TokenCache(client.base_url)
+        self.password = password or config.SANDBOX_USER_PASSWORD or self.tokens.password()
+        self.size = size or config.USER_CLIENT_POOL_SIZE
+        self.logins = 0
+        self._clients = OrderedDict()
+        self._lock = threading.Lock()
+
+    def token(self, username: str) -> str:
+        """Get a user's token from the cache, logging them in if it has none"""
+        entry = self.tokens.get(username)
+        if entry is not None:
+            return entry["token"]
+        token = self.client.direct_login(username, self.password)
+        self.tokens.put(username, token)
+        with self._lock:
+            self.logins += 1
+        return token
+
+    def get(self, username: str) -> OBPClient:
+        """Get a client authenticated as a user"""
+        with self._lock:
+            user_client = self._clients.get(username)
+            if user_client is not None:
+                self._clients.move_to_end(username)
+                return user_client
+
+        token = self.token(username)
+        user_client = OBPClient(
+            base_url=self.client.base_url, api_version=self.client.api_version, token=token,
+            breakers=self.client.breakers, dead_letters=self.client.dead_letters,
+            deadline=self.client.deadline, validator=self.client.validator, limits=self.client.limits
+        )
+        evicted = []
+        with self._lock:
+            existing = self._clients.get(username)
+            if existing is not None:
+                # Another thread logged the user in first, use its client
+                evicted.append(user_client)
+                user_client = existing
+            else:
+                self._clients[username] = user_client
+                while len(self._clients) > self.size:
+                    evicted.append(self._clients.popitem(last=False)[1])
+        # Close the evicted clients' sessions so their connections are released
+        for evicted_client in evicted:
+            evicted_client.session.close()
+        return user_client
+
+
+def provision_user(pool: UserClientPool, prefix: str, number: int) -> dict:
+    """
+    Log a sandbox user in, creating them first if they do not exist
+
+    Logging in first keeps users of earlier runs, whose cached tokens have
+    expired, from being created again.
+
+    Args:
+        pool: Client pool the user is logged in through
+        prefix: Bank ID prefix the username is made from
+        number: User number, from 1
+
+    Returns:
+        Dict with username, user_id and whether the user was created
+    """
+    username = sandbox_username(prefix, number)
+    entry = pool.tokens.get(username)
+    if entry is not None and entry.get("user_id"):
+        return {"username": username, "user_id": entry["user_id"], "created": False}
+
+    user_id = None
+    created = False
+    try:
+        user_client = pool.get(username)
+    except APIError as e:
+        # Invalid credentials: the user does not exist yet
+        if e.status_code != 401:
+            raise
+        try:
+            user = pool.client.create_user(
+                email=f"{username}@example.com",
+                username=username,
+                password=pool.password,
+                first_name=USER_FIRST_NAMES[(number - 1) % len(USER_FIRST_NAMES)],
+                last_name=USER_LAST_NAMES[(number - 1) % len(USER_LAST_NAMES)]
+            )
+            user_id = user.get("user_id")
+            created = True
+        except APIError as e:
+            # Created by someone else in the meantime
+            if e.status_code not in (400, 409):
+                raise
+        user_client = pool.get(username)
+    if not user_id:
+        user_id = user_client.get_current_user().get("user_id")
+    pool.tokens.put(username, user_client.token, user_id)
+    return {"username": username, "user_id": user_id, "created": created}
+
+
+def provision_users(client: OBPClient, prefix: str, count: int, bank_ids: list, state,
+                    pool: UserClientPool = None, audit=None, export=None,
+                    workers: int = None) -> dict:
+    """
+    Provision sandbox users concurrently, each with accounts of their own
+
+    Users are created and logged in (reusing cached tokens), then each
+    creates config.ACCOUNTS_PER_USER accounts through their own client at
+    one of the banks, round-robin. Users who already own recorded accounts
+    keep them.
+
+    Args:
+        client: OBP API client of the run
+        prefix: Bank ID prefix (usually the username prefix)
+        count: Number of users
+        bank_ids: Banks to spread the users' accounts over
+        state: SandboxState the accounts are recorded in, with their owner
+        pool: Client pool for the users (created for the client if not given)
+        audit: Optional writer for sandbox_actions records
+        export: Optional columnar export of created entities
+        workers: Users provisioned concurrently (defaults to config.USER_WORKERS)
+
+    Returns:
+        Dict with counts of users created, users reused, logins, accounts
+        created and failed users
+    """
+    # Imported here to avoid a circular import with sandbox_populator
+    from sandbox_populator import create_accounts
+
+    pool = pool or UserClientPool(client)
+    workers = workers or config.USER_WORKERS
+    owners = state.owners
+    skipped = threading.Event()
+    lock = threading.Lock()
+    summary = {"created": 0, "existing": 0, "logins": 0, "accounts": 0, "failed": 0}
+
+    def provision(number: int):
+        if skipped.is_set():
+            return
+        username = sandbox_username(prefix, number)
+        try:
+            user = provision_user(pool, prefix, number)
+            accounts = []
+            if bank_ids and username not in owners:
+                bank_id = bank_ids[(number - 1) % len(bank_ids)]
+                accounts = create_accounts(pool.get(username), bank_id, user["user_id"],
+                                           config.ACCOUNTS_PER_USER, config.CURRENCY,
+                                           audit=audit, export=export)
+                state.add_accounts(bank_id, accounts, owner=username)
+            print(f"  User {username}: {'created' if user['created'] else 'exists'}, "
+                  f"{len(accounts)} new account(s)")
+            if audit and user["created"]:
+                audit.log("created_user", f"Created sandbox user {username}")
+            with lock:
+                summary["created" if user["created"] else "existing"] += 1
+                summary["accounts"] += len(accounts)
+        except CircuitOpenError as e:
+            if not skipped.is_set():
+                skipped.set()
+                print(f"  Skipping remaining users: {e}")
+        except Exception as e:
+            print(f"  Error provisioning user {username}: {e}")
+            with lock:
+                summary["failed"] += 1
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        list(executor.map(provision, range(1, count + 1)))
+    pool.tokens.save()
+    summary["logins"] = pool.logins
+    return summary
@@ -0,0 +1,190 @@
+#!/usr/bin/env python3
+"""
+Tear down a user's sandbox data
+
+Discovers every bank whose ID starts with the user's prefix, with its
+accounts and their counterparties, and deletes them concurrently in
+dependency order: counterparties first, then accounts, then banks. Accounts
+and banks are deleted with OBP's cascading deletes, which also remove their
+transactions and FX rates.
+"""
+import argparse
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from obp_client import OBPClient
+from circuit_breaker import CircuitOpenError
+from sandbox_populator import get_username_prefix
+from sandbox_state import SandboxState
+import config
+
+
+def discover_sandbox(client: OBPClient, prefix: str, workers: int = None) -> list:
+    """
+    Find the banks, accounts and counterparties under a bank ID prefix
+
+    Args:
+        client: OBP API client
+        prefix: Bank ID prefix (usually the username prefix)
+        workers: Number of concurrent lookups
+
+    Returns:
+        List of bank dicts, each with bank_id and a list of account dicts
+        (account_id, counterparty_ids)
+    """
+    workers = workers or config.TEARDOWN_WORKERS
+    bank_ids = [
+        bank.get("id") for bank in client.iter_banks()
+        if str(bank.get("id", "")).startswith(f"{prefix}.")
+    ]
+
+    def accounts_at(bank_id: str) -> list:
+        try:
+            return [{"bank_id": bank_id, "account_id": a.get("id") or a.get("account_id")}
+                    for a in client.iter_accounts_at_bank(bank_id)]
+        except Exception as e:
+            print(f"  Warning: Could not list accounts at {bank_id}: {e}")
+            return []
+
+    def counterparty_ids(account: dict) -> list:
+        try:
+            return [cp.get("counterparty_id")
+                    for cp in client.iter_counterparties(account["bank_id"], account["account_id"])]
+        except Exception as e:
+            print(f"  Warning: Could not list counterparties of {account['account_id']}: {e}")
+            return []
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        bank_accounts = list(pool.map(accounts_at, bank_ids))
+        all_accounts = [account for accounts in bank_accounts for account in accounts]
+        for account, cp_ids in zip(all_accounts, pool.map(counterparty_ids, all_accounts)):
+            account["counterparty_ids"] = cp_ids
+
+    return [
+        {"bank_id": bank_id, "accounts": accounts}
+        for bank_id, accounts in zip(bank_ids, bank_accounts)
+    ]
+
+
+def _delete_all(pool: ThreadPoolExecutor, label: str, calls: list) -> int:
+    """Run delete calls concurrently, returning the number that succeeded"""
+    if not calls:
+        return 0
+
+    def run(call) -> bool:
+        name, delete = call
+        try:
+            delete()
+            return True
+        except CircuitOpenError as e:
+            print(f"    Skipped {name}: {e}")
+        except Exception as e:
+            print(f"    Error deleting {name}: {e}")
+        return False
+
+    deleted = sum(pool.map(run, calls))
+    print(f"  Deleted {deleted}/{len(calls)} {label}")
+    return deleted
+
+
+def teardown_sandbox(client: OBPClient, banks: list, workers: int = None) -> dict:
+    """
+    Delete discovered sandbox data, leaves first
+
+    Args:
+        client: OBP API client
+        banks: Banks from discover_sandbox
+        workers: Number of concurrent deletes
+
+    Returns:
+        Dict with counts of deleted counterparties, accounts and banks
+    """
+    workers = workers or config.TEARDOWN_WORKERS
+    accounts = [account for bank in banks for account in bank["accounts"]]
+
+    counterparty_calls = [
+        (f"counterparty {cp_id}",
+         lambda a=account, c=cp_id: client.delete_counterparty(a["bank_id"], a["account_id"], c))
+        for account in accounts
+        for cp_id in account["counterparty_ids"]
+    ]
+    account_calls = [
+        (f"account {account['account_id']}",
+         lambda a=account: client.delete_account(a["bank_id"], a["account_id"]))
+        for account in accounts
+    ]
+    bank_calls = [
+        (f"bank {bank['bank_id']}", lambda b=bank: client.delete_bank(b["bank_id"]))
+        for bank in banks
+    ]
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        return {
+            "counterparties": _delete_all(pool, "counterparties", counterparty_calls),
+            "accounts": _delete_all(pool, "accounts", account_calls),
+            "banks": _delete_all(pool, "banks", bank_calls),
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Delete the sandbox data created for a user")
+    parser.add_argument("token", nargs="?", default=None,
+                        help="DirectLogin token (uses config if not provided)")
+    parser.add_argument("--prefix", help="Bank ID prefix (defaults to the authenticated user's prefix)")
+    parser.add_argument("--workers", type=int, default=config.TEARDOWN_WORKERS,
+                        help="Number of concurrent requests")
+    parser.add_argument("--dry-run", action="store_true", help="List what would be deleted")
+    parser.add_argument("--yes", action="store_true", help="Do not ask for confirmation")
+    args = parser.parse_args()
+
+    print("=" * 60)
+    print("OBP Sandbox Teardown")
+    print("=" * 60)
+    print(f"Target: {config.OBP_BASE_URL}")
+    print()
+
+    client = OBPClient(token=args.token)
+
+    prefix = args.prefix
+    if not prefix:
+        try:
+            prefix, _ = get_username_prefix(client)
+        except Exception as e:
+            print("Error: Could not get current user. Is authentication configured?")
+            print(f"Details: {e}")
+            sys.exit(1)
+
+    print(f"Discovering sandbox data with bank ID prefix: {prefix}.")
+    banks = discover_sandbox(client, prefix, args.workers)
+    num_accounts = sum(len(bank["accounts"]) for bank in banks)
+    num_counterparties = sum(len(a["counterparty_ids"]) for bank in banks for a in bank["accounts"])
+    for bank in banks:
+        print(f"  {bank['bank_id']}: {len(bank['accounts'])} accounts")
+    print(f"Found {len(banks)} banks, {num_accounts} accounts, {num_counterparties} counterparties")
+    print()
+
+    if not banks or args.dry_run:
+        return
+
+    if not args.yes:
+        answer = input(f"Delete {len(banks)} banks and everything under them? [y/N] ")
+        if answer.strip().lower() != "y":
+            print("Aborted")
+            return
+
+    print("Deleting...")
+    print("-" * 40)
+    teardown_sandbox(client, banks, args.workers)
+
+    # The recorded IDs are gone, so single populator stages look them up again
+    state = SandboxState(client.base_url, prefix)
+    state.clear()
+    state.save()
+
+    print()
+    print("=" * 60)
+    print("Teardown complete!")
+    print("=" * 60)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,9 @@
+"""
+Unit tests for the Python populator's pure logic, run with: python -m pytest tests
+
+They need no OBP server; the modules live at the top level of the repo.
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
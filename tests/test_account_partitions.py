@@ -0,0 +1,56 @@
+import random
+import threading
+import time
+
+from account_partitions import run_partitioned
+
+
+def test_items_of_a_key_run_in_order_and_never_concurrently():
+    rng = random.Random(1)
+    accounts = [f"a{i}" for i in range(6)]
+    items = [{"seq": i, "accounts": rng.sample(accounts, 2)} for i in range(200)]
+    seen = {account: [] for account in accounts}
+    busy = set()
+    lock = threading.Lock()
+    overlaps = []
+
+    def submit(item):
+        with lock:
+            if busy & set(item["accounts"]):
+                overlaps.append(item["seq"])
+            busy.update(item["accounts"])
+        time.sleep(0.0005)
+        with lock:
+            busy.difference_update(item["accounts"])
+            for account in item["accounts"]:
+                seen[account].append(item["seq"])
+
+    run_partitioned(items, lambda item: item["accounts"], submit, workers=8)
+
+    assert not overlaps
+    for account in accounts:
+        expected = [item["seq"] for item in items if account in item["accounts"]]
+        assert seen[account] == expected
+
+
+def test_disjoint_keys_run_in_parallel():
+    started = []
+    barrier = threading.Barrier(2, timeout=5)
+
+    def submit(item):
+        started.append(item)
+        # Both items must be running at once to pass the barrier
+        barrier.wait()
+
+    run_partitioned(["x", "y"], lambda item: [item], submit, workers=2)
+    assert sorted(started) == ["x", "y"]
+
+
+def test_repeated_key_of_one_item_is_counted_once():
+    done = []
+    run_partitioned([1, 2, 3], lambda item: ["a", "a"], done.append, workers=2)
+    assert done == [1, 2, 3]
+
+
+def test_empty_input():
+    run_partitioned([], lambda item: [item], lambda item: None)
@@ -0,0 +1,101 @@
+import time
+
+import pytest
+
+from circuit_breaker import (
+    CircuitBreaker, CircuitBreakers, CircuitOpenError, ErrorBudget, ErrorBudgetExceeded,
+    CLOSED, OPEN, HALF_OPEN
+)
+
+
+def make_breaker(**options):
+    defaults = dict(failure_rate=0.5, window=4, min_calls=4, reset_timeout=0.05, half_open_calls=2)
+    return CircuitBreaker("create_bank", **dict(defaults, **options))
+
+
+def test_stays_closed_below_min_calls():
+    breaker = make_breaker()
+    for _ in range(3):
+        breaker.record(False)
+    assert breaker.state == CLOSED
+    breaker.before_call()
+
+
+def test_opens_at_failure_rate_and_refuses_calls():
+    breaker = make_breaker()
+    for success in (True, True, False, False):
+        breaker.record(success)
+    assert breaker.state == OPEN
+    assert breaker.times_opened == 1
+    with pytest.raises(CircuitOpenError) as error:
+        breaker.before_call()
+    assert error.value.endpoint == "create_bank"
+
+
+def test_failure_rate_is_over_the_window():
+    # Two failures in six calls is over the rate, but never two in the last four
+    breaker = make_breaker(failure_rate=0.3, window=4, min_calls=4)
+    for success in (False, True, True, True, True, False):
+        breaker.record(success)
+    assert breaker.state == CLOSED
+
+
+def test_half_open_after_reset_timeout_then_closes_on_successful_trials():
+    breaker = make_breaker()
+    for _ in range(4):
+        breaker.record(False)
+    time.sleep(0.06)
+    breaker.before_call()
+    assert breaker.state == HALF_OPEN
+    breaker.before_call()
+    # Only half_open_calls trial calls are let through
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+    breaker.record(True)
+    breaker.record(True)
+    assert breaker.state == CLOSED
+
+
+def test_failed_trial_reopens():
+    breaker = make_breaker()
+    for _ in range(4):
+        breaker.record(False)
+    time.sleep(0.06)
+    breaker.before_call()
+    breaker.record(False)
+    assert breaker.state == OPEN
+    assert breaker.times_opened == 2
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+
+
+def test_error_budget_is_exhausted_after_max_failures():
+    budget = ErrorBudget(2)
+    budget.record_failure()
+    budget.check()
+    budget.record_failure()
+    assert budget.exhausted
+    with pytest.raises(ErrorBudgetExceeded):
+        budget.check()
+
+
+def test_error_budget_of_zero_has_no_limit():
+    budget = ErrorBudget(0)
+    for _ in range(1000):
+        budget.record_failure()
+    assert not budget.exhausted
+    budget.check()
+
+
+def test_breakers_share_the_budget_across_endpoints():
+    breakers = CircuitBreakers(ErrorBudget(3), min_calls=100)
+    breakers.record("create_bank", False)
+    breakers.record("create_account", False)
+    breakers.record("create_fx_rate", True)
+    breakers.before_call("create_counterparty")
+    breakers.record("create_counterparty", False)
+    # The budget refuses every endpoint, and is a CircuitOpenError for callers
+    with pytest.raises(CircuitOpenError):
+        breakers.before_call("create_fx_rate")
+    assert set(breakers.summary()) == {"create_bank", "create_account", "create_fx_rate",
+                                       "create_counterparty"}
@@ -0,0 +1,66 @@
+import pytest
+
+from dead_letters import DeadLetterStore, fingerprint
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = DeadLetterStore(str(tmp_path / "dead_letters.db"))
+    yield store
+    store.close()
+
+
+def test_fingerprint_ignores_key_order():
+    assert fingerprint("POST", "u", {"a": 1, "b": {"c": 2, "d": 3}}) == \
+        fingerprint("POST", "u", {"b": {"d": 3, "c": 2}, "a": 1})
+
+
+def test_fingerprint_depends_on_method_url_and_payload():
+    base = fingerprint("POST", "u", {"a": 1})
+    assert fingerprint("PUT", "u", {"a": 1}) != base
+    assert fingerprint("POST", "v", {"a": 1}) != base
+    assert fingerprint("POST", "u", {"a": 2}) != base
+    assert fingerprint("POST", "u", None) != base
+
+
+def test_repeated_failure_raises_attempts(store):
+    store.add("POST", "u", "create_bank", {"a": 1}, ValueError("first"))
+    store.add("POST", "u", "create_bank", {"a": 1}, ValueError("second"))
+    entries = store.entries()
+    assert len(store) == 1
+    assert store.added == 1
+    assert entries[0]["attempts"] == 2
+    assert entries[0]["error"] == "second"
+    assert entries[0]["payload"] == {"a": 1}
+
+
+def test_resolve_removes_only_the_matching_request(store):
+    store.add("POST", "u", "create_bank", {"a": 1}, ValueError("x"))
+    store.add("POST", "u", "create_bank", {"a": 2}, ValueError("x"))
+    assert store.holds("POST", "u")
+    store.resolve("POST", "u", {"a": 1})
+    assert [entry["payload"] for entry in store.entries()] == [{"a": 2}]
+    assert store.holds("POST", "u")
+    store.resolve("POST", "u", {"a": 2})
+    assert len(store) == 0
+    assert not store.holds("POST", "u")
+
+
+def test_resolve_of_unknown_request_is_a_no_op(store):
+    store.add("POST", "u", "create_bank", {"a": 1}, ValueError("x"))
+    store.resolve("POST", "u", {"a": 3})
+    store.resolve("POST", "other", {"a": 1})
+    assert len(store) == 1
+
+
+def test_entries_survive_reopening(tmp_path):
+    path = str(tmp_path / "dead_letters.db")
+    store = DeadLetterStore(path)
+    store.add("POST", "u", "create_bank", {"a": 1}, ValueError("x"))
+    store.close()
+    reopened = DeadLetterStore(path)
+    assert len(reopened) == 1
+    assert reopened.holds("POST", "u")
+    reopened.resolve("POST", "u", {"a": 1})
+    assert len(reopened) == 0
+    reopened.close()
@@ -0,0 +1,123 @@
+from datetime import datetime
+
+import pytest
+
+from history_watermarks import HistoryWatermarks
+from sandbox_populator import create_historical_transactions
+
+ACCOUNTS = {"b1": [{"bank_id": "b1", "account_id": "a1"}, {"bank_id": "b1", "account_id": "a2"}]}
+END_DATE = datetime(2024, 1, 6)
+
+
+class StubClient:
+    """Creates historical transactions, failing those posted on fail_days"""
+
+    limits = None
+
+    def __init__(self, fail_days=()):
+        self.fail_days = set(fail_days)
+        self.sent = []
+
+    def create_historical_transaction(self, **tx_data):
+        self.sent.append(tx_data["posted"])
+        if tx_data["posted"][:10] in self.fail_days:
+            raise RuntimeError("500 Internal Server Error")
+        return {"transaction_id": f"t{len(self.sent)}"}
+
+
+def plan(*posted):
+    return [{"bank_id": "b1", "from_account_id": "a1", "to_account_id": "a2",
+             "amount": "1.00", "currency": "BWP", "description": "x", "posted": p, "completed": p}
+            for p in posted]
+
+
+PLANNED = plan("2024-01-01T09:00:00Z", "2024-01-02T09:00:00Z", "2024-01-03T09:00:00Z",
+               "2024-01-03T10:00:00Z", "2024-01-04T09:00:00Z", "2024-01-05T09:00:00Z")
+
+
+@pytest.fixture
+def watermarks(tmp_path):
+    return HistoryWatermarks("http://obp", str(tmp_path / "history_state.json"))
+
+
+def run(client, watermarks):
+    failed = []
+    create_historical_transactions(client, ACCOUNTS, start_date=datetime(2024, 1, 1), end_date=END_DATE,
+                                   delay_seconds=0, watermarks=watermarks, workers=1,
+                                   planned=PLANNED, failed=failed)
+    return failed
+
+
+def test_start_for_uses_the_earliest_mark(watermarks):
+    default = datetime(2024, 1, 1)
+    accounts = ACCOUNTS["b1"] + [{"account_id": "a3"}]
+    assert watermarks.start_for(accounts, default) == default
+    watermarks.advance(ACCOUNTS["b1"][:1], datetime(2024, 1, 4))
+    watermarks.advance(ACCOUNTS["b1"][1:], datetime(2024, 1, 2))
+    # Marks never move back
+    watermarks.advance(ACCOUNTS["b1"], datetime(2024, 1, 1))
+    assert watermarks.start_for(accounts, default) == datetime(2024, 1, 3)
+
+
+def test_record_created_days_keeps_only_days_after_the_mark(watermarks):
+    watermarks.record_created_days("b1", {"2024-01-02", "2024-01-04", "2024-01-05"}, datetime(2024, 1, 3))
+    assert watermarks.days_created("b1") == {"2024-01-04", "2024-01-05"}
+    watermarks.record_created_days("b1", {"2024-01-04"}, datetime(2024, 1, 5))
+    assert watermarks.days_created("b1") == set()
+
+
+def test_marks_are_saved(watermarks):
+    watermarks.advance(ACCOUNTS["b1"], datetime(2024, 1, 2))
+    watermarks.save()
+    reloaded = HistoryWatermarks("http://obp", watermarks.path)
+    assert reloaded.marks == {"a1": "2024-01-02", "a2": "2024-01-02"}
+    assert HistoryWatermarks("http://other", watermarks.path).marks == {}
+
+
+def test_mark_stops_before_the_failed_day(watermarks):
+    client = StubClient(fail_days={"2024-01-03"})
+    failed = run(client, watermarks)
+
+    # The rest of the failed day is still sent, later days are left for the next run
+    assert [posted[:10] for posted in client.sent] == ["2024-01-01", "2024-01-02", "2024-01-03", "2024-01-03"]
+    assert [tx["posted"][:10] for tx in failed] == ["2024-01-03", "2024-01-03"]
+    assert watermarks.marks == {"a1": "2024-01-02", "a2": "2024-01-02"}
+    assert watermarks.days_created("b1") == set()
+
+
+def test_partly_failed_day_is_not_recorded_as_created(watermarks):
+    client = StubClient()
+    client.create_historical_transaction = fail_second_on_day(client, "2024-01-03")
+    run(client, watermarks)
+
+    assert watermarks.marks["a1"] == "2024-01-02"
+    # The day's first transaction was created, but the day is generated again
+    assert "2024-01-03" not in watermarks.days_created("b1")
+
+
+def test_next_run_resumes_at_the_failed_day(watermarks):
+    run(StubClient(fail_days={"2024-01-03"}), watermarks)
+    client = StubClient()
+    assert run(client, watermarks) == []
+    assert [posted[:10] for posted in client.sent] == ["2024-01-03", "2024-01-03", "2024-01-04", "2024-01-05"]
+    assert watermarks.marks == {"a1": "2024-01-05", "a2": "2024-01-05"}
+
+
+def test_days_created_past_the_mark_are_skipped(watermarks):
+    watermarks.advance(ACCOUNTS["b1"], datetime(2024, 1, 2))
+    watermarks.record_created_days("b1", {"2024-01-04"}, datetime(2024, 1, 2))
+    client = StubClient()
+    run(client, watermarks)
+    assert [posted[:10] for posted in client.sent] == ["2024-01-03", "2024-01-03", "2024-01-05"]
+    assert watermarks.days_created("b1") == set()
+
+
+def fail_second_on_day(client, day):
+    create = client.create_historical_transaction
+
+    def create_historical_transaction(**tx_data):
+        if tx_data["posted"][:10] == day and day in {posted[:10] for posted in client.sent}:
+            client.sent.append(tx_data["posted"])
+            raise RuntimeError("500 Internal Server Error")
+        return create(**tx_data)
+    return create_historical_transaction
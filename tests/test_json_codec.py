@@ -0,0 +1,72 @@
+import json
+
+import pytest
+
+import config
+from json_codec import Field, LazyJSON, PayloadTemplate, as_dict, encode_body
+
+TEMPLATE = PayloadTemplate({
+    "from_account_id": Field("from_account_id"),
+    "value": {"currency": Field("currency"), "amount": Field("amount")},
+    "description": Field("description"),
+    "type": "SANDBOX_TAN",
+    "flags": [True, None, 1.5, "100%"],
+})
+
+
+@pytest.fixture(autouse=True)
+def standard_json(monkeypatch):
+    monkeypatch.setattr(config, "JSON_CODEC", "json")
+
+
+@pytest.mark.parametrize("description", [
+    "Salary",
+    'Quote " and backslash \\',
+    "Percent %s %d 100%",
+    "Unicode café € \U0001f600",
+    "Control \n\t\x00",
+])
+def test_rendered_template_matches_json_dumps(description):
+    values = {"from_account_id": "a1", "currency": "BWP", "amount": "10.00", "description": description}
+    payload = TEMPLATE.render(**values)
+    expected = TEMPLATE.build(values)
+    assert payload.data == json.dumps(expected, separators=(",", ":")).encode()
+    assert json.loads(payload.data) == expected
+    assert as_dict(payload) == expected
+    assert encode_body(payload) == payload.data
+
+
+def test_non_string_field_values_are_encoded():
+    template = PayloadTemplate({"count": Field("count"), "items": Field("items")})
+    payload = template.render(count=3, items=[1, {"a": None}])
+    assert json.loads(payload.data) == {"count": 3, "items": [1, {"a": None}]}
+
+
+def test_plain_dict_bodies_pass_through():
+    assert as_dict({"a": 1}) == {"a": 1}
+    assert json.loads(encode_body({"a": 1})) == {"a": 1}
+
+
+def test_lazy_json_reads_leading_string_fields():
+    body = {"account_id": "abc-123", "label": "x", "balance": {"account_id": "nested"}}
+    lazy = LazyJSON(json.dumps(body).encode())
+    assert lazy["account_id"] == "abc-123"
+    assert lazy._data is None
+
+
+def test_lazy_json_decodes_for_anything_else():
+    body = {"balance": {"account_id": "nested"}, "account_id": "top", "n": 5, "esc": "a\"b"}
+    lazy = LazyJSON(json.dumps(body).encode())
+    # A field after a nested object is read from the decoded body, not the nested one
+    assert lazy["account_id"] == "top"
+    assert lazy["n"] == 5
+    assert lazy["esc"] == 'a"b'
+    assert dict(lazy) == body
+    assert len(lazy) == 4
+    with pytest.raises(KeyError):
+        lazy["missing"]
+
+
+def test_lazy_json_of_a_non_object():
+    lazy = LazyJSON(b'["a", "b"]')
+    assert list(lazy) == ["a", "b"]
@@ -0,0 +1,51 @@
+import pytest
+
+from pagination import paginate
+
+RECORDS = [{"id": i} for i in range(25)]
+
+
+def paged_server(limit, offset):
+    return {"banks": RECORDS[offset:offset + limit]}
+
+
+@pytest.mark.parametrize("prefetch", [True, False])
+def test_walks_every_page(prefetch):
+    assert list(paginate(paged_server, "banks", page_size=10, prefetch=prefetch)) == RECORDS
+
+
+@pytest.mark.parametrize("prefetch", [True, False])
+def test_exact_multiple_of_the_page_size(prefetch):
+    calls = []
+
+    def fetch(limit, offset):
+        calls.append(offset)
+        return {"banks": RECORDS[:20][offset:offset + limit]}
+
+    assert list(paginate(fetch, "banks", page_size=10, prefetch=prefetch)) == RECORDS[:20]
+    assert calls == [0, 10, 20]
+
+
+@pytest.mark.parametrize("prefetch", [True, False])
+def test_server_ignoring_paging_returns_everything_at_once(prefetch):
+    calls = []
+
+    def fetch(limit, offset):
+        calls.append(offset)
+        return {"banks": RECORDS}
+
+    assert list(paginate(fetch, "banks", page_size=10, prefetch=prefetch)) == RECORDS
+    assert calls == [0]
+
+
+@pytest.mark.parametrize("prefetch", [True, False])
+def test_server_repeating_the_first_page_stops(prefetch):
+    # Exactly a page of records whatever the offset, so every page looks full
+    def fetch(limit, offset):
+        return {"banks": RECORDS[:limit]}
+
+    assert list(paginate(fetch, "banks", page_size=10, prefetch=prefetch)) == RECORDS[:10]
+
+
+def test_missing_key_is_an_empty_list():
+    assert list(paginate(lambda limit, offset: {}, "banks", page_size=10)) == []
@@ -0,0 +1,467 @@
+#!/usr/bin/env python3
+"""
+Distributed work queue for populating one large sandbox from many workers
+
+A coordinator plans the sandbox and splits it into tasks: banks, FX rates,
+accounts and counterparties per bank, historical transactions in chunks,
+and transaction requests. Worker processes claim tasks under a lease,
+execute them through OBPClient, renew the lease while they work and
+acknowledge the task when done. A task whose lease expires (its worker
+crashed or hung) goes back to the queue, so a lost worker only costs the
+task it held. A task that created only part of its work (API errors,
+open circuits) goes back with just the rest. Workers keep no dead-letter
+store, since the queue retries failed items itself; a local dead letter
+would stay behind after another worker created the item, and re-driving
+it would create a duplicate.
+
+Tasks run in phases (banks, then accounts and FX rates, then
+counterparties and history, then transaction requests), and tasks that
+share a partition, such as the history chunks of one bank, run one at a
+time in order so every account's history is posted chronologically.
+
+The queue backend is pluggable; SQLiteWorkQueue keeps it in one SQLite
+file, so its workers must run on the same host as the file. SQLite's
+locking is not reliable over network filesystems (NFS, SMB), where claims
+and acks could be lost or the queue corrupted; workers on several
+machines need a WorkQueue backend built on a database server.
+"""
+import argparse
+import json
+import os
+import socket
+import sqlite3
+import sys
+import threading
+import time
+import uuid
+from abc import ABC, abstractmethod
+from datetime import datetime
+from obp_client import OBPClient
+from response_cache import ResponseCache
+from data.sandbox_definitions import FX_RATE_DEFINITIONS
+from sandbox_plan import plan_sandbox, iter_plan_transactions
+import config
+
+PENDING = "pending"
+LEASED = "leased"
+DONE = "done"
+FAILED = "failed"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS tasks (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    kind TEXT NOT NULL,
+    phase INTEGER NOT NULL,
+    partition_key TEXT NOT NULL,
+    seq INTEGER NOT NULL,
+    payload TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    lease_owner TEXT,
+    lease_expires REAL,
+    result TEXT,
+    error TEXT
+)
+"""
+
+
+class Task:
+    """A claimed unit of work"""
+
+    def __init__(self, task_id: int, kind: str, payload: dict, attempts: int):
+        self.id = task_id
+        self.kind = kind
+        self.payload = payload
+        self.attempts = attempts
+
+
+class TaskIncomplete(Exception):
+    """Raised when a task created only part of its work, with the payload of the rest"""
+
+    def __init__(self, message: str, payload: dict = None):
+        self.payload = payload
+        super().__init__(message)
+
+
+class WorkQueue(ABC):
+    """Interface of a leased task queue backend"""
+
+    @abstractmethod
+    def enqueue(self, tasks: list):
+        """Add tasks, each a dict with kind, phase, partition, seq and payload"""
+
+    @abstractmethod
+    def claim(self, worker_id: str, lease_seconds: float):
+        """Lease the next runnable task to a worker, or return None"""
+
+    @abstractmethod
+    def renew(self, task_id: int, worker_id: str, lease_seconds: float) -> bool:
+        """Extend a worker's lease, returning False if the worker lost it"""
+
+    @abstractmethod
+    def ack(self, task_id: int, worker_id: str, result: dict = None):
+        """Mark a leased task done"""
+
+    @abstractmethod
+    def fail(self, task_id: int, worker_id: str, error: str, payload: dict = None):
+        """
+        Give a task back to the queue, or mark it failed once it used its attempts
+
+        A payload replaces the task's payload, e.g. to retry only the part
+        of its work that was not done.
+        """
+
+    @abstractmethod
+    def counts(self) -> dict:
+        """Number of tasks by status"""
+
+
+class SQLiteWorkQueue(WorkQueue):
+    """Work queue kept in a local SQLite file, for workers on one host"""
+
+    def __init__(self, path: str = None, max_attempts: int = None):
+        """
+        Args:
+            path: SQLite file (defaults to config.WORK_QUEUE_FILE)
+            max_attempts: Claims of a task before it is marked failed
+                (defaults to config.WORK_QUEUE_MAX_ATTEMPTS)
+        """
+        self.path = path or config.WORK_QUEUE_FILE
+        self.max_attempts = max_attempts or config.WORK_QUEUE_MAX_ATTEMPTS
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(self.path, timeout=30, isolation_level=None,
+                                   check_same_thread=False)
+        self._db.row_factory = sqlite3.Row
+        self._db.execute(SCHEMA)
+
+    def _write(self, query: str, params: tuple = ()) -> sqlite3.Cursor:
+        with self._lock:
+            return self._db.execute(query, params)
+
+    def enqueue(self, tasks: list):
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            self._db.executemany(
+                "INSERT INTO tasks (kind, phase, partition_key, seq, payload) VALUES (?, ?, ?, ?, ?)",
+                [(t["kind"], t["phase"], t["partition"], t["seq"], json.dumps(t["payload"])) for t in tasks]
+            )
+            self._db.execute("COMMIT")
+
+    def claim(self, worker_id: str, lease_seconds: float):
+        now = time.time()
+        with self._lock:
+            # Take the write lock first so two workers cannot claim the same task
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                # Expired leases of tasks that used up their attempts are not retried again
+                self._db.execute(
+                    "UPDATE tasks SET status = 'failed', error = 'lease expired' "
+                    "WHERE status = 'leased' AND lease_expires < ? AND attempts >= ?",
+                    (now, self.max_attempts)
+                )
+                row = self._db.execute(
+                    """
+                    SELECT * FROM tasks t
+                    WHERE (t.status = 'pending' OR (t.status = 'leased' AND t.lease_expires < ?))
+                      AND NOT EXISTS (SELECT 1 FROM tasks p
+                                      WHERE p.phase < t.phase AND p.status IN ('pending', 'leased'))
+                      AND NOT EXISTS (SELECT 1 FROM tasks p
+                                      WHERE p.partition_key = t.partition_key AND p.seq < t.seq
+                                        AND p.status IN ('pending', 'leased'))
+                    ORDER BY t.phase, t.seq, t.id
+                    LIMIT 1
+                    """,
+                    (now,)
+                ).fetchone()
+                if row is None:
+                    self._db.execute("COMMIT")
+                    return None
+                self._db.execute(
+                    "UPDATE tasks SET status = 'leased', lease_owner = ?, lease_expires = ?, "
+                    "attempts = attempts + 1 WHERE id = ?",
+                    (worker_id, now + lease_seconds, row["id"])
+                )
+                self._db.execute("COMMIT")
+            except Exception:
+                self._db.execute("ROLLBACK")
+                raise
+        return Task(row["id"], row["kind"], json.loads(row["payload"]), row["attempts"] + 1)
+
+    def renew(self, task_id: int, worker_id: str, lease_seconds: float) -> bool:
+        cursor = self._write(
+            "UPDATE tasks SET lease_expires = ? WHERE id = ? AND status = 'leased' AND lease_owner = ?",
+            (time.time() + lease_seconds, task_id, worker_id)
+        )
+        return cursor.rowcount == 1
+
+    def ack(self, task_id: int, worker_id: str, result: dict = None):
+        self._write(
+            "UPDATE tasks SET status = 'done', result = ?, lease_expires = NULL "
+            "WHERE id = ? AND lease_owner = ?",
+            (json.dumps(result or {}), task_id, worker_id)
+        )
+
+    def fail(self, task_id: int, worker_id: str, error: str, payload: dict = None):
+        self._write(
+            "UPDATE tasks SET status = CASE WHEN attempts >= ? THEN 'failed' ELSE 'pending' END, "
+            "error = ?, payload = COALESCE(?, payload), lease_owner = NULL, lease_expires = NULL "
+            "WHERE id = ? AND lease_owner = ?",
+            (self.max_attempts, error[:1000], json.dumps(payload) if payload is not None else None,
+             task_id, worker_id)
+        )
+
+    def counts(self) -> dict:
+        with self._lock:
+            rows = self._db.execute("SELECT status, COUNT(*) FROM tasks GROUP BY status").fetchall()
+        return {status: count for status, count in rows}
+
+
+def plan_tasks(plan: dict, chunk_size: int = None) -> list:
+    """
+    Split a plan into queue tasks
+
+    Args:
+        plan: Plan from sandbox_plan.plan_sandbox
+        chunk_size: Historical transactions per task
+
+    Returns:
+        List of task dicts (kind, phase, partition, seq, payload)
+    """
+    chunk_size = chunk_size or config.WORK_QUEUE_CHUNK_SIZE
+    currency = plan["currency"]
+    tasks = []
+
+    def add(kind: str, phase: int, partition: str, seq: int, payload: dict):
+        tasks.append({"kind": kind, "phase": phase, "partition": partition, "seq": seq, "payload": payload})
+
+    for bank in plan["banks"]:
+        add("bank", 0, bank["bank_id"], 0, {"bank": bank})
+    for bank in plan["banks"]:
+        add("fx_rates", 1, f"fx:{bank['bank_id']}", 0, {"bank_id": bank["bank_id"]})
+    for bank_id, accounts in plan["accounts"].items():
+        add("accounts", 1, f"accounts:{bank_id}", 0, {"accounts": accounts})
+    for bank_id, cp_plan in plan["counterparties"].items():
+        add("counterparties", 2, f"counterparties:{bank_id}", 0,
+            {"bank_id": bank_id, "account_id": cp_plan["account_id"],
+             "businesses": cp_plan["businesses"], "currency": currency})
+
+    # History chunks of a bank share a partition, so they run in order
+    window = {"start_date": plan["start_date"].isoformat(), "end_date": plan["end_date"].isoformat()}
+    chunks = {bank_id: [] for bank_id in plan["accounts"]}
+    sequence = {bank_id: 0 for bank_id in plan["accounts"]}
+
+    def add_history(bank_id: str):
+        add("history", 2, f"history:{bank_id}", sequence[bank_id],
+            dict(window, accounts=plan["accounts"][bank_id], transactions=chunks[bank_id]))
+        sequence[bank_id] += 1
+        chunks[bank_id] = []
+
+    for tx_data in iter_plan_transactions(plan):
+        chunks[tx_data["bank_id"]].append(tx_data)
+        if len(chunks[tx_data["bank_id"]]) >= chunk_size:
+            add_history(tx_data["bank_id"])
+    for bank_id in plan["accounts"]:
+        if chunks[bank_id]:
+            add_history(bank_id)
+
+    all_accounts = [account for accounts in plan["accounts"].values() for account in accounts]
+    add("transaction_requests", 3, "transaction_requests", 0,
+        {"accounts": all_accounts, "currency": currency})
+    return tasks
+
+
+def execute_task(client: OBPClient, task: Task, user_id: str) -> dict:
+    """
+    Run one task through the client
+
+    The populator functions report errors and skipped work instead of
+    raising, so a task that did not create everything raises
+    TaskIncomplete. Its payload is narrowed to what is left where the
+    work cannot simply be repeated (accounts, counterparties, history and
+    transaction requests); banks and FX rates are repeated as a whole.
+
+    Returns:
+        Result counts stored with the acknowledged task
+    """
+    # Imported here to avoid a circular import with sandbox_populator
+    from sandbox_populator import (
+        create_plan_banks, create_plan_accounts, create_fx_rates, create_counterparties,
+        create_historical_transactions, create_transaction_requests
+    )
+
+    payload = task.payload
+    failed = []
+    if task.kind == "bank":
+        result = {"banks": create_plan_banks(client, [payload["bank"]])}
+        if not result["banks"]:
+            raise TaskIncomplete(f"Bank {payload['bank']['bank_id']} was not created")
+        return result
+    if task.kind == "fx_rates":
+        result = {"fx_rates": len(create_fx_rates(client, payload["bank_id"]))}
+        if result["fx_rates"] < len(FX_RATE_DEFINITIONS):
+            raise TaskIncomplete(f"Created {result['fx_rates']} of {len(FX_RATE_DEFINITIONS)} FX rates")
+        return result
+    if task.kind == "accounts":
+        created = create_plan_accounts(client, payload["accounts"], user_id)
+        created_ids = {account["account_id"] for account in created}
+        failed = [account for account in payload["accounts"] if account["account_id"] not in created_ids]
+        result = {"accounts": len(created)}
+        remaining = dict(payload, accounts=failed)
+    elif task.kind == "counterparties":
+        result = {"counterparties": len(create_counterparties(
+            client, payload["bank_id"], payload["account_id"], payload["businesses"], payload["currency"],
+            failed=failed
+        ))}
+        remaining = dict(payload, businesses=failed)
+    elif task.kind == "history":
+        accounts = payload["accounts"]
+        created = create_historical_transactions(
+            client, {accounts[0]["bank_id"]: accounts}, accounts[0]["currency"],
+            start_date=datetime.fromisoformat(payload["start_date"]),
+            end_date=datetime.fromisoformat(payload["end_date"]),
+            planned=payload["transactions"], failed=failed
+        )
+        # Keep the chronological order of the chunk for the retry
+        failed.sort(key=lambda tx_data: tx_data["posted"])
+        result = {"transactions": len(created), "planned": len(payload["transactions"])}
+        remaining = dict(payload, transactions=failed)
+    elif task.kind == "transaction_requests":
+        result = {"transaction_requests": len(create_transaction_requests(
+            client, payload["accounts"], payload["currency"],
+            definitions=payload.get("definitions"), failed=failed
+        ))}
+        remaining = dict(payload, definitions=failed)
+    else:
+        raise ValueError(f"Unknown task kind: {task.kind}")
+    if failed:
+        raise TaskIncomplete(f"{len(failed)} {task.kind} item(s) not created", remaining)
+    return result
+
+
+def run_worker(queue: WorkQueue, client: OBPClient, user_id: str, worker_id: str = None,
+               lease_seconds: float = None, poll_seconds: float = 2.0) -> int:
+    """
+    Claim and execute tasks until the queue has no pending or leased tasks
+
+    The lease of the running task is renewed from a background thread at a
+    third of its length.
+
+    Returns:
+        Number of tasks this worker completed
+    """
+    worker_id = worker_id or f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:6]}"
+    lease_seconds = lease_seconds or config.WORK_QUEUE_LEASE_SECONDS
+    completed = 0
+
+    while True:
+        task = queue.claim(worker_id, lease_seconds)
+        if task is None:
+            counts = queue.counts()
+            if not counts.get(PENDING) and not counts.get(LEASED):
+                return completed
+            time.sleep(poll_seconds)
+            continue
+
+        print(f"[{worker_id}] Task {task.id}: {task.kind} (attempt {task.attempts})")
+        stop_renewing = threading.Event()
+
+        def renew_lease(task_id=task.id):
+            while not stop_renewing.wait(lease_seconds / 3):
+                if not queue.renew(task_id, worker_id, lease_seconds):
+                    print(f"[{worker_id}] Lost the lease on task {task_id}")
+                    return
+
+        renewer = threading.Thread(target=renew_lease, daemon=True)
+        renewer.start()
+        try:
+            result = execute_task(client, task, user_id)
+        except TaskIncomplete as e:
+            print(f"[{worker_id}] Task {task.id} incomplete: {e}")
+            queue.fail(task.id, worker_id, str(e), e.payload)
+        except Exception as e:
+            print(f"[{worker_id}] Task {task.id} failed: {e}")
+            queue.fail(task.id, worker_id, str(e))
+        else:
+            queue.ack(task.id, worker_id, result)
+            completed += 1
+        finally:
+            stop_renewing.set()
+            renewer.join()
+
+
+def print_counts(queue: WorkQueue):
+    """Print the number of tasks by status"""
+    counts = queue.counts()
+    print(", ".join(f"{status}: {counts.get(status, 0)}" for status in (PENDING, LEASED, DONE, FAILED)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Populate one sandbox from many workers through a shared queue")
+    parser.add_argument("--queue", default=config.WORK_QUEUE_FILE,
+                        help="Queue file shared by the workers (on a local disk of their host)")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    coordinator = subparsers.add_parser("coordinator", help="Plan the sandbox and fill the queue")
+    coordinator.add_argument("token", nargs="?", default=None,
+                             help="DirectLogin token (uses config if not provided)")
+    coordinator.add_argument("--months", type=int, default=12, help="Months of historical transactions")
+    coordinator.add_argument("--seed", type=int, default=None, help="Seed for the generated plan")
+    coordinator.add_argument("--chunk-size", type=int, default=config.WORK_QUEUE_CHUNK_SIZE,
+                             help="Historical transactions per task")
+
+    worker = subparsers.add_parser("worker", help="Claim and execute tasks until the queue is drained")
+    worker.add_argument("token", nargs="?", default=None,
+                        help="DirectLogin token (uses config if not provided)")
+    worker.add_argument("--lease", type=float, default=config.WORK_QUEUE_LEASE_SECONDS,
+                        help="Seconds a claimed task stays leased without renewal")
+
+    subparsers.add_parser("status", help="Show the number of tasks by status")
+    args = parser.parse_args()
+
+    print("=" * 60)
+    print(f"OBP Sandbox Work Queue: {args.command}")
+    print("=" * 60)
+    print(f"Target: {config.OBP_BASE_URL}")
+    print(f"Queue: {args.queue}")
+    print()
+
+    queue = SQLiteWorkQueue(args.queue)
+    if args.command == "status":
+        print_counts(queue)
+        return
+
+    # Imported here to avoid a circular import with sandbox_populator
+    from sandbox_populator import (
+        get_username_prefix, print_circuit_summary, print_concurrency_limits, print_rejected_payloads
+    )
+
+    # No dead-letter store: failed items go back to the queue with their task
+    client = OBPClient(token=args.token, cache=ResponseCache())
+    try:
+        username, user_id = get_username_prefix(client)
+    except Exception as e:
+        print("Error: Could not get current user. Is authentication configured?")
+        print(f"Details: {e}")
+        sys.exit(1)
+
+    if args.command == "coordinator":
+        plan = plan_sandbox(username, user_id, months=args.months, seed=args.seed)
+        tasks = plan_tasks(plan, args.chunk_size)
+        queue.enqueue(tasks)
+        print(f"Queued {len(tasks)} tasks for {len(plan['banks'])} banks (seed {plan['seed']})")
+        print_counts(queue)
+        return
+
+    completed = run_worker(queue, client, user_id, lease_seconds=args.lease)
+    print()
+    print_circuit_summary(client)
+    print_concurrency_limits(client)
+    print_rejected_payloads(client)
+    print("=" * 60)
+    print(f"Worker finished: {completed} tasks completed")
+    print("=" * 60)
+    print_counts(queue)
+
+
+if __name__ == "__main__":
+    main()